@@ -0,0 +1,87 @@
+"""Points per second and points per batch of fixed batch sizes vs. the point budget batch sampler.
+
+    python benchmarks/bench_batch_sampler.py --scene-dir data/preprocessed/train --budget 2000000
+    python benchmarks/bench_batch_sampler.py --num-scenes 400 --budget 2000000 --batch-sizes 1 4
+
+Without --scene-dir the point counts are drawn from a log-normal distribution (small rooms to
+whole floors). The training step is a stand-in for a sparse convolution: hashing the voxels of
+the collated batch and looking up their 6 face neighbours, plus --step-overhead seconds per batch
+(kernel launches, optimizer step). The peak points per batch bound the activation memory.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from batch_sampler import PointBudgetBatchSampler, fixed_batches  # noqa: E402
+from scene_format import read_scene, read_scene_header  # noqa: E402
+
+NEIGHBOURS = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+
+
+def sparse_step(coords: np.ndarray, overhead: float) -> None:
+    keys = (coords[:, 0].astype(np.int64) << 42) | (coords[:, 1].astype(np.int64) << 21) | coords[:, 2].astype(np.int64)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    for offset in NEIGHBOURS:
+        shifted = (offset[0] << 42) + (offset[1] << 21) + offset[2]
+        np.searchsorted(sorted_keys, keys + shifted)
+    time.sleep(overhead)
+
+
+def run(batches, load, overhead: float) -> dict:
+    points = []
+    start = time.perf_counter()
+    for batch in batches:
+        coords = np.concatenate([load(i) for i in batch])
+        sparse_step(coords, overhead)
+        points.append(len(coords))
+    seconds = time.perf_counter() - start
+    points = np.array(points)
+    return {'batches': len(points), 'points_per_s': points.sum() / seconds, 'mean': points.mean(),
+            'cv': points.std() / points.mean(), 'max': points.max()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Point budget batch sampler benchmark")
+    parser.add_argument("--scene-dir", help="preprocessed .scene files, default: synthetic point counts")
+    parser.add_argument("--num-scenes", type=int, default=300)
+    parser.add_argument("--median-points", type=int, default=100_000)
+    parser.add_argument("--budget", type=int, default=1_000_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--step-overhead", type=float, default=0.05, help="fixed seconds per training step")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.scene_dir:
+        files = sorted(glob.glob(os.path.join(args.scene_dir, "*.scene")))
+        counts = np.array([read_scene_header(f)['arrays']['coords']['shape'][0] for f in files])
+
+        def load(i):
+            return np.asarray(read_scene(files[i])['coords'])
+    else:
+        rng = np.random.default_rng(args.seed)
+        counts = np.maximum(rng.lognormal(np.log(args.median_points), 1.0, args.num_scenes).astype(np.int64), 1000)
+        coords = rng.integers(0, 2048, (int(counts.max()), 3), dtype=np.int32)
+
+        def load(i):
+            return coords[:counts[i]]
+
+    print(f"{len(counts)} scenes, {counts.sum()} points, median {int(np.median(counts))}, max {counts.max()}")
+    print(f"{'batching':<22} {'batches':>8} {'points/s':>12} {'points/batch':>13} {'cv':>6} {'max':>11}")
+    configurations = [(f"batch_size={size}", fixed_batches(len(counts), size, seed=args.seed)) for size in args.batch_sizes]
+    sampler = PointBudgetBatchSampler(counts, args.budget, seed=args.seed)
+    configurations.append((f"budget={args.budget}", sampler.batches()))
+    for name, batches in configurations:
+        result = run(batches, load, args.step_overhead)
+        print(f"{name:<22} {result['batches']:>8} {result['points_per_s']:>12.0f} {result['mean']:>13.0f} "
+              f"{result['cv']:>6.2f} {result['max']:>11}")
+
+
+if __name__ == "__main__":
+    main()
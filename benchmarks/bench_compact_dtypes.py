@@ -0,0 +1,73 @@
+"""Memory per point of the compact dtype pipeline vs. the previous float32 + dense one-hot one.
+
+Reports the bytes per point of a stored scene and of one dataset item (what goes through the
+collate and pin_memory path) for each feature encoding.
+
+    python benchmarks/bench_compact_dtypes.py --num-points 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from feature_codec import FEATURE_ENCODINGS, encode_features, encode_labels  # noqa: E402
+
+
+def synthetic_features(num_points, num_classes, seed):
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 256, (num_points, 3)) / 255.0
+    normals = rng.normal(size=(num_points, 3))
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    labels = rng.integers(0, num_classes, num_points)
+    coords = rng.integers(0, 4096, (num_points, 3))
+    return coords, np.concatenate([colors, normals], axis=1), labels
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact dtype memory benchmark")
+    parser.add_argument("--num-points", type=int, default=1_000_000)
+    parser.add_argument("--num-classes", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    n = args.num_points
+    coords, features, labels = synthetic_features(n, args.num_classes, args.seed)
+
+    # previous pipeline: float32 coords and features on disk, dense float64 one-hot built per item
+    old_coords = coords.astype(np.float32)
+    old_feats = features.astype(np.float32)
+    old_labels = labels.astype(np.int64)
+    one_hot, old_time = timed(lambda: np.eye(args.num_classes)[old_labels])
+    old_stored = old_coords.nbytes + old_feats.nbytes + old_labels.nbytes
+    old_item = old_coords.nbytes + old_feats.nbytes + one_hot.nbytes
+    print(f"{'previous':>8}: stored {old_stored / n:6.1f} B/pt  item {old_item / n:6.1f} B/pt  item build {old_time * 1e3:8.2f} ms")
+
+    grid = coords.astype(np.int32)
+    compact_labels = encode_labels(labels)
+    for encoding in FEATURE_ENCODINGS:
+        feats = encode_features(features, encoding)
+        item = grid.nbytes + feats.nbytes + compact_labels.nbytes
+        error = 0.0
+        if encoding == "uint8":
+            decoded = feats.astype(np.float32)
+            decoded[:, :3] /= 255.0
+            decoded[:, 3:] = feats[:, 3:].view(np.int8) / 127.0
+            error = np.abs(decoded - features).max()
+        # items are the stored arrays as is, nothing is built per item any more
+        print(f"{encoding:>8}: stored {item / n:6.1f} B/pt  item {item / n:6.1f} B/pt  "
+              f"reduction {old_item / item:5.1f}x  max decode error {error:.4f}")
+
+
+if __name__ == "__main__":
+    main()
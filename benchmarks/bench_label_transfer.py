@@ -0,0 +1,76 @@
+"""Benchmark the batched label transfer against the old per-point KDTreeFlann loop.
+
+Synthetic labeled clouds (uniform points in a unit cube, labels from a coarse block grid)
+are voxel downsampled and labeled both ways. The loop is timed on the first --loop-limit
+downsampled points and extrapolated, a full 10M-point loop would take hours.
+
+    python benchmarks/bench_label_transfer.py --sizes 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+from statistics import mode
+
+import numpy as np
+import open3d as o3d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data"))
+from label_transfer import transfer_labels  # noqa: E402
+
+
+def synthetic_cloud(num_points, num_classes, seed):
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_points, 3))
+    block = np.floor(points * 8).astype(np.int64)
+    labels = (block[:, 0] * 64 + block[:, 1] * 8 + block[:, 2]) % num_classes + 1
+    return points, labels
+
+
+def loop_labels(pcd, labels, down_points, k):
+    pcd_tree = o3d.geometry.KDTreeFlann(pcd)
+    label_list = []
+    for point in down_points:
+        [_, idx, _] = pcd_tree.search_knn_vector_3d(point, k)
+        label_list.append(mode([labels[index] for index in idx]))
+    return np.asarray(label_list)
+
+
+def run(num_points, voxel_size, k, loop_limit, num_classes, seed):
+    points, labels = synthetic_cloud(num_points, num_classes, seed)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points)
+    down_points = np.asarray(pcd.voxel_down_sample(voxel_size).points)
+
+    start = time.perf_counter()
+    batched = transfer_labels(points, labels, down_points, k=k)
+    batched_time = time.perf_counter() - start
+
+    sample = down_points[:loop_limit]
+    start = time.perf_counter()
+    looped = loop_labels(pcd, labels, sample, k)
+    loop_time = (time.perf_counter() - start) * len(down_points) / max(len(sample), 1)
+
+    agreement = np.mean(looped == batched[:len(sample)])
+    print(f"{num_points:>11,d} pts  {len(down_points):>10,d} voxels  "
+          f"loop {loop_time:9.2f}s (est.)  batched {batched_time:7.2f}s  "
+          f"speedup {loop_time / batched_time:7.1f}x  agreement {agreement:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Label transfer benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--voxel-size", type=float, default=0.01)
+    parser.add_argument("--neighbors", type=int, default=5)
+    parser.add_argument("--loop-limit", type=int, default=200_000,
+                        help="downsampled points timed with the per-point loop (default: 200000)")
+    parser.add_argument("--num-classes", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for num_points in args.sizes:
+        run(num_points, args.voxel_size, args.neighbors, args.loop_limit, args.num_classes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
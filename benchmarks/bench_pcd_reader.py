@@ -0,0 +1,59 @@
+"""PCD loading: o3d.io.read_point_cloud vs. utils/pcd_reader.py, full reads and previews.
+
+    python benchmarks/bench_pcd_reader.py --num-points 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import open3d as o3d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from pcd_reader import read_pcd  # noqa: E402
+
+
+def timed(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PCD reader benchmark")
+    parser.add_argument("--num-points", type=int, default=2_000_000)
+    parser.add_argument("--step", type=int, default=100, help="sampling step of the preview read")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(np.round(rng.random((args.num_points, 3)) * 50, 3))
+    pcd.colors = o3d.utility.Vector3dVector(rng.integers(0, 256, (args.num_points, 3)) / 255.0)
+    pcd.normals = o3d.utility.Vector3dVector(rng.normal(size=(args.num_points, 3)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for data, kwargs in (("binary", {}), ("binary_compressed", {"compressed": True})):
+            pcd_file = os.path.join(tmp_dir, f"{data}.pcd")
+            o3d.io.write_point_cloud(pcd_file, pcd, **kwargs)
+            # open3d allocates outside the Python heap, only its time is comparable
+            _, o3d_time, _ = timed(lambda: np.asarray(o3d.io.read_point_cloud(pcd_file).points).copy())
+            print(f"{data} ({os.path.getsize(pcd_file) / 2**20:.0f} MiB): open3d {o3d_time:.3f} s")
+            runs = {
+                "all fields": lambda: read_pcd(pcd_file),
+                "xyz": lambda: read_pcd(pcd_file, fields=["x", "y", "z"]),
+                f"xyz step {args.step}": lambda: read_pcd(pcd_file, fields=["x", "y", "z"], step=args.step),
+            }
+            for name, run in runs.items():
+                records, elapsed, peak = timed(run)
+                print(f"    pcd_reader {name:>14}: {elapsed:.3f} s, {len(records)} rows, peak heap {peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark loading preprocessed scenes from pickle vs. the memory-mapped .scene format.
+
+For each size a synthetic scene (coords, colors + normals, labels) is written both ways.
+"open" is the time until the arrays are usable, "full read" additionally touches every byte
+(sum over all arrays), which is the upper bound for a training step that uses the whole scene.
+
+    python benchmarks/bench_scene_format.py --sizes 1000000 10000000
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from scene_format import read_scene, write_scene  # noqa: E402
+
+
+def synthetic_scene(num_points, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        'coords': rng.random((num_points, 3), dtype=np.float32),
+        'features': rng.random((num_points, 6), dtype=np.float32),
+        'labels': rng.integers(1, 25, num_points).astype(np.int64),
+    }
+
+
+def drop_page_cache(path):
+    # best effort, without root the numbers include warm page cache for both formats alike
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fd)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def touch_all(data):
+    return sum(float(np.asarray(array).sum()) for array in data.values())
+
+
+def run(num_points, seed, tmp_dir):
+    data = synthetic_scene(num_points, seed)
+    pkl_file = os.path.join(tmp_dir, "scene.pkl")
+    scene_file = os.path.join(tmp_dir, "scene.scene")
+    with open(pkl_file, "wb") as f:
+        pickle.dump(data, f)
+    write_scene(scene_file, data)
+
+    results = {}
+    for name, path, loader in (("pickle", pkl_file, load_pickle), ("scene", scene_file, read_scene)):
+        drop_page_cache(path)
+        loaded, open_time = timed(lambda: loader(path))
+        _, read_time = timed(lambda: touch_all(loaded))
+        results[name] = (open_time, open_time + read_time)
+
+    size_mb = os.path.getsize(scene_file) / 2**20
+    print(f"{num_points:>11,d} pts {size_mb:8.1f} MB  "
+          f"pickle open {results['pickle'][0]*1e3:9.2f} ms  full read {results['pickle'][1]*1e3:9.2f} ms  |  "
+          f"scene open {results['scene'][0]*1e3:7.2f} ms  full read {results['scene'][1]*1e3:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene format load-time benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_points in args.sizes:
+            run(num_points, args.seed, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
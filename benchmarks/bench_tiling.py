@@ -0,0 +1,63 @@
+"""Wall-clock of downsampling + normals + label transfer for one scan, untiled vs. tiled over a process pool.
+
+    python benchmarks/bench_tiling.py --num-points 5000000 --workers 1 4 16
+
+Only scales with real cores; run it on the preprocessing machine.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import open3d as o3d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data"))
+from label_transfer import transfer_labels  # noqa: E402
+from tiling import iter_tiles, map_bounded, process_tile, stitch_tiles  # noqa: E402
+
+
+def synthetic_scan(num_points, seed):
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_points, 3)) * (1.0, 1.0, 0.3)
+    points[: num_points // 2, 2] = 0.0  # a dense floor
+    return points, rng.random((num_points, 3)), rng.integers(1, 25, num_points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled preprocessing benchmark")
+    parser.add_argument("--num-points", type=int, default=2_000_000)
+    parser.add_argument("--voxel-size", type=float, default=0.005)
+    parser.add_argument("--tile-voxels", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    points, colors, labels = synthetic_scan(args.num_points, args.seed)
+    radius, overlap = args.voxel_size * 2, 4
+    origin = points.min(axis=0) - args.voxel_size * 0.5
+
+    start = time.perf_counter()
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points)
+    pcd.colors = o3d.utility.Vector3dVector(colors)
+    down = pcd.voxel_down_sample(args.voxel_size)
+    down.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=30))
+    transfer_labels(points, labels, np.asarray(down.points), k=5)
+    untiled = time.perf_counter() - start
+    print(f"{args.num_points} points -> {len(down.points)} voxels, untiled: {untiled:.2f} s")
+
+    worker = partial(process_tile, origin=origin, voxel_size=args.voxel_size, normal_radius=radius,
+                     normal_max_nn=30, label_neighbors=5)
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            tiles = iter_tiles(points, origin, args.voxel_size, args.tile_voxels, overlap, colors=colors, labels=labels)
+            result = stitch_tiles(map_bounded(pool, worker, tiles, max_pending=2 * workers))
+            elapsed = time.perf_counter() - start
+        print(f"tiled, {workers:3d} workers: {elapsed:.2f} s ({untiled / elapsed:.2f}x), {len(result['voxels'])} voxels")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Preprocessing benchmark suite on synthetic scenes, with stored baselines and a regression check.
+
+    python benchmarks/suite.py run --sizes 100000 1000000 10000000 --output baseline.json
+    python benchmarks/suite.py run --sizes 100000 1000000 10000000 --output current.json
+    python benchmarks/suite.py compare baseline.json current.json --threshold 0.1
+
+"run" writes deterministic PCD + ASC pairs (utils/synthetic_scene.py, cached in the work
+directory), then times every Preprocessor stage, a full preprocessing.main() run (including
+scheduling and the worker pool) and reading the preprocessed scene back, with PointCloudDataset
+when torch and MinkowskiEngine are installed. Every benchmark is repeated and the fastest run
+is kept. "compare" prints current / baseline per benchmark and exits with 1 if any got slower
+than the threshold allows, so it can gate a CI job. Only compare results of the same machine.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for path in ("src/data", "utils", "config", "data"):
+    sys.path.insert(0, os.path.join(ROOT, path))
+from synthetic_scene import ensure_pair  # noqa: E402
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info() -> dict:
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def prepare_work_dir(work_dir, num_workers: int) -> None:
+    """ config.yaml of the repository with benchmark paths, the modules read it from the working directory. """
+    with open(os.path.join(ROOT, "config", "config.yaml")) as f:
+        config = yaml.full_load(f)
+    config.update({
+        'preprocessed_data_dir': "preprocessed",
+        'preprocessed_train_dir': "preprocessed",
+        'incremental': False,
+        'profile_stages': False,
+        'cprofile_file': None,
+        'num_workers': num_workers,
+        'schedule_summary_file': "logs/preprocess_schedule.json",
+    })
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(work_dir, "config.yaml"), "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+
+def fastest(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_stages(preprocessing, pcd_file, asc_file, repeat: int) -> dict:
+    """ Fastest wall time of every Preprocessor stage over repeat in-process runs """
+    best = {}
+    for _ in range(repeat):
+        profiler = preprocessing.StageProfiler(enabled=True)
+        preprocessor = preprocessing.Preprocessor(preprocessing.cfg.voxel_size, preprocessing.cfg.ingest_mode,
+                                                  preprocessing.cfg.reuse_normals, preprocessing.cfg.normal_radius,
+                                                  preprocessing.cfg.normal_max_nn, profiler)
+        preprocessor.process_files(pcd_file, asc_file)
+        for record in profiler.records:
+            best[record['stage']] = min(best.get(record['stage'], float("inf")), record['wall_seconds'])
+    return best
+
+
+def bench_main(preprocessing, utils, data_dir, repeat: int) -> float:
+    """ Fastest preprocessing.main() over the pair in data_dir """
+    cfg = preprocessing.Config(dict(preprocessing.config_data, pcd_files_path=os.path.join(data_dir, "pcd"),
+                                    asc_files_path=os.path.join(data_dir, "asc")))
+    preprocessing.cfg = utils.cfg = cfg
+    return fastest(preprocessing.main, repeat)
+
+
+def bench_loading(scene_file, repeat: int):
+    """ Reading the preprocessed scene and touching every array, directly and through PointCloudDataset """
+    from scene_format import read_scene
+
+    def read():
+        for array in read_scene(scene_file).values():
+            if isinstance(array, np.ndarray):
+                np.add.reduce(array, axis=None, dtype=np.float64)
+
+    results, skipped = {'read_scene': fastest(read, repeat)}, {}
+    try:
+        dataset_module = importlib.import_module("dataset")
+    except ImportError as e:
+        skipped['dataset'] = f"PointCloudDataset not importable: {e}"
+        return results, skipped
+
+    def load():
+        dataset = dataset_module.PointCloudDataset("train")
+        for i in range(len(dataset)):
+            for array in dataset[i]:
+                np.add.reduce(np.asarray(array), axis=None, dtype=np.float64)
+
+    results['dataset'] = fastest(load, repeat)
+    return results, skipped
+
+
+def run(args) -> None:
+    work_dir = os.path.abspath(args.work_dir)
+    output = os.path.abspath(args.output)
+    prepare_work_dir(work_dir, args.workers)
+    os.chdir(work_dir)
+    import preprocessing
+    import utils
+
+    results, skipped = {}, {}
+    for size in args.sizes:
+        data_dir = os.path.join(work_dir, "raw", str(size))
+        start = time.perf_counter()
+        pcd_file, asc_file = ensure_pair(data_dir, size, args.seed)
+        print(f"{size} points: scene ready after {time.perf_counter() - start:.1f} s", flush=True)
+        shutil.rmtree(preprocessing.cfg.preprocessed_data_dir, ignore_errors=True)
+        os.makedirs(preprocessing.cfg.preprocessed_data_dir)
+
+        for stage, seconds in bench_stages(preprocessing, pcd_file, asc_file, args.repeat).items():
+            results[f"stage.{stage}@{size}"] = seconds
+        os.remove(preprocessing.processed_file_path(os.path.splitext(os.path.basename(pcd_file))[0]))
+        results[f"main@{size}"] = bench_main(preprocessing, utils, data_dir, args.repeat)
+
+        scene_file = preprocessing.processed_file_path(os.path.splitext(os.path.basename(pcd_file))[0])
+        loading, loading_skipped = bench_loading(scene_file, args.repeat)
+        results.update({f"load.{name}@{size}": seconds for name, seconds in loading.items()})
+        skipped.update({f"load.{name}@{size}": reason for name, reason in loading_skipped.items()})
+        for name in sorted(key for key in results if key.endswith(f"@{size}")):
+            print(f"  {name:<28} {results[name]:9.3f} s", flush=True)
+
+    meta = dict(machine_info(), sizes=args.sizes, seed=args.seed, repeat=args.repeat, workers=args.workers)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({'meta': meta, 'results': results, 'skipped': skipped}, f, indent=2)
+    print(f"Wrote {output}")
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_seconds: float) -> list:
+    """ (name, baseline s, current s, ratio, regressed) for every benchmark in both result sets.
+    A benchmark regressed when it is more than threshold slower and also min_seconds slower in absolute terms.
+    """
+    rows = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = baseline['results'][name], current['results'][name]
+        ratio = after / before if before > 0 else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + threshold and after - before > min_seconds))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks and write a JSON result file")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest counts")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    run_parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "preprocess-benchmark"),
+                            help="synthetic scenes are kept here between runs")
+    run_parser.add_argument("--output", default="benchmark.json")
+    compare_parser = commands.add_parser("compare", help="flag regressions of a result file against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative slowdown")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05,
+                                help="ignore slowdowns smaller than this, timer noise of short benchmarks")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for key in ('cpu_count', 'platform'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Warning: {key} differs ({baseline['meta'].get(key)} vs. {current['meta'].get(key)})")
+    rows = compare(baseline, current, args.threshold, args.min_seconds)
+    print(f"{'benchmark':<28} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, before, after, ratio, regressed in rows:
+        print(f"{name:<28} {before:9.3f}s {after:9.3f}s {ratio:7.2f}{'  REGRESSION' if regressed else ''}")
+    for name in sorted(set(baseline['results']) ^ set(current['results'])):
+        print(f"{name:<28} only in {'baseline' if name in baseline['results'] else 'current'}")
+    regressions = [row for row in rows if row[4]]
+    print(f"{len(regressions)} of {len(rows)} benchmarks regressed by more than {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
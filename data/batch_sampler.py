@@ -0,0 +1,125 @@
+import numpy as np
+
+
+class PointBudgetBatchSampler:
+    """
+    Batch sampler packing scenes up to a total point budget per batch, for DataLoader(batch_sampler=...).
+
+    Scenes are sorted by point count and cut into buckets of bucket_size neighbours. Every epoch the
+    scenes are shuffled within their bucket and packed greedily into batches of at most point_budget
+    points, and the batch order is shuffled. Batches therefore hold scenes of similar size and
+    similar point totals, small rooms share a batch and a huge floor comes alone. A scene larger
+    than the budget is a batch of its own. The order only depends on (seed, epoch): set_epoch() is
+    honoured and otherwise every iteration advances the epoch. The epoch advances when the next
+    iteration starts, not when one ends, so len() during an epoch is the length of that epoch.
+
+    Attributes:
+        point_counts (np.ndarray): points per scene, e.g. from PointCloudDataset.point_counts().
+        epoch (int): epoch of the current iteration, or of the first one before any started.
+    """
+    def __init__(self, point_counts, point_budget: int, shuffle: bool = True, seed: int = 0, bucket_size: int = 64,
+                 drop_last: bool = False):
+        assert point_budget > 0, "The point budget must be positive"
+        self.point_counts = np.asarray(point_counts, dtype=np.int64)
+        self.point_budget = point_budget
+        self.shuffle = shuffle
+        self.seed = seed
+        self.bucket_size = max(1, bucket_size)
+        self.drop_last = drop_last
+        self.epoch = 0
+        self._started = False
+        self._cache = None
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+        self._started = False
+
+    def batches(self, epoch: int = None) -> list:
+        """ Index lists of all batches of an epoch (the current one by default) """
+        epoch = self.epoch if epoch is None else epoch
+        if self._cache is not None and self._cache[0] == epoch:
+            return self._cache[1]
+        rng = np.random.default_rng([self.seed, epoch])
+        order = np.argsort(self.point_counts, kind="stable")
+        if self.shuffle:
+            buckets = [order[start:start + self.bucket_size] for start in range(0, len(order), self.bucket_size)]
+            order = np.concatenate([rng.permutation(bucket) for bucket in buckets]) if buckets else order
+
+        batches, batch, points = [], [], 0
+        for i in order.tolist():
+            if batch and points + self.point_counts[i] > self.point_budget:
+                batches.append(batch)
+                batch, points = [], 0
+            batch.append(i)
+            points += self.point_counts[i]
+        if batch and not (self.drop_last and points < self.point_budget // 2):
+            # with drop_last a last batch of less than half the budget is dropped
+            batches.append(batch)
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        self._cache = (epoch, batches)
+        return batches
+
+    def __iter__(self):
+        if self._started:
+            self.epoch += 1
+        self._started = True
+        return iter(self.batches())
+
+    def __len__(self):
+        return len(self.batches())
+
+    def stats(self, epoch: int = None) -> dict:
+        """ Batch count and points per batch (mean, coefficient of variation, max, mean fill of the budget) """
+        points = np.array([self.point_counts[batch].sum() for batch in self.batches(epoch)], dtype=np.float64)
+        if not len(points):
+            return {'batches': 0}
+        return {
+            'batches': len(points),
+            'points_mean': float(points.mean()),
+            'points_cv': float(points.std() / points.mean()) if points.mean() else 0.0,
+            'points_max': int(points.max()),
+            'budget_fill': float(np.minimum(points, self.point_budget).mean() / self.point_budget),
+            'over_budget': int((points > self.point_budget).sum()),
+        }
+
+
+def fixed_batches(num_scenes: int, batch_size: int, shuffle: bool = True, seed: int = 0, epoch: int = 0) -> list:
+    """ Batches of a plain DataLoader(batch_size, shuffle), to compare the point budget sampler against """
+    order = np.random.default_rng([seed, epoch]).permutation(num_scenes) if shuffle else np.arange(num_scenes)
+    return [order[start:start + batch_size].tolist() for start in range(0, num_scenes, batch_size)]
+
+
+class EpochSampler:
+    """
+    Sampler of (epoch, index) pairs, for datasets whose items depend on the epoch, like the random crops of
+    PointCloudDataset: dataloader workers hold a copy of the dataset, so the epoch travels with the index.
+    Like PointBudgetBatchSampler every iteration advances the epoch unless set_epoch() is called.
+    """
+    def __init__(self, length: int):
+        self.length = length
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def __iter__(self):
+        epoch = self.epoch
+        self.epoch += 1
+        return ((epoch, i) for i in range(self.length))
+
+    def __len__(self):
+        return self.length
+
+
+def shard_scenes(point_counts, num_shards: int) -> list:
+    """ Scene indices in num_shards shards of similar point totals: largest scene first onto the lightest shard.
+    Every shard is sorted, so a shard is evaluated in dataset order. """
+    point_counts = np.asarray(point_counts, dtype=np.int64)
+    shards = [[] for _ in range(max(1, num_shards))]
+    loads = np.zeros(len(shards), dtype=np.int64)
+    for i in np.argsort(-point_counts, kind="stable").tolist():
+        lightest = int(np.argmin(loads))
+        shards[lightest].append(i)
+        loads[lightest] += point_counts[i]
+    return [sorted(shard) for shard in shards if shard]
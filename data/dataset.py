@@ -6,6 +6,10 @@ import torch
 import numpy as np
 from config import Config
 from utils import load_config_file, get_logger
+from scene_format import read_scene, read_scene_header, SCENE_SUFFIX
+from scene_cache import SceneCache
+from splits import read_manifest, split_scenes
+from block_index import build_block_index, block_weights, class_weights, has_block_index, sample_crop, INDEX_ARRAYS
 
 
 logger = get_logger("logs/log-dataset.txt", __name__)
@@ -14,17 +18,33 @@ config_data = load_config_file("config.yaml")
 cfg = Config(config_data)
 
 
+def scene_name(file_name):
+    """ Raw scene name of a preprocessed file, "<name>_preprocessed.scene" -> "<name>" """
+    stem = os.path.splitext(file_name)[0]
+    return stem[:-len("_preprocessed")] if stem.endswith("_preprocessed") else stem
+
+
 class PointCloudDataset(Dataset):
     """
     A PyTorch Dataset class for loading and processing point cloud data in a Minkowskiengine compatible format.
 
+    With cfg.split_manifest the scenes of the split are taken from preprocessed_data_dir by the
+    names in the manifest (utils/splits.py) instead of from one directory per split.
+    With cfg.crop_sampling every training item is a random crop of cfg.crop_voxels around a center
+    drawn through the block index stored with the scene (utils/block_index.py), an epoch has
+    cfg.crops_per_epoch items and a crop at most cfg.crop_max_points points.
+    Construction only indexes file names and sizes, scenes are loaded on first access
+    through a byte-bounded LRU cache (cfg.scene_cache_bytes, per process).
+
     Attributes:
-        data_list (list): A list of dictionaries containing data for each point cloud.
         data_list_files (list): A list of file paths for point cloud data files.
+        data_list_sizes (list): File sizes in bytes, aligned with data_list_files.
+        scene_cache (SceneCache): Loaded scenes, see scene_cache.stats() for hit/miss counters.
+        shared_pool (SharedScenePool): If attached, scenes are read from shared memory instead.
         num_classes (int): The number of unique classes in the dataset.
         Config is instance based.
     """
-    def __init__(self, mode, config_file="config.yaml"):
+    def __init__(self, mode, config_file="config.yaml", seed=0):
         cfg = Config(config_file)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -36,52 +56,131 @@ class PointCloudDataset(Dataset):
 
         assert mode in DATA_DIRS.keys(), f"Invalid mode. Must be one of {list(DATA_DIRS.keys())}"
         data_list_dir = DATA_DIRS[mode]
-
-        self.data_list = []
-        self.data_list_files = [os.path.join(data_list_dir, f) for f in os.listdir(data_list_dir) if f.endswith('.pkl')]
-
-        for data_list_file in self.data_list_files:
-            with open(data_list_file, 'rb') as f:
-                data_list = pickle.load(f)
-                #print(f"Loaded data_list from {data_list_file}: {data_list}")  # for debugging
-                self.data_list.append(data_list)
-
+        split_members = None
+        if cfg.split_manifest is not None:
+            # all splits live in preprocessed_data_dir, the manifest names the scenes of this one
+            data_list_dir = cfg.preprocessed_data_dir
+            split_members = split_scenes(read_manifest(cfg.split_manifest), mode)
+
+        entries = sorted((entry for entry in os.scandir(data_list_dir) if entry.is_file()), key=lambda entry: entry.name)
+        if split_members is not None:
+            entries = [entry for entry in entries if scene_name(entry.name) in split_members]
+        # a converted .scene file takes precedence over the .pkl it was made from
+        scenes = {os.path.splitext(entry.name)[0] for entry in entries if entry.name.endswith(SCENE_SUFFIX)}
+        entries = [entry for entry in entries if entry.name.endswith(SCENE_SUFFIX)
+                   or (entry.name.endswith('.pkl') and os.path.splitext(entry.name)[0] not in scenes)]
+        self.data_list_files = [entry.path for entry in entries]
+        self.data_list_sizes = [entry.stat().st_size for entry in entries]
+
+        self.scene_cache = SceneCache(self.load_scene, cfg.scene_cache_bytes)
+        self.shared_pool = None
         self.num_classes = cfg.num_classes
 
+        # crop sampling: items are random spatial crops, the index depends on (seed, epoch, item) only
+        self.crop = cfg.crop_sampling and mode == "train"
+        self.crop_voxels = cfg.crop_voxels
+        self.crop_block_voxels = cfg.crop_block_voxels
+        self.crops_per_epoch = cfg.crops_per_epoch
+        self.crop_max_points = cfg.crop_max_points
+        self.crop_rare_class_alpha = cfg.crop_rare_class_alpha
+        self.seed = seed
+        self.epoch = 0
+        self._block_indexes = {}
+        self._crop_tables = None
+
+    def load_scene(self, i):
+        data_list_file = self.data_list_files[i]
+        if data_list_file.endswith(SCENE_SUFFIX):
+            # memory-mapped, pages are only read when they are touched
+            return read_scene(data_list_file)
+        with open(data_list_file, 'rb') as f:
+            return pickle.load(f)
+
+    def scene_layout(self, i):
+        """ {name: (dtype, shape)} of scene i, read from the header only for .scene files """
+        if self.data_list_files[i].endswith(SCENE_SUFFIX):
+            header = read_scene_header(self.data_list_files[i])
+            return {name: (entry['dtype'], entry['shape']) for name, entry in header['arrays'].items()}
+        return {name: (array.dtype, array.shape) for name, array in self.load_scene(i).items() if isinstance(array, np.ndarray)}
+
+    def num_scenes(self):
+        """ Scenes of the split, len() counts crops in crop sampling mode """
+        return len(self.data_list_files)
+
+    def point_counts(self):
+        """ Points (voxels) per scene from the file headers, without loading the scenes """
+        return np.array([self.scene_layout(i)['coords'][1][0] for i in range(self.num_scenes())], dtype=np.int64)
+
+    def attach_pool(self, pool):
+        assert len(pool) == self.num_scenes(), "The shared pool was built from a different dataset"
+        self.shared_pool = pool
+
+    def set_epoch(self, epoch):
+        """ Crops of the next epoch, call before its dataloader iterator is created """
+        self.epoch = epoch
+
+    def scene(self, i):
+        return self.shared_pool[i] if self.shared_pool is not None else self.scene_cache.get(i)
+
+    def block_index(self, i):
+        """ (index arrays, row order or None, block voxels) of scene i. Scenes written before the index existed get
+        one built in memory, with the row order it needs. """
+        if i not in self._block_indexes:
+            data = self.scene(i)
+            if has_block_index(data):
+                if self.data_list_files[i].endswith(SCENE_SUFFIX):
+                    block_voxels = read_scene_header(self.data_list_files[i])['meta']['block_voxels']
+                else:
+                    block_voxels = self.load_scene(i)['block_voxels']
+                self._block_indexes[i] = ({name: np.asarray(data[name]) for name in INDEX_ARRAYS}, None, block_voxels)
+            else:
+                logger.warning("%s has no block index, building it in memory; rerun preprocessing to store it",
+                               self.data_list_files[i])
+                order, index = build_block_index(data['coords'], data['labels'], self.crop_block_voxels, self.num_classes)
+                self._block_indexes[i] = (index, order, self.crop_block_voxels)
+        return self._block_indexes[i]
+
+    def crop_tables(self):
+        """ Per scene cumulative block weights and the cumulative scene weights crops are drawn with """
+        if self._crop_tables is None:
+            indexes = [self.block_index(i)[0] for i in range(self.num_scenes())]
+            weights = None
+            if self.crop_rare_class_alpha:
+                num_classes = max(index['block_class_counts'].shape[1] for index in indexes)
+                totals = np.zeros(num_classes)
+                for index in indexes:
+                    totals[:index['block_class_counts'].shape[1]] += index['block_class_counts'].sum(axis=0)
+                weights = class_weights(totals, self.crop_rare_class_alpha)
+            cumulative = [np.cumsum(block_weights(index, weights)) for index in indexes]
+            self._crop_tables = (cumulative, np.cumsum([c[-1] if len(c) else 0.0 for c in cumulative]))
+        return self._crop_tables
+
+    def crop_item(self, i):
+        """ Crop i of the current epoch, or of epoch e for i = (e, i) as yielded by batch_sampler.EpochSampler """
+        epoch, i = i if isinstance(i, tuple) else (self.epoch, i)
+        rng = np.random.default_rng([self.seed, epoch, i])
+        cumulative, scene_cumulative = self.crop_tables()
+        scene = int(np.searchsorted(scene_cumulative, rng.random() * scene_cumulative[-1], side="right"))
+        scene = min(scene, len(scene_cumulative) - 1)
+        index, order, block_voxels = self.block_index(scene)
+        data = self.scene(scene)
+        rows = sample_crop(index, data['coords'], block_voxels, self.crop_voxels, rng, cumulative[scene],
+                           self.crop_max_points, order)
+        return data['coords'][rows], data['features'][rows], data['labels'][rows]
+
     def __len__(self):
-        return len(self.data_list)
+        return self.crops_per_epoch if self.crop else self.num_scenes()
 
     def __getitem__(self, i):
-        
-        data = self.data_list[i]
-        print(f"Data at index {i}: {data}")  # for debugging
-        
-        '''
-        Data at index 1: features
-        Data at index 5: labels
-        Data at index 4: features
-        Data at index 2: labels
-        Data at index 3: coords
-        Data at index 6: coords
-        Data at index 0: coords
-        '''
+        if self.crop:
+            return self.crop_item(i)
+        data = self.scene(i)
+
+        # int32 voxel grid, quantized and stride-aligned once at preprocessing time
         coords = data['coords']
-        
-        #stride check
-        coords_np = np.array(coords)
-        is_aligned = np.all(coords_np % cfg.stride == 0)
-        assert is_aligned, "Coordinates are not aligned with the tensor stride: Dataset.py"
-        
+        # compact encoded features and uint8 class indices (no one-hot), expanded to float on the
+        # device with feature_codec.decode_features / decode_labels after the batch was transferred
         feats = data['features']
         labels = data['labels']
 
-        # One-hot encode labels using numpy array
-        labels_one_hot = np.eye(self.num_classes)[labels]
-        # import torch.nn.functional as F
-        # labels = F.one_hot(labels, num_classes=num_classes).float()
-
-        print("Coords shapes:", [c.shape for c in [coords]])
-        print("Features shape:", feats.shape)  # Add this line
-        print("Labels shape:", labels_one_hot.shape)  # Add this line
-
-        return coords, feats, labels_one_hot
+        return coords, feats, labels
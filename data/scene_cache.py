@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import numpy as np
+
+
+def scene_nbytes(scene: dict) -> int:
+    return sum(value.nbytes for value in scene.values() if isinstance(value, np.ndarray))
+
+
+class SceneCache:
+    """
+    Least recently used cache of loaded scenes, bounded by the total size of their arrays.
+
+    Attributes:
+        max_bytes (int): byte budget, the most recently used scene is kept even if it alone exceeds it.
+        hits, misses, evictions (int): counters, see stats().
+    """
+    def __init__(self, loader, max_bytes: int):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.scenes = OrderedDict()
+        self.sizes = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.scenes)
+
+    def __contains__(self, key):
+        return key in self.scenes
+
+    def get(self, key):
+        if key in self.scenes:
+            self.hits += 1
+            self.scenes.move_to_end(key)
+            return self.scenes[key]
+
+        self.misses += 1
+        scene = self.loader(key)
+        self.scenes[key] = scene
+        self.sizes[key] = scene_nbytes(scene)
+        self.current_bytes += self.sizes[key]
+        while self.current_bytes > self.max_bytes and len(self.scenes) > 1:
+            evicted, _ = self.scenes.popitem(last=False)
+            self.current_bytes -= self.sizes.pop(evicted)
+            self.evictions += 1
+        return scene
+
+    def __getstate__(self):
+        # cached scenes are not shipped to DataLoader worker processes, each starts empty
+        state = self.__dict__.copy()
+        state.update(scenes=OrderedDict(), sizes={}, current_bytes=0)
+        return state
+
+    def clear(self):
+        self.scenes.clear()
+        self.sizes.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'cached_scenes': len(self.scenes),
+            'cached_bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
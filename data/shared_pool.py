@@ -0,0 +1,107 @@
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _attach(name):
+    """ Attach to an existing block without registering it with the resource tracker, which would unlink it on exit.
+
+    Before python 3.13 every attach registers the block. Workers (fork and spawn) share the tracker process of the
+    parent, so unregistering afterwards would also drop the registration of the owner; the registration is skipped
+    instead, for this call only.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # python >= 3.13
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedScenePool:
+    """
+    All scenes of a dataset packed into one shared memory block, filled once by the parent process.
+
+    Pickling a pool only transfers the block name and the array layout, so DataLoader workers
+    (fork or spawn) attach to the same physical pages instead of receiving a copy of the data.
+    Arrays handed out by the pool are read-only views. The parent owns the block and must call
+    unlink() (or use the pool as a context manager) when training is done.
+
+    Attributes:
+        layout (list): per scene {name: (dtype str, shape, offset)}.
+        nbytes (int): size of the shared block.
+    """
+    def __init__(self, layouts, fill):
+        """
+        Args:
+            layouts: per scene {name: (dtype, shape)}, used to size the block before anything is loaded
+            fill: callable(i) returning the arrays of scene i, called once per scene
+        """
+        self.layout = []
+        offset = 0
+        for scene_layout in layouts:
+            entry = {}
+            for name, (dtype, shape) in scene_layout.items():
+                dtype, shape = np.dtype(dtype), tuple(shape)
+                entry[name] = (dtype.str, shape, offset)
+                offset = _align(offset + dtype.itemsize * int(np.prod(shape)))
+            self.layout.append(entry)
+        self.nbytes = offset
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(self.nbytes, 1))
+        self.owner = True
+        for i in range(len(self.layout)):
+            scene = fill(i)
+            for name, (dtype, shape, offset) in self.layout[i].items():
+                target = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+                target[...] = scene[name]
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        return cls([dataset.scene_layout(i) for i in range(dataset.num_scenes())], dataset.load_scene)
+
+    def __len__(self):
+        return len(self.layout)
+
+    def __getitem__(self, i):
+        scene = {}
+        for name, (dtype, shape, offset) in self.layout[i].items():
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            array.flags.writeable = False
+            scene[name] = array
+        return scene
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'layout': self.layout, 'nbytes': self.nbytes}
+
+    def __setstate__(self, state):
+        self.layout = state['layout']
+        self.nbytes = state['nbytes']
+        self.shm = _attach(state['name'])
+        self.owner = False
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # views handed out by __getitem__ are still alive, the mapping goes away with them
+
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
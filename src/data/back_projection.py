@@ -0,0 +1,70 @@
+"""Back-projection of per-voxel predictions onto every point of the original scan.
+
+Preprocessing writes <scene>.points.npy next to each scene: one int32 per row of the input file,
+the row of the saved scene holding that point's voxel, or -1 for rows without one (non-finite
+points, voxels dropped by validation). Labels or logits of all points are then a single gather,
+voxel_values[point_index]. For the -1 rows back_project can fall back to the k nearest voxel
+centers (cKDTree, like label_transfer in the other direction): majority vote for labels, mean
+for logits.
+"""
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from label_transfer import majority_vote
+
+POINT_INDEX_SUFFIX = ".points.npy"
+
+
+def point_index_file(scene_file) -> str:
+    """ <name>_preprocessed.scene (or .pkl) -> <name>_preprocessed.points.npy """
+    return os.path.splitext(str(scene_file))[0] + POINT_INDEX_SUFFIX
+
+
+def write_point_index(index_file, point_index: np.ndarray) -> None:
+    # write-then-rename like the scene itself
+    with open(index_file + ".tmp", "wb") as f:
+        np.save(f, np.asarray(point_index, dtype=np.int32))
+    os.replace(index_file + ".tmp", index_file)
+
+
+def read_point_index(index_file, mmap: bool = True) -> np.ndarray:
+    """ Memory-mapped by default, slice it to back-project a huge scan in chunks """
+    return np.load(index_file, mmap_mode="r" if mmap else None)
+
+
+def back_project(voxel_values: np.ndarray, point_index: np.ndarray, voxel_points: np.ndarray = None,
+                 points: np.ndarray = None, k: int = 0, fill=0, workers: int = -1) -> np.ndarray:
+    """ Values (labels (m,) or logits (m, c)) of the voxels -> values of the points.
+    Args:
+        point_index: row of voxel_values of every point, -1 for points without a voxel
+        voxel_points: (m, 3) voxel centers, needed with k > 0
+        points: (n, 3) coordinates of all points, or only of the -1 rows in order, in the space of voxel_points
+        k: neighbours of the fallback for -1 rows, 0 fills them with fill instead
+    """
+    voxel_values = np.asarray(voxel_values)
+    point_index = np.asarray(point_index)
+    missing = point_index < 0
+    values = voxel_values[np.where(missing, 0, point_index)] if len(voxel_values) else \
+        np.empty((len(point_index),) + voxel_values.shape[1:], dtype=voxel_values.dtype)
+    missing_rows = np.flatnonzero(missing)
+    if not len(missing_rows):
+        return values
+    values[missing_rows] = fill
+    if k <= 0 or not len(voxel_values):
+        return values
+
+    points = np.asarray(points, dtype=np.float64)
+    missing_points = points[missing_rows] if len(points) == len(point_index) else points
+    if len(missing_points) != len(missing_rows):
+        raise ValueError(f"Got {len(points)} points for {len(point_index)} rows, {len(missing_rows)} of them without a voxel")
+    finite = np.isfinite(missing_points).all(axis=1)  # non-finite input rows keep fill
+    k = min(k, len(voxel_values))
+    _, neighbors = cKDTree(np.asarray(voxel_points)).query(missing_points[finite], k=k, workers=workers)
+    if np.issubdtype(voxel_values.dtype, np.floating):
+        neighbor_values = voxel_values[neighbors]
+        values[missing_rows[finite]] = neighbor_values.mean(axis=1) if k > 1 else neighbor_values
+    else:
+        values[missing_rows[finite]] = majority_vote(voxel_values[neighbors])
+    return values
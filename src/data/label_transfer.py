@@ -0,0 +1,49 @@
+"""Batched label transfer from a dense labeled cloud onto its downsampled points.
+
+One bulk k-NN query (multi-threaded through scipy's cKDTree) replaces the per-point
+KDTreeFlann search, and the neighbour labels are reduced with a vectorized majority vote.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def majority_vote(neighbor_labels: np.ndarray) -> np.ndarray:
+    """ Row-wise mode of a (n, k) label matrix.
+    Args:
+        neighbor_labels: labels of the k nearest neighbours, nearest first
+    Ties go to the label that appears first in the row (the nearest neighbour),
+    which is exactly what statistics.mode returns for the old per-point loop.
+    """
+    if neighbor_labels.ndim == 1:
+        return neighbor_labels.copy()
+    # counts[i, j] = number of times neighbor_labels[i, j] occurs in row i, O(n * k^2) with small k
+    counts = (neighbor_labels[:, :, None] == neighbor_labels[:, None, :]).sum(axis=2)
+    first_mode = np.argmax(counts, axis=1)
+    return neighbor_labels[np.arange(len(neighbor_labels)), first_mode]
+
+
+def transfer_labels(source_points: np.ndarray, source_labels: np.ndarray, query_points: np.ndarray,
+                    k: int = 5, workers: int = -1, chunk_size: int = 1_000_000) -> np.ndarray:
+    """ Assign each query point the majority label of its k nearest source points.
+    Args:
+        source_points: (n, 3) full resolution coordinates
+        source_labels: (n,) labels aligned with source_points
+        query_points: (m, 3) coordinates to label, e.g. the voxel downsampled cloud
+        k: number of neighbours that vote
+        workers: threads used by the k-NN query, -1 uses all cores
+        chunk_size: query points per batch, bounds the (chunk_size, k) index matrix
+    """
+    source_labels = np.asarray(source_labels)
+    if len(source_points) != len(source_labels):
+        raise ValueError(f"Got {len(source_points)} points but {len(source_labels)} labels")
+    k = min(k, len(source_points))
+    tree = cKDTree(np.asarray(source_points))
+    query_points = np.asarray(query_points)
+
+    labels = np.empty(len(query_points), dtype=source_labels.dtype)
+    for start in range(0, len(query_points), chunk_size):
+        stop = start + chunk_size
+        _, idx = tree.query(query_points[start:stop], k=k, workers=workers)
+        labels[start:stop] = majority_vote(source_labels[idx])
+    return labels
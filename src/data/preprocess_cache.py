@@ -0,0 +1,62 @@
+"""Incremental preprocessing: skip PCD/ASC pairs whose output is already up to date.
+
+Every output file gets a <output>.key record holding a hash of its inputs (size + mtime,
+or the full content with full_hash) and of the preprocessing parameters it was built with.
+The record is written only after the output itself has been atomically replaced, so an
+interrupted run leaves either a valid pair or an output that is redone on the next run.
+"""
+import hashlib
+import json
+import os
+
+# bump when the pipeline changes in a way that invalidates existing outputs
+PREPROCESS_VERSION = 4
+
+
+def file_fingerprint(path, full_hash: bool = False, block_size: int = 16 * 1024 * 1024) -> str:
+    """ size + mtime of a file, or the sha256 of its content with full_hash """
+    stat = os.stat(path)
+    if not full_hash:
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(input_files, params: dict, full_hash: bool = False) -> dict:
+    """ Describe one output by the fingerprints of its inputs and the parameters it depends on. """
+    record = {
+        "version": PREPROCESS_VERSION,
+        "inputs": {os.path.basename(str(f)): file_fingerprint(f, full_hash) for f in input_files},
+        "params": params,
+    }
+    record["key"] = hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+    return record
+
+
+def key_file(output_file) -> str:
+    return f"{output_file}.key"
+
+
+def is_up_to_date(output_file, record: dict) -> bool:
+    if not os.path.exists(output_file) or not os.path.exists(key_file(output_file)):
+        return False
+    try:
+        with open(key_file(output_file)) as f:
+            return json.load(f).get("key") == record["key"]
+    except (OSError, ValueError):
+        return False
+
+
+def mark_done(output_file, record: dict) -> None:
+    tmp_file = key_file(output_file) + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, key_file(output_file))
+
+
+def invalidate(output_file) -> None:
+    if os.path.exists(key_file(output_file)):
+        os.remove(key_file(output_file))
@@ -1,16 +1,32 @@
 import logging
 import os
-from statistics import mode
 from pathlib import Path
 import open3d as o3d
 import numpy as np
 from config import Config
 import numpy.lib.recfunctions as rfn
-from utils import files_match_making
+from utils import catalog_entries
+from splits import read_manifest, split_scenes
+from label_transfer import transfer_labels
+from asc_reader import read_asc
+from pcd_reader import read_pcd, unpack_rgb
+from scene_format import write_scene, SCENE_SUFFIX
+from quantize import quantize, point_voxel_index
+from back_projection import point_index_file, write_point_index
+from block_index import build_block_index
+from validation import validate_rows
+from tiling import iter_tiles, process_tile, stitch_tiles, map_bounded
+from profiling import StageProfiler, aggregate_profiles, clear_profiles
+from scheduler import CostModel, available_memory, run_scheduled, summarize, write_summary
+from concurrent.futures import ProcessPoolExecutor
+from feature_codec import encode_features, encode_labels
+from preprocess_cache import cache_key, invalidate, is_up_to_date, mark_done
+from functools import partial
 import pickle
-from tqdm.contrib.concurrent import process_map
+import cProfile
+from tqdm import tqdm
 from colorama import Fore
-from utils import load_config_file, get_logger
+from utils import load_config_file, get_logger, lazy, worker_init
 import time 
 
 logger = get_logger("logs/log-preprocess_minkowski.txt", __name__)
@@ -19,51 +35,172 @@ config_data = load_config_file("config.yaml")
 cfg = Config(config_data)
 
 class Preprocessor:
-    def __init__(self, voxel_size):
+    """
+    ingest_mode "pcd" reads the geometry from the PCD file and only the labels from the ASC file,
+    "asc" builds the whole cloud from the ASC file alone. With reuse_normals the normals stored
+    in the input file are averaged per voxel instead of being re-estimated.
+    """
+    def __init__(self, voxel_size, ingest_mode="pcd", reuse_normals=False, normal_radius=None, normal_max_nn=30,
+                 profiler=None):
+        assert ingest_mode in ("pcd", "asc"), f"Invalid ingest mode {ingest_mode}. Must be 'pcd' or 'asc'"
         self.voxel_size = voxel_size
+        self.ingest_mode = ingest_mode
+        self.reuse_normals = reuse_normals
+        self.normal_radius = normal_radius if normal_radius is not None else voxel_size * 2
+        self.normal_max_nn = normal_max_nn
+        self.pcd = None
+        self.down_pcd = None
         self.feature_arr = None 
         self.base_file_name = None 
+        self.profiler = profiler or StageProfiler(enabled=False)
         
-    def process_files(self, pcd_file, asc_file):
+    def process_files(self, pcd_file, asc_file, tile_pool=None):
+        """ With a tile_pool (an executor), downsampling, normals and labels are computed per spatial tile in it. """
+        self.base_file_name = os.path.splitext(os.path.basename(pcd_file))[0]
+        stage = self.profiler.stage
+        with stage("load", self.point_count):
+            if self.ingest_mode == "asc":
+                self.load_asc_cloud(asc_file)
+            else:
+                self.load_pcd(pcd_file)
+                self.load_asc(asc_file)
+        with stage("normalize", self.point_count):
+            self.normalize_pcd()
+        if tile_pool is not None:
+            with stage("tiles", self.point_count):
+                self.process_tiles(tile_pool)
+        else:
+            with stage("downsample", self.point_count):
+                self.downsample_pcd()
+            with stage("normals", self.point_count):
+                if self.reuse_normals and self.down_pcd.has_normals():
+                    self.down_pcd.normalize_normals()
+                    logger.info("Reusing the normals stored in the ASC file")
+                else:
+                    self.estimate_normals()
+            with stage("labels", self.point_count):
+                self.assign_label()
+        with stage("features", self.point_count):
+            self.generate_feature_arr()
+        with stage("validate", self.point_count):
+            self.validate_rows()
+        with stage("save", self.point_count):
+            if cfg.output_format == "pkl":
+                self.save_processed_pkl()
+            else:
+                self.save_processed_scene()
+        # self.save_processed_ply()
+
+    def process_scan(self, pcd_file) -> dict:
+        """ The preprocessing of process_files for an unlabeled scan, for inference: nothing is saved, the
+        encoded arrays (rows in stored order, without the block index) and the quantization are returned. """
         self.base_file_name = os.path.splitext(os.path.basename(pcd_file))[0]
         self.load_pcd(pcd_file)
-        self.load_asc(asc_file)
         self.normalize_pcd()
         self.downsample_pcd()
-        self.estimate_normals()
-        self.assign_label()
+        if self.reuse_normals and self.down_pcd.has_normals():
+            self.down_pcd.normalize_normals()
+        else:
+            self.estimate_normals()
+        self.label_list = np.zeros(len(self.down_pcd.points), dtype=np.int64)
         self.generate_feature_arr()
-        self.check_and_remove_incomplete_rows()
-        self.check_and_remove_invalid_rows()
-        self.save_processed_pkl()
-        # self.save_processed_ply()
-        
+        # there are no labels to reject rows by
+        self.validate_rows([name for name in cfg.row_filters if name != "invalid_label"])
+        point_index = self.point_index(self.coords)
+        # only the points without a voxel are needed again, for the back-projection fallback; NaN for non-finite rows
+        missing = np.flatnonzero(point_index < 0)
+        position = np.minimum(np.searchsorted(self.source_rows, missing), max(len(self.source_rows) - 1, 0))
+        loaded = (self.source_rows[position] == missing) if len(self.source_rows) else np.zeros(len(missing), dtype=bool)
+        unmapped = np.full((len(missing), 3), np.nan)
+        unmapped[loaded] = np.asarray(self.pcd.points)[position[loaded]]
+        return {
+            'coords': self.coords,
+            'features': encode_features(self.feature_arr, cfg.feature_encoding),
+            'quantization': self.quantization,
+            'point_index': point_index,
+            'unmapped_points': unmapped / self.scale_factor,  # metric, like dequantize
+        }
+
+    def point_count(self):
+        """ Points at the current stage: raw cloud, downsampled cloud or feature rows """
+        if self.feature_arr is not None:
+            return len(self.feature_arr)
+        if self.down_pcd is not None:
+            return len(self.down_pcd.points)
+        return len(self.pcd.points) if self.pcd is not None else 0
+
     def load_pcd(self, pcd_file):
         try:
-            self.pcd = o3d.io.read_point_cloud(str(pcd_file), remove_nan_points=True, remove_infinite_points=True)
-            if not self.pcd.has_points():
+            # memory-mapped (or streamed, for binary_compressed) fields instead of o3d.io.read_point_cloud
+            records = read_pcd(pcd_file)
+            if len(records) == 0:
                 raise ValueError(f"The PCD file {pcd_file} is empty or corrupted.")
+            points = np.empty((len(records), 3), dtype=np.float64)
+            for i, name in enumerate(("x", "y", "z")):
+                points[:, i] = records[name]
+            # same as remove_nan_points/remove_infinite_points
+            finite = np.isfinite(points).all(axis=1)
+            self.source_rows, self.source_count = np.flatnonzero(finite), len(records)
+            self.pcd = o3d.geometry.PointCloud()
+            self.pcd.points = o3d.utility.Vector3dVector(points[finite])
+            if "rgb" in records.dtype.names:
+                self.pcd.colors = o3d.utility.Vector3dVector(unpack_rgb(records["rgb"])[finite] / 255.0)
+            normal_fields = ["normal_x", "normal_y", "normal_z"]
+            if set(normal_fields) <= set(records.dtype.names):
+                self.pcd.normals = o3d.utility.Vector3dVector(np.column_stack([records[name][finite] for name in normal_fields]).astype(np.float64))
         except Exception as e:
             logging.error(f"Error loading point cloud data file {pcd_file}: {e}")
             raise e
         
     def load_asc(self, asc_file):
         try:
-            asc_array = np.loadtxt(asc_file, delimiter=";")
-            self.labels = asc_array[:, 6].astype(int)
+            asc_array = read_asc(asc_file, columns=["label"], workers=cfg.asc_workers,
+                                 cache=cfg.asc_cache, cache_dir=cfg.asc_cache_dir)
+            self.labels = asc_array["label"].astype(int)
         except Exception as e:
             logging.error(f"Error loading ASC file {asc_file}: {e}")
+
+    def load_asc_cloud(self, asc_file):
+        """ Build points, colors, labels and (with reuse_normals) normals from the ASC file only,
+        so labels are aligned with the points by construction.
+        """
+        try:
+            asc_array = read_asc(asc_file, workers=cfg.asc_workers, cache=cfg.asc_cache, cache_dir=cfg.asc_cache_dir)
+            if len(asc_array) == 0:
+                raise ValueError(f"The ASC file {asc_file} is empty or corrupted.")
+            points = rfn.structured_to_unstructured(asc_array[["x", "y", "z"]], dtype=np.float64)
+            # same as remove_nan_points/remove_infinite_points in load_pcd
+            finite = np.all(np.isfinite(points), axis=1)
+            self.source_rows, self.source_count = np.flatnonzero(finite), len(asc_array)
+            if not finite.all():
+                asc_array, points = asc_array[finite], points[finite]
+
+            self.pcd = o3d.geometry.PointCloud()
+            self.pcd.points = o3d.utility.Vector3dVector(points)
+            self.pcd.colors = o3d.utility.Vector3dVector(rfn.structured_to_unstructured(asc_array[["r", "g", "b"]], dtype=np.float64) / 255.0)
+            normal_fields = ["normal_x", "normal_y", "normal_z"]
+            if self.reuse_normals:
+                if set(normal_fields) <= set(asc_array.dtype.names):
+                    self.pcd.normals = o3d.utility.Vector3dVector(rfn.structured_to_unstructured(asc_array[normal_fields], dtype=np.float64))
+                else:
+                    logger.warning(f"{asc_file} has no normal columns, normals will be estimated")
+            self.labels = asc_array["label"].astype(int)
+            logger.info("Loaded %d points from %s (%d non-finite rows dropped)", len(self.labels), asc_file, np.count_nonzero(~finite))
+        except Exception as e:
+            logging.error(f"Error loading ASC file {asc_file}: {e}")
+            raise e
     # (0,1)      
     def normalize_pcd(self):
         origin = np.array([0.0, 0.0, 0.0])
         self.pcd.translate(origin)
         logger.info(f"{Fore.CYAN}Normalizing coords...{Fore.RESET}")
         logger.info('Translated to the origin, consider log-scaling or min-max scaling when dealing with scattered values (outliers) or too much detail will be lost')
-        logger.info('Translated coords: Min: %f, Max: %f', np.min(self.pcd.points), np.max(self.pcd.points))
-        scale_factor = 1.0 / np.max(np.abs(self.pcd.points))
+        logger.debug('Translated coords: Min: %f, Max: %f', lazy(np.min, np.asarray(self.pcd.points)), lazy(np.max, np.asarray(self.pcd.points)))
+        scale_factor = 1.0 / np.max(np.abs(np.asarray(self.pcd.points)))
         self.pcd.scale(scale_factor, origin)
+        self.scale_factor = scale_factor
         logger.info('Normalized coords with the scalefactor of %f', scale_factor)
-        logger.info('Scaled coords: Min: %f, Max: %f', np.min(self.pcd.points), np.max(self.pcd.points))
+        logger.debug('Scaled coords: Min: %f, Max: %f', lazy(np.min, np.asarray(self.pcd.points)), lazy(np.max, np.asarray(self.pcd.points)))
         #logger.info('Visualizing the normalized point clouds')
         #o3d.visualization.draw_geometries([self.pcd])
         
@@ -75,38 +212,61 @@ class Preprocessor:
     
     def downsample_pcd(self):
         self.down_pcd = self.pcd.voxel_down_sample(self.voxel_size)
-        
-        coords_np = np.asarray(self.down_pcd.points)
-        is_aligned = np.all(coords_np % cfg.stride == 0)
-        assert is_aligned, f"Coordinates in {self.base_file_name} are not aligned with the tensor stride after downsampling: preprocess_minkowski.py"
+        # voxel_down_sample lays its grid out from min bound - voxel_size / 2, quantize on the same grid
+        self.grid_origin = self.pcd.get_min_bound() - self.voxel_size * 0.5
 
         logger.info("Downsampled from {} to {} points".format(len(self.pcd.points), len(self.down_pcd.points)))
         #logger.info('Visualizing the downsampled point clouds')
         #o3d.visualization.draw_geometries([self.down_pcd])
    
+    def process_tiles(self, tile_pool):
+        """ downsample_pcd + estimate_normals + assign_label, tile by tile in tile_pool, see tiling.py """
+        self.grid_origin = self.pcd.get_min_bound() - self.voxel_size * 0.5
+        overlap = cfg.tile_overlap_voxels
+        if overlap is None:
+            # the normal search radius plus a margin for the label transfer neighbours
+            overlap = int(np.ceil(self.normal_radius / self.voxel_size)) + 2
+        normals = np.asarray(self.pcd.normals) if self.reuse_normals and self.pcd.has_normals() else None
+        tiles = iter_tiles(np.asarray(self.pcd.points), self.grid_origin, self.voxel_size, cfg.tile_voxels, overlap,
+                           colors=np.asarray(self.pcd.colors), labels=self.point_labels(), normals=normals)
+        worker = partial(process_tile, origin=self.grid_origin, voxel_size=self.voxel_size, normal_radius=self.normal_radius,
+                         normal_max_nn=self.normal_max_nn, label_neighbors=cfg.label_neighbors)
+        # at most two tiles per worker are in flight, the others are not cut out before they are needed
+        stitched = stitch_tiles(map_bounded(tile_pool, worker, tiles, max_pending=2 * cfg.num_workers))
+
+        self.down_pcd = o3d.geometry.PointCloud()
+        self.down_pcd.points = o3d.utility.Vector3dVector(stitched['points'])
+        self.down_pcd.colors = o3d.utility.Vector3dVector(stitched['colors'])
+        self.down_pcd.normals = o3d.utility.Vector3dVector(stitched['normals'])
+        self.label_list = stitched['labels']
+        logger.info("Downsampled from %d to %d points in tiles of %d voxels (overlap %d)",
+                    len(self.pcd.points), len(self.down_pcd.points), cfg.tile_voxels, overlap)
+
     def estimate_normals(self): 
         logger.info(f"{Fore.CYAN}Estimating normals...{Fore.RESET}")
-        radius_normal = self.voxel_size * 2
+        radius_normal = self.normal_radius
         start_time = time.time()  
-        self.down_pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius_normal, max_nn=30))
+        self.down_pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius_normal, max_nn=self.normal_max_nn))
         elapsed_time = time.time() - start_time 
         logger.info(f"Normals estimated in {elapsed_time:.2f} seconds")
         logger.info('Each point has %d normals', len(self.down_pcd.normals[0]))
         logger.info('Estimated normals with radius %f', radius_normal)
-        logger.info('Normals: Min: %f, Max: %f', np.min(self.down_pcd.normals), np.max(self.down_pcd.normals))
+        logger.debug('Normals: Min: %f, Max: %f', lazy(np.min, np.asarray(self.down_pcd.normals)), lazy(np.max, np.asarray(self.down_pcd.normals)))
         #logger.info('Visualizing the downsampled point clouds with normals')
     
+    def point_labels(self) -> np.ndarray:
+        """ Labels aligned with self.pcd.points: the ASC file has a label for every row of the PCD file,
+        the rows load_pcd dropped as non-finite are dropped here too """
+        labels = np.asarray(self.labels)
+        if len(labels) != len(self.pcd.points) and len(labels) == self.source_count:
+            labels = labels[self.source_rows]
+        return labels
+
     def assign_label(self):
         logger.info(f"{Fore.CYAN}Assigning Labels...{Fore.RESET}")
-        pcd_tree = o3d.geometry.KDTreeFlann(self.pcd)
         num_points_down_pcd = len(self.down_pcd.points)
-        self.label_list = []
-        for i in range(num_points_down_pcd):
-            num_neighbors = 5
-            [num_neighbors, idx, _] = pcd_tree.search_knn_vector_3d(self.down_pcd.points[i], num_neighbors)
-            neighbor_labels = [self.labels[index] for index in idx]
-            most_frequent_label = mode(neighbor_labels)
-            self.label_list.append(most_frequent_label)
+        self.label_list = transfer_labels(np.asarray(self.pcd.points), self.point_labels(), np.asarray(self.down_pcd.points),
+                                          k=cfg.label_neighbors, workers=cfg.knn_workers)
         logger.info('Assigned %d labels to %d points', len(self.label_list) , num_points_down_pcd)
         #o3d.visualization.draw_geometries([self.down_pcd])
 
@@ -119,7 +279,14 @@ class Preprocessor:
         #logger.info("Data consistency check: Shapes of all arrays are equal: {}".format(points.shape))
     
     def generate_feature_arr(self):
-        self.coords = np.asarray(self.down_pcd.points, dtype=np.float32)
+        # integer, stride-aligned voxel coordinates, so neither the dataset nor MinkowskiEngine quantizes again
+        self.coords, grid_origin = quantize(np.asarray(self.down_pcd.points), self.voxel_size, self.grid_origin, cfg.stride)
+        self.quantization = {
+            'origin': grid_origin.tolist(),  # normalized space
+            'voxel_size': self.voxel_size,
+            'stride': cfg.stride,
+            'scale': self.scale_factor,  # metric = normalized / scale, see quantize.dequantize
+        }
         colors = np.asarray(self.down_pcd.colors, dtype=np.float32)
         normals = np.asarray(self.down_pcd.normals, dtype=np.float32)
         features = np.concatenate([colors, normals], axis=1)
@@ -127,83 +294,184 @@ class Preprocessor:
         self.feature_arr = features
         self.label_arr = labels
 
-    def check_and_remove_incomplete_rows(self):
-        rows_to_remove = []
-        for i, row in enumerate(self.feature_arr):
-            if not np.all(np.isfinite(row)):
-                rows_to_remove.append(i)
-
-        if len(rows_to_remove) > 0:
-            logger.warning(f"{len(rows_to_remove)} incomplete rows found and removed.")
-            self.coords = np.delete(self.coords, rows_to_remove, axis=0)  # Add this line to remove rows from coords
-            self.feature_arr = np.delete(self.feature_arr, rows_to_remove, axis=0)
-            self.label_arr = np.delete(self.label_arr, rows_to_remove, axis=0)
+    def validate_rows(self, filters=None):
+        # one keep-mask from all filters (duplicate voxels after quantization included), one compaction
+        arrays, dropped = validate_rows({'coords': self.coords, 'features': self.feature_arr, 'labels': self.label_arr},
+                                        filters=cfg.row_filters if filters is None else filters,
+                                        coord_bounds=cfg.coord_bounds)
+        self.coords, self.feature_arr, self.label_arr = arrays['coords'], arrays['features'], arrays['labels']
+        if any(dropped.values()):
+            logger.warning("Removed %d of %d rows: %s", sum(dropped.values()), len(self.coords) + sum(dropped.values()),
+                           ", ".join(f"{name} {count}" for name, count in dropped.items()))
         else:
-            logger.info("All rows are complete.")
-    
-    def check_and_remove_invalid_rows(self):
-        rows_to_remove = []
-
-        for i, label in enumerate(self.label_arr):
-            if label == 0:
-                rows_to_remove.append(i)
-
-        if len(rows_to_remove) > 0:
-            logger.warning(f"{len(rows_to_remove)} invalid rows found and removed.")
-            self.coords = np.delete(self.coords, rows_to_remove, axis=0)
-            self.feature_arr = np.delete(self.feature_arr, rows_to_remove, axis=0)
-            self.label_arr = np.delete(self.label_arr, rows_to_remove, axis=0)
-        else:
-            logger.info("No rows with 'Invalid' label found.")
+            logger.info("All rows are valid.")
 
     def save_processed_pkl(self):
         
-        coords_np = np.array(self.coords)
-        is_aligned = np.all(coords_np % cfg.stride == 0)
+        is_aligned = np.all(self.coords % cfg.stride == 0)
         assert is_aligned, f"Coordinates in {self.base_file_name} are not aligned with the tensor stride before saving: preprocess_minkowski.py"
 
-        data = {
-            'coords': self.coords,
-            'features': self.feature_arr,  # colors and normals concatenated
-            'labels': self.label_arr
-        }
+        data = dict(self.output_arrays(), quantization=self.quantization, block_voxels=cfg.crop_block_voxels)
+        if cfg.save_point_index:
+            write_point_index(point_index_file(processed_file_path(self.base_file_name, ".pkl")),
+                              self.point_index(data['coords']))
 
-        processed_pkl_file = os.path.join(cfg.preprocessed_data_dir, f"{self.base_file_name}_preprocessed.pkl")
-        with open(processed_pkl_file, 'wb') as f:
+        processed_pkl_file = processed_file_path(self.base_file_name, ".pkl")
+        # write-then-rename, an interrupted run never leaves a truncated output behind
+        with open(processed_pkl_file + ".tmp", 'wb') as f:
             pickle.dump(data, f)
+        os.replace(processed_pkl_file + ".tmp", processed_pkl_file)
+
+    def save_processed_scene(self):
+        is_aligned = np.all(self.coords % cfg.stride == 0)
+        assert is_aligned, f"Coordinates in {self.base_file_name} are not aligned with the tensor stride before saving: preprocess_minkowski.py"
+
+        # same arrays as the pickle, stored as separate memory-mappable columns
+        arrays = self.output_arrays()
+        if cfg.save_point_index:
+            write_point_index(point_index_file(processed_file_path(self.base_file_name, SCENE_SUFFIX)),
+                              self.point_index(arrays['coords']))
+        write_scene(processed_file_path(self.base_file_name, SCENE_SUFFIX), arrays,
+                    meta={'quantization': self.quantization, 'block_voxels': cfg.crop_block_voxels})
+
+    def point_index(self, coords: np.ndarray) -> np.ndarray:
+        """ Row of coords for every row of the input file, -1 for rows without a saved voxel, see back_projection.py """
+        index = np.full(self.source_count, -1, dtype=np.int32)
+        index[self.source_rows] = point_voxel_index(np.asarray(self.pcd.points), coords, self.quantization['origin'],
+                                                    self.voxel_size, cfg.stride)
+        return index
+
+    def output_arrays(self) -> dict:
+        """ Encoded arrays to save, rows grouped by (x, y) block with the block index for crop sampling (block_index.py) """
+        order, index = build_block_index(self.coords, self.label_arr, cfg.crop_block_voxels, cfg.num_classes)
+        return {
+            'coords': self.coords[order],
+            'features': encode_features(self.feature_arr[order], cfg.feature_encoding),  # colors and normals concatenated
+            'labels': encode_labels(self.label_arr[order]),  # class indices, uint8
+            **index,
+        }
+
+def processed_file_path(base_file_name, suffix=None):
+    suffix = suffix or (".pkl" if cfg.output_format == "pkl" else SCENE_SUFFIX)
+    return os.path.join(cfg.preprocessed_data_dir, f"{base_file_name}_preprocessed{suffix}")
+
+def preprocess_params(voxel_size: float) -> dict:
+    """ Every setting that changes the content of a preprocessed file, part of its cache key. """
+    return {
+        'voxel_size': voxel_size,
+        'stride': cfg.stride,
+        'normal_radius': cfg.normal_radius if cfg.normal_radius is not None else voxel_size * 2,
+        'normal_max_nn': cfg.normal_max_nn,
+        'label_neighbors': cfg.label_neighbors,
+        'ingest_mode': cfg.ingest_mode,
+        'reuse_normals': cfg.reuse_normals,
+        'feature_encoding': cfg.feature_encoding,
+        'row_filters': list(cfg.row_filters),
+        'coord_bounds': cfg.coord_bounds,
+        'tiling': [cfg.tile_voxels, cfg.tile_overlap_voxels] if cfg.tiling else None,
+        'crop_block_voxels': cfg.crop_block_voxels,
+        'save_point_index': cfg.save_point_index,
+    }
 
-def process_pcd(matched_file_pair, voxel_size: float):
+def pair_cache_key(matched_file_pair, voxel_size: float) -> dict:
+    return cache_key(matched_file_pair, preprocess_params(voxel_size), full_hash=cfg.cache_full_hash)
+
+def process_pcd(matched_file_pair, voxel_size: float, tile_pool=None):
     pcd_file, asc_file = matched_file_pair
     try:
-        preprocessor = Preprocessor(voxel_size)
-        preprocessor.process_files(pcd_file, asc_file)
+        profiler = StageProfiler(enabled=cfg.profile_stages)
+        preprocessor = Preprocessor(voxel_size, cfg.ingest_mode, cfg.reuse_normals, cfg.normal_radius, cfg.normal_max_nn,
+                                    profiler)
+        if cfg.cprofile_file is not None and Path(pcd_file).stem == cfg.cprofile_file:
+            # full call profile of one chosen file, inspect with python -m pstats or snakeviz
+            call_profile = cProfile.Profile()
+            call_profile.runcall(preprocessor.process_files, pcd_file, asc_file, tile_pool)
+            os.makedirs(cfg.profile_dir, exist_ok=True)
+            call_profile.dump_stats(os.path.join(cfg.profile_dir, f"{cfg.cprofile_file}.prof"))
+        else:
+            preprocessor.process_files(pcd_file, asc_file, tile_pool)
+        profiler.flush(preprocessor.base_file_name, cfg.profile_dir)
+        if cfg.incremental:
+            mark_done(processed_file_path(preprocessor.base_file_name), pair_cache_key(matched_file_pair, voxel_size))
+        return True
     except Exception as e:
         logger.error(f"An error occurred during preprocessing {pcd_file} or its corresponding asc file {asc_file}: {e}")
+        return False
+
+def pending_pairs(matched_file_pairs):
+    """ The pairs to preprocess: with incremental only those whose output is not up to date, all of them with
+    preprocess_force """
+    if not cfg.incremental:
+        return matched_file_pairs
+    if cfg.preprocess_force:
+        # the records go first, so that the pairs an interrupted forced run did not reach are redone on the next run
+        for pcd_file, _ in matched_file_pairs:
+            invalidate(processed_file_path(Path(pcd_file).stem))
+        logger.info("preprocess_force: all %d file pairs are preprocessed again", len(matched_file_pairs))
+        return matched_file_pairs
+    # unchanged inputs + unchanged parameters -> output is still valid, also resumes interrupted runs
+    pending = [pair for pair in matched_file_pairs
+               if not is_up_to_date(processed_file_path(Path(pair[0]).stem), pair_cache_key(pair, cfg.voxel_size))]
+    logger.info("%d of %d file pairs are up to date and skipped", len(matched_file_pairs) - len(pending), len(matched_file_pairs))
+    return pending
 
-def process_pcd_with_error_handling(matched_file_pair, voxel_size: float):
+def process_pcd_with_error_handling(matched_file_pair, voxel_size: float, tile_pool=None):
     pcd_file, asc_file = matched_file_pair
     try:
-        process_pcd(matched_file_pair, voxel_size)
-        return True
+        return process_pcd(matched_file_pair, voxel_size, tile_pool)
     except Exception as e:
         logger.error(f"An error occurred during preprocessing {pcd_file} or its corresponding asc file {asc_file}: {e}")
         return False
     
 def main():
-    pcd_files = sorted(list(Path(cfg.pcd_files_path).glob('*.pcd')))
-    asc_files = sorted(list(Path(cfg.asc_files_path).glob('*.asc')))
-
-    matched_file_pairs = files_match_making(pcd_files, asc_files)
-
-    results = process_map(  
-        process_pcd_with_error_handling, 
-        matched_file_pairs,
-        chunksize=1,
-        max_workers=cfg.num_workers,
-        desc="Processing files",
-        unit="file",
-        func_args=(cfg.voxel_size,), 
-    )
+    # pairs, sizes and point counts from the catalog, only new or changed files are looked at
+    entries = catalog_entries(cfg.pcd_files_path, cfg.asc_files_path, workers=cfg.num_workers)
+    if cfg.split_manifest is not None:
+        # only the scenes of the splits, all into preprocessed_data_dir
+        scenes = split_scenes(read_manifest(cfg.split_manifest))
+        logger.info("%d of %d catalogued scenes are in the split manifest %s", sum(entry['name'] in scenes for entry in entries),
+                    len(entries), cfg.split_manifest)
+        entries = [entry for entry in entries if entry['name'] in scenes]
+    matched_file_pairs = [(entry['pcd_file'], entry['asc_file']) for entry in entries]
+    points = {entry['pcd_file']: entry['points'] for entry in entries}
+
+    matched_file_pairs = pending_pairs(matched_file_pairs)
+
+    if cfg.profile_stages:
+        clear_profiles(cfg.profile_dir)
+
+    if cfg.tiling:
+        # one file after the other, the tiles of each file are spread over all workers
+        with ProcessPoolExecutor(max_workers=cfg.num_workers, initializer=worker_init()) as tile_pool:
+            results = [process_pcd_with_error_handling(pair, cfg.voxel_size, tile_pool)
+                       for pair in tqdm(matched_file_pairs, desc="Processing files", unit="file")]
+    else:
+        # largest predicted first, and no more tasks at once than the memory budget allows
+        cost_model = CostModel(cfg.schedule_seconds_per_point, cfg.schedule_bytes_per_point,
+                               cfg.schedule_base_seconds, cfg.schedule_base_bytes)
+        estimates = [cost_model.estimate(points[pcd_file]) for pcd_file, _ in matched_file_pairs]
+        memory_budget = cfg.memory_budget_bytes or int(0.8 * available_memory())
+        start_time = time.perf_counter()
+        with tqdm(total=len(matched_file_pairs), desc="Processing files", unit="file") as progress:
+            results, records = run_scheduled(partial(process_pcd_with_error_handling, voxel_size=cfg.voxel_size),
+                                             matched_file_pairs, estimates, cfg.num_workers, memory_budget, progress,
+                                             initializer=worker_init())
+        summary = summarize(records, [Path(pcd_file).stem for pcd_file, _ in matched_file_pairs],
+                            wall_seconds=time.perf_counter() - start_time)
+        if summary['tasks']:
+            write_summary(summary, cfg.schedule_summary_file)
+            logger.info("Scheduled %d files within %.1f GiB in %.1f s: predicted %.1f s, measured %.1f s of work "
+                        "(actual / predicted: median %.2f, max %.2f). Fitted cost model: %.3g s/point, %.0f bytes/point, see %s",
+                        len(records), memory_budget / 2**30, summary['wall_seconds'], summary['predicted_total_seconds'], summary['actual_total_seconds'],
+                        summary['runtime_ratio_median'], summary['runtime_ratio_max'], summary['fitted']['seconds_per_point'],
+                        summary['fitted']['bytes_per_point'], cfg.schedule_summary_file)
+
+    if cfg.profile_stages:
+        stages = aggregate_profiles(cfg.profile_dir)
+        for name, summary in stages.items():
+            logger.info("Stage %-10s %5.1f%% of wall time, p50 %.2f s, p90 %.2f s, max %.2f s, peak RSS delta p90 %.0f MiB",
+                        name, 100 * summary['share_of_wall'], summary['wall_seconds']['p50'], summary['wall_seconds']['p90'],
+                        summary['wall_seconds']['max'], summary['peak_rss_delta_bytes']['p90'] / 2**20)
 
     failed_files_count = results.count(False)
     if failed_files_count > 0:
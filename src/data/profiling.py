@@ -0,0 +1,152 @@
+"""Per-stage instrumentation of the Preprocessor pipeline.
+
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("downsample", count_points):
+        ...
+
+records wall time, CPU time of the process (all threads), the peak RSS above the RSS at stage
+start and the point count before and after the stage. A disabled profiler hands out one shared
+no-op context and never calls count_points. Workers append their records to
+<profile_dir>/stages-<pid>.jsonl, aggregate_profiles merges them into stages.csv and a
+percentile summary in stages_summary.json.
+"""
+import contextlib
+import csv
+import glob
+import json
+import os
+import resource
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+_NULL_STAGE = contextlib.nullcontext()
+_folded_peak = 0  # peak RSS of the enclosing window, before the last reset by a nested one
+
+
+def _status_bytes(key: str) -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # lifetime peak where /proc is missing
+
+
+def current_rss() -> int:
+    return _status_bytes("VmRSS:")
+
+
+def _clear_peak() -> None:
+    # Linux: writing 5 to clear_refs resets VmHWM to the current RSS
+    global _folded_peak
+    _folded_peak = max(_folded_peak, _status_bytes("VmHWM:"))
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def reset_peak_rss() -> None:
+    """ Start a new peak RSS measurement window, e.g. per task. """
+    global _folded_peak
+    _clear_peak()
+    _folded_peak = 0
+
+
+def peak_rss() -> int:
+    """ Peak RSS since reset_peak_rss, including the windows of nested stages. """
+    return max(_folded_peak, _status_bytes("VmHWM:"))
+
+
+class _Stage:
+    def __init__(self, profiler, name, count_points):
+        self.profiler = profiler
+        self.name = name
+        self.count_points = count_points
+
+    def __enter__(self):
+        self.points_in = self.count_points() if self.count_points else None
+        _clear_peak()
+        self.rss = current_rss()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        self.profiler.records.append({
+            'stage': self.name,
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_rss_delta_bytes': max(_status_bytes("VmHWM:") - self.rss, 0),
+            'points_in': self.points_in,
+            'points_out': self.count_points() if self.count_points else None,
+        })
+        return False
+
+
+class StageProfiler:
+    """
+    Attributes:
+        enabled (bool): when False, stage() costs one attribute lookup and records nothing.
+        records (list): one dict per finished stage since the last flush.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.records = []
+
+    def stage(self, name: str, count_points=None):
+        """ Context manager timing one stage, count_points() gives the current number of points. """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, count_points)
+
+    def flush(self, file_name: str, profile_dir) -> None:
+        """ Append the records of one file to this process' JSON lines file and forget them. """
+        if not self.enabled or not self.records:
+            return
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(os.path.join(profile_dir, f"stages-{os.getpid()}.jsonl"), "a") as f:
+            for record in self.records:
+                f.write(json.dumps(dict(record, file=file_name)) + "\n")
+        self.records = []
+
+
+def clear_profiles(profile_dir) -> None:
+    for record_file in glob.glob(os.path.join(profile_dir, "stages-*.jsonl")):
+        os.remove(record_file)
+
+
+def aggregate_profiles(profile_dir) -> dict:
+    """ Merge the worker record files into stages.csv and return (and write) the per-stage summary. """
+    records = []
+    for record_file in sorted(glob.glob(os.path.join(profile_dir, "stages-*.jsonl"))):
+        with open(record_file) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    if not records:
+        return {}
+
+    columns = ['file', 'stage', 'wall_seconds', 'cpu_seconds', 'peak_rss_delta_bytes', 'points_in', 'points_out']
+    with open(os.path.join(profile_dir, "stages.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+
+    summary = {}
+    total_wall = sum(record['wall_seconds'] for record in records)
+    for stage in dict.fromkeys(record['stage'] for record in records):
+        stage_records = [record for record in records if record['stage'] == stage]
+        summary[stage] = {'files': len(stage_records)}
+        for metric in ('wall_seconds', 'cpu_seconds', 'peak_rss_delta_bytes'):
+            values = np.array([record[metric] for record in stage_records], dtype=np.float64)
+            summary[stage][metric] = {'total': float(values.sum()), 'max': float(values.max()),
+                                      **{f"p{q}": float(np.percentile(values, q)) for q in PERCENTILES}}
+        summary[stage]['share_of_wall'] = summary[stage]['wall_seconds']['total'] / total_wall if total_wall else 0.0
+    with open(os.path.join(profile_dir, "stages_summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
@@ -0,0 +1,110 @@
+"""Integer voxel-grid coordinates for MinkowskiEngine, computed once per scene at preprocessing time.
+
+grid = floor((points - origin) / voxel_size) * stride, shifted so that the minimum is 0 on every
+axis. The quantization metadata (origin, voxel size, stride and the normalization scale) is stored
+with the scene, dequantize() maps grid coordinates back to metric voxel centers.
+"""
+import numpy as np
+
+_KEY_BITS = 21  # per axis when packing a grid row into one int64
+
+
+def quantize(points: np.ndarray, voxel_size: float, origin: np.ndarray, stride: int = 1):
+    """ Quantize (n, 3) points into int32 grid coordinates aligned with the tensor stride.
+    Args:
+        origin: corner of the voxel grid, e.g. min bound - voxel_size / 2 as used by voxel_down_sample
+    Returns:
+        grid (n, 3) int32 and the origin of grid coordinate (0, 0, 0)
+    """
+    origin = np.asarray(origin, dtype=np.float64)
+    idx = np.floor((np.asarray(points, dtype=np.float64) - origin) / voxel_size).astype(np.int64)
+    if len(idx) == 0:
+        return idx.astype(np.int32).reshape(0, 3), origin
+    low = idx.min(axis=0)
+    idx -= low
+    if idx.max() * stride > np.iinfo(np.int32).max:
+        raise ValueError(f"Scene spans {idx.max() + 1} voxels of size {voxel_size}, too many for int32 coordinates")
+    return (idx * stride).astype(np.int32), origin + low * voxel_size
+
+
+def dequantize(grid: np.ndarray, meta: dict) -> np.ndarray:
+    """ Metric voxel centers of grid coordinates, undoing the normalization scale as well. """
+    voxel_size = meta['voxel_size']
+    normalized = np.asarray(meta['origin']) + (grid / meta['stride'] + 0.5) * voxel_size
+    return normalized / meta['scale']
+
+
+def voxel_keys(grid: np.ndarray) -> np.ndarray:
+    """ One sortable int64 per grid row, for fast 1-D unique/lookup instead of np.unique(axis=0). """
+    grid = np.asarray(grid, dtype=np.int64)
+    if len(grid) and (grid.min() < 0 or grid.max() >= 1 << _KEY_BITS):
+        # fall back to a dense row index for very large grids
+        _, keys = np.unique(grid, axis=0, return_inverse=True)
+        return keys.reshape(-1).astype(np.int64)
+    return (grid[:, 0] << (2 * _KEY_BITS)) | (grid[:, 1] << _KEY_BITS) | grid[:, 2]
+
+
+def first_in_voxel(grid: np.ndarray) -> np.ndarray:
+    """ Boolean mask of the first row of every distinct voxel.
+
+    Each row is packed as (voxel relative to the grid minimum, row index) into one int64, so a
+    single plain sort both groups the voxels and orders every group by row. Falls back to
+    np.unique on voxel_keys when the grid extent and row count do not fit into 63 bits.
+    """
+    grid = np.asarray(grid)
+    mask = np.zeros(len(grid), dtype=bool)
+    if len(grid) == 0:
+        return mask
+    index_bits = max((len(grid) - 1).bit_length(), 1)
+    columns = [np.ascontiguousarray(column) for column in grid.T]  # axis=0 reductions on (n, 3) are slow
+    low = [int(column.min()) for column in columns]
+    axis_bits = [(int(column.max()) - axis_low).bit_length() for column, axis_low in zip(columns, low)]
+    if sum(axis_bits) + index_bits > 63:
+        _, first = np.unique(voxel_keys(grid), return_index=True)
+        mask[first] = True
+        return mask
+
+    packed = np.arange(len(grid), dtype=np.int64)
+    shift = index_bits
+    for axis, column in enumerate(columns):
+        packed |= (column.astype(np.int64) - low[axis]) << shift
+        shift += axis_bits[axis]
+    packed.sort()
+    keys = packed >> index_bits
+    first = np.empty(len(grid), dtype=bool)
+    first[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=first[1:])
+    mask[packed[first] & ((1 << index_bits) - 1)] = True
+    return mask
+
+
+def unique_voxels(grid: np.ndarray) -> np.ndarray:
+    """ Sorted indices of the first row of every distinct voxel. """
+    return np.flatnonzero(first_in_voxel(grid))
+
+
+def point_voxel_index(points: np.ndarray, grid: np.ndarray, origin, voxel_size: float, stride: int = 1) -> np.ndarray:
+    """ Row of grid holding the voxel of every point, -1 where grid has no such voxel (e.g. dropped by validation).
+    Args:
+        points: (n, 3) in the space quantize() was called in, e.g. the full resolution normalized cloud
+        grid: the (m, 3) grid coordinates as saved, in any row order
+        origin: the origin returned by quantize()
+    Returns:
+        (n,) int32
+    """
+    point_grid = np.floor((np.asarray(points, dtype=np.float64) - np.asarray(origin)) / voxel_size).astype(np.int64) * stride
+    # one key space for both, voxel_keys falls back to a dense index for huge or negative grids
+    keys = voxel_keys(np.concatenate([np.asarray(grid, dtype=np.int64).reshape(-1, 3), point_grid]))
+    grid_keys, point_keys = keys[:len(grid)], keys[len(grid):]
+    index = np.full(len(point_keys), -1, dtype=np.int32)
+    if len(grid_keys) == 0:
+        return index
+    order = np.argsort(grid_keys)
+    sorted_keys = grid_keys[order]
+    # searchsorted with sorted needles walks the haystack once, random needles miss the cache on every lookup
+    point_order = np.argsort(point_keys)
+    sorted_point_keys = point_keys[point_order]
+    position = np.minimum(np.searchsorted(sorted_keys, sorted_point_keys), len(sorted_keys) - 1)
+    found = sorted_keys[position] == sorted_point_keys
+    index[point_order[found]] = order[position[found]]
+    return index
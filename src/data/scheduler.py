@@ -0,0 +1,149 @@
+"""Largest-first scheduling of preprocessing tasks with memory-aware admission.
+
+Every task gets a predicted runtime and peak memory from a linear cost model on its point count
+(PCD header, or ASC size / bytes per row). Tasks are dispatched longest first (LPT), which keeps
+the few huge scans from landing last, and a task is only started while the predicted peaks of
+all running tasks fit the memory budget. The summary puts predicted and measured runtime and
+peak RSS side by side and fits the per-point coefficients, to calibrate the model with.
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from pcd_reader import read_pcd_header
+from profiling import peak_rss, reset_peak_rss
+
+ASC_BYTES_PER_ROW = 70  # x;y;z;r;g;b;label;nx;ny;nz with 6 decimals
+
+
+def available_memory() -> int:
+    """ MemAvailable of /proc/meminfo, or the physical memory where that does not exist """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def count_points(pcd_file, asc_file=None) -> int:
+    """ Point count from the PCD header, estimated from the ASC file size when the header is unusable """
+    try:
+        return read_pcd_header(pcd_file)["points"]
+    except (OSError, ValueError, KeyError):
+        return os.path.getsize(asc_file) // ASC_BYTES_PER_ROW if asc_file else 0
+
+
+class CostModel:
+    """
+    seconds = seconds_per_point * points + base_seconds
+    peak bytes = bytes_per_point * points + base_bytes
+    """
+    def __init__(self, seconds_per_point: float, bytes_per_point: float, base_seconds: float = 0.0,
+                 base_bytes: int = 0):
+        self.seconds_per_point = seconds_per_point
+        self.bytes_per_point = bytes_per_point
+        self.base_seconds = base_seconds
+        self.base_bytes = base_bytes
+
+    def estimate(self, points: int) -> dict:
+        return {
+            'points': points,
+            'seconds': self.seconds_per_point * points + self.base_seconds,
+            'peak_bytes': int(self.bytes_per_point * points + self.base_bytes),
+        }
+
+
+def measured(fn, item):
+    """ Run fn(item) in a worker and return its result with the wall time and peak RSS of the call. """
+    reset_peak_rss()
+    start = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - start, peak_rss()
+
+
+def schedule_order(estimates) -> list:
+    """ Task indices by decreasing predicted runtime (LPT) """
+    return sorted(range(len(estimates)), key=lambda i: estimates[i]['seconds'], reverse=True)
+
+
+def run_scheduled(fn, items, estimates, max_workers: int, memory_budget: int, progress=None, initializer=None):
+    """ Run fn over items in a process pool, longest predicted first, admitting a task only while the
+    predicted peaks of the running tasks fit memory_budget. A task that does not fit even on its own runs alone.
+    initializer runs once in every worker process.
+    Returns:
+        results in the order of items and one record per task (predicted and actual seconds / peak bytes)
+    """
+    queue = schedule_order(estimates)
+    results, records = [None] * len(items), [None] * len(items)
+    running = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer) as pool:
+        while queue or running:
+            reserved = sum(estimates[i]['peak_bytes'] for i in running.values())
+            for i in list(queue):
+                if len(running) >= max_workers:
+                    break
+                # the largest task that fits goes first, smaller ones backfill the remaining budget
+                if running and reserved + estimates[i]['peak_bytes'] > memory_budget:
+                    continue
+                queue.remove(i)
+                running[pool.submit(measured, fn, items[i])] = i
+                reserved += estimates[i]['peak_bytes']
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                results[i], seconds, peak = future.result()
+                records[i] = dict(estimates[i], actual_seconds=seconds, actual_peak_bytes=peak)
+                if progress is not None:
+                    progress.update(1)
+    return results, records
+
+
+def summarize(records, names=None, wall_seconds: float = None) -> dict:
+    """ Predicted vs. actual per task, and per-point coefficients fitted (least squares) to the measurements """
+    names = names or list(range(len(records)))
+    names = [name for name, record in zip(names, records) if record is not None]
+    records = [record for record in records if record is not None]
+    if not records:
+        return {'tasks': []}
+    points = np.array([record['points'] for record in records], dtype=np.float64)
+    seconds = np.array([record['actual_seconds'] for record in records])
+    peaks = np.array([record['actual_peak_bytes'] for record in records], dtype=np.float64)
+    predicted = np.array([record['seconds'] for record in records])
+
+    def fit(values):
+        # values ~ slope * points + intercept, plain slope through the origin for a single task
+        if len(points) < 2 or np.ptp(points) == 0:
+            return float(values.sum() / max(points.sum(), 1)), 0.0
+        slope, intercept = np.polyfit(points, values, 1)
+        return float(slope), float(intercept)
+
+    seconds_per_point, base_seconds = fit(seconds)
+    bytes_per_point, base_bytes = fit(peaks)
+    ratio = seconds / np.maximum(predicted, 1e-9)
+    return {
+        'tasks': [dict(record, name=name) for name, record in zip(names, records)],
+        'predicted_total_seconds': float(predicted.sum()),
+        'actual_total_seconds': float(seconds.sum()),
+        'wall_seconds': wall_seconds,
+        'runtime_ratio_median': float(np.median(ratio)),
+        'runtime_ratio_max': float(ratio.max()),
+        'fitted': {
+            'seconds_per_point': seconds_per_point,
+            'base_seconds': base_seconds,
+            'bytes_per_point': bytes_per_point,
+            'base_bytes': base_bytes,
+        },
+    }
+
+
+def write_summary(summary: dict, summary_file) -> None:
+    os.makedirs(os.path.dirname(summary_file) or ".", exist_ok=True)
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=2)
@@ -0,0 +1,116 @@
+"""Spatial tiling, so that one huge scan is downsampled, gets normals and labels in parallel.
+
+The horizontal plane is cut into square tiles of tile_voxels x tile_voxels voxels on the same
+grid that downsampling uses. A tile is shipped with every raw point within overlap_voxels of
+its border, so that normal estimation and label transfer see the same neighbourhoods as on the
+whole cloud, but only the voxels of its core are kept. Cores do not overlap, so stitching is a
+concatenation and every voxel of the untiled result appears exactly once.
+"""
+from collections import deque
+
+import numpy as np
+import open3d as o3d
+
+from label_transfer import transfer_labels
+from quantize import voxel_keys
+
+
+def voxel_index(points: np.ndarray, origin: np.ndarray, voxel_size: float) -> np.ndarray:
+    """ Integer voxel of every point, the same floor((p - origin) / voxel_size) as voxel_down_sample """
+    return np.floor((points - origin) / voxel_size).astype(np.int64)
+
+
+def iter_tiles(points: np.ndarray, origin: np.ndarray, voxel_size: float, tile_voxels: int, overlap_voxels: int,
+               **arrays):
+    """ Yield one payload dict per non-empty tile, holding the rows within its extended (core + overlap) box.
+    Args:
+        arrays: per-point arrays shipped along with the points, e.g. colors, labels, normals
+    """
+    if not 0 <= overlap_voxels < tile_voxels:
+        raise ValueError(f"The tile overlap ({overlap_voxels} voxels) must be smaller than the tile ({tile_voxels} voxels)")
+    voxels = voxel_index(points[:, :2], origin[:2], voxel_size)
+    # a point lies in the extended box of the tiles floor((v - overlap) / T) .. floor((v + overlap) / T), at most 2 per axis
+    low, high = (voxels - overlap_voxels) // tile_voxels, (voxels + overlap_voxels) // tile_voxels
+    rows, tiles = [], []
+    for dx in (0, 1):
+        for dy in (0, 1):
+            tile = low + (dx, dy)
+            inside = np.flatnonzero((tile <= high).all(axis=1))
+            rows.append(inside)
+            tiles.append(tile[inside])
+    rows, tiles = np.concatenate(rows), np.concatenate(tiles)
+
+    shifted = tiles - tiles.min(axis=0)
+    order = np.argsort(shifted[:, 0] * (shifted[:, 1].max() + 1) + shifted[:, 1], kind="stable")
+    rows, tiles = rows[order], tiles[order]
+    bounds = np.flatnonzero(np.any(tiles[1:] != tiles[:-1], axis=1)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+        selected = rows[start:end]
+        core_low = tiles[start] * tile_voxels
+        yield {
+            'points': points[selected],
+            'core_low': core_low,
+            'core_high': core_low + tile_voxels,
+            **{name: array[selected] for name, array in arrays.items() if array is not None},
+        }
+
+
+def downsample_tile(points: np.ndarray, origin: np.ndarray, voxel_size: float, **arrays):
+    """ Average points and per-point arrays per voxel, like voxel_down_sample but on a fixed grid origin.
+    Returns:
+        voxel indices (m, 3), averaged points and {name: averaged array}, sorted by voxel
+    """
+    voxels = voxel_index(points, origin, voxel_size)
+    _, first, inverse = np.unique(voxel_keys(voxels - voxels.min(axis=0)), return_index=True, return_inverse=True)
+    counts = np.bincount(inverse).astype(np.float64)
+
+    def mean(array):
+        return np.stack([np.bincount(inverse, weights=column, minlength=len(counts)) for column in array.T], axis=1) / counts[:, None]
+
+    return voxels[first], mean(points), {name: mean(array) for name, array in arrays.items()}
+
+
+def process_tile(tile: dict, origin: np.ndarray, voxel_size: float, normal_radius: float, normal_max_nn: int,
+                 label_neighbors: int) -> dict:
+    """ Downsample, estimate normals and transfer labels for one tile, keep only its core voxels. """
+    attributes = {'colors': tile['colors']}
+    if 'normals' in tile:
+        attributes['normals'] = tile['normals']
+    voxels, down_points, down = downsample_tile(tile['points'], origin, voxel_size, **attributes)
+
+    down_pcd = o3d.geometry.PointCloud()
+    down_pcd.points = o3d.utility.Vector3dVector(down_points)
+    if 'normals' in down:
+        down_pcd.normals = o3d.utility.Vector3dVector(down['normals'])
+        down_pcd.normalize_normals()
+    else:
+        down_pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=normal_radius, max_nn=normal_max_nn))
+    labels = transfer_labels(tile['points'], tile['labels'], down_points, k=label_neighbors, workers=1)
+
+    core = np.all((voxels[:, :2] >= tile['core_low']) & (voxels[:, :2] < tile['core_high']), axis=1)
+    return {
+        'voxels': voxels[core],
+        'points': down_points[core],
+        'colors': down['colors'][core],
+        'normals': np.asarray(down_pcd.normals)[core],
+        'labels': labels[core],
+    }
+
+
+def stitch_tiles(results) -> dict:
+    """ Concatenate the tile cores, ordered by voxel so the result does not depend on the tiling. """
+    results = list(results)
+    stitched = {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+    order = np.lexsort(stitched['voxels'].T[::-1])
+    return {name: array[order] for name, array in stitched.items()}
+
+
+def map_bounded(executor, fn, items, max_pending: int):
+    """ executor.map that keeps at most max_pending items in flight, so payloads are built lazily. """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
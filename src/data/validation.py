@@ -0,0 +1,80 @@
+"""Vectorized row validation of a scene before it is saved.
+
+Every filter maps the scene arrays and the current keep-mask to a boolean mask of the rows it
+keeps. Filters run in order on the rows that survived the previous ones, so each row is counted
+once, by the first filter that drops it, and a duplicate voxel is resolved in favour of a valid
+row. All arrays are compacted once at the end.
+"""
+import numpy as np
+from quantize import first_in_voxel
+
+
+def non_finite(arrays: dict, keep: np.ndarray, **_) -> np.ndarray:
+    """ rows with NaN or inf in any floating point array """
+    mask = np.ones(len(keep), dtype=bool)
+    for array in arrays.values():
+        if np.issubdtype(array.dtype, np.floating):
+            # column by column, much faster than isfinite(array).all(axis=1) on narrow arrays
+            for column in array.reshape(len(array), -1).T:
+                mask &= np.isfinite(column)
+    return mask
+
+
+def invalid_label(arrays: dict, keep: np.ndarray, invalid_label: int = 0, **_) -> np.ndarray:
+    """ rows carrying the 'Invalid' class """
+    return arrays['labels'] != invalid_label
+
+
+def out_of_bounds(arrays: dict, keep: np.ndarray, coord_bounds=None, **_) -> np.ndarray:
+    """ grid coordinates outside [low, high), by default outside [0, int32 max) """
+    low, high = coord_bounds if coord_bounds is not None else (0, np.iinfo(np.int32).max)
+    mask = np.ones(len(keep), dtype=bool)
+    for column in arrays['coords'].T:
+        mask &= (column >= low) & (column < high)
+    return mask
+
+
+def duplicate_voxels(arrays: dict, keep: np.ndarray, **_) -> np.ndarray:
+    """ all but the first kept row of every voxel """
+    if keep.all():
+        return first_in_voxel(arrays['coords'])
+    rows = np.flatnonzero(keep)
+    mask = ~keep
+    mask[rows[first_in_voxel(arrays['coords'][rows])]] = True
+    return mask
+
+
+ROW_FILTERS = {
+    'non_finite': non_finite,
+    'invalid_label': invalid_label,
+    'out_of_bounds': out_of_bounds,
+    'duplicate_voxels': duplicate_voxels,
+}
+
+
+def validate_rows(arrays: dict, filters=tuple(ROW_FILTERS), **params):
+    """ Drop the rows rejected by any of the filters from all arrays.
+    Args:
+        arrays: equally long arrays, e.g. coords, features, labels
+        filters: names from ROW_FILTERS or callables with the same signature
+        params: passed to every filter, e.g. invalid_label=0, coord_bounds=(0, 4096)
+    Returns:
+        the compacted arrays and {filter name: number of dropped rows}
+    """
+    lengths = {name: len(array) for name, array in arrays.items()}
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f"Arrays have different lengths: {lengths}")
+    num_rows = next(iter(lengths.values()), 0)
+
+    keep = np.ones(num_rows, dtype=bool)
+    dropped = {}
+    for row_filter in filters:
+        name = row_filter if isinstance(row_filter, str) else row_filter.__name__
+        row_filter = ROW_FILTERS[row_filter] if isinstance(row_filter, str) else row_filter
+        mask = row_filter(arrays, keep, **params)
+        dropped[name] = int(np.count_nonzero(keep & ~mask))
+        keep &= mask
+
+    if keep.all():
+        return arrays, dropped
+    return {name: array[keep] for name, array in arrays.items()}, dropped
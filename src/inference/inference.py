@@ -0,0 +1,207 @@
+"""Tiled sliding-window inference on raw scans of any size.
+
+Every PCD file of cfg.inference_input_dir goes through the preprocessing of training
+(Preprocessor.process_scan: normalize, downsample, normals, quantize), is cut into overlapping
+windows (windows.py) and MyModel runs on batches of cfg.inference_windows_per_batch windows. The
+logits of overlapping windows are merged per voxel (cfg.inference_merge) and the predictions are
+written to cfg.inference_output_dir as <name>_inference.scene (coords, predictions, with
+cfg.inference_save_logits float16 logits and with cfg.inference_point_predictions the labels of
+every row of the input file, back-projected through the point index, see back_projection.py).
+
+Work overlaps on two levels: scans are preprocessed in a process pool while the model runs on the
+previous scan, and the next batch of windows is gathered in a thread while the model runs on the
+current one. Throughput and peak memory per scan and per run are logged and written to
+cfg.inference_report_file.
+"""
+import glob
+import json
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import torch
+import MinkowskiEngine as ME
+from colorama import Fore
+
+from config import Config
+from model import MyModel
+from feature_codec import decode_features
+from back_projection import back_project
+from preprocessing import Preprocessor
+from profiling import peak_rss, reset_peak_rss
+from quantize import dequantize
+from scene_format import write_scene, SCENE_SUFFIX
+from tiling import map_bounded
+from windows import LogitMerger, center_priority, plan_windows
+from utils import load_config_file, get_logger, worker_init
+
+logger = get_logger("logs/log-inference.txt", __name__)
+
+config_data = load_config_file("config.yaml")
+cfg = Config(config_data)
+
+
+def inference_device() -> torch.device:
+    if cfg.inference_device is not None:
+        return torch.device(cfg.inference_device)
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def load_model(model_file, device) -> MyModel:
+    """ MyModel from a state dict (torch.save) or a Lightning checkpoint (trainer.save_checkpoint) """
+    state = torch.load(model_file, map_location=device)
+    model = MyModel()
+    model.load_state_dict(state.get('state_dict', state))
+    return model.to(device).eval()
+
+
+def preprocess_scan(pcd_file) -> dict:
+    """ Process pool task: the preprocessed arrays of one raw scan, and the seconds it took """
+    start = time.perf_counter()
+    preprocessor = Preprocessor(cfg.voxel_size, "pcd", cfg.reuse_normals, cfg.normal_radius, cfg.normal_max_nn)
+    scene = preprocessor.process_scan(pcd_file)
+    return dict(scene, file=pcd_file, raw_points=len(preprocessor.pcd.points),
+                preprocess_seconds=time.perf_counter() - start)
+
+
+def window_batch(scene: dict, windows: list) -> tuple:
+    """ Thread pool task: collated coordinates (shifted to the window origins) and encoded features of a batch """
+    coords, feats = [], []
+    for window in windows:
+        local = scene['coords'][window['rows']].copy()
+        local[:, :2] -= window['low'].astype(local.dtype)
+        coords.append(local)
+        feats.append(scene['features'][window['rows']])
+    batch_coords, batch_feats = ME.utils.sparse_collate([torch.from_numpy(c) for c in coords],
+                                                       [torch.from_numpy(f) for f in feats])
+    return windows, batch_coords, batch_feats
+
+
+class InferenceEngine:
+    """
+    Sliding-window inference of one model over preprocessed scenes.
+
+    Attributes:
+        model (MyModel): in eval mode on device.
+        merge (str): "average" or "center", see windows.LogitMerger.
+    """
+    def __init__(self, model, device, window_voxels: int, overlap_voxels: int, merge: str = "average",
+                 windows_per_batch: int = 4, align: int = 1):
+        self.model = model
+        self.device = device
+        self.window_voxels = window_voxels
+        self.overlap_voxels = overlap_voxels
+        self.merge = merge
+        self.windows_per_batch = max(1, windows_per_batch)
+        self.align = align
+
+    def forward(self, coords, feats) -> np.ndarray:
+        """ Logits (rows, num_classes) of one collated batch, in the order of its rows """
+        coords = coords.to(self.device)
+        stensor = ME.SparseTensor(decode_features(feats.to(self.device)), coordinates=coords)
+        # logits in the order of the input rows, independent of how ME orders its coordinates
+        return self.model(stensor).features_at_coordinates(coords.float()).cpu().numpy()
+
+    def predict(self, scene: dict, num_classes: int, batch_pool=None) -> tuple:
+        """ Merged logits (n, num_classes) of a preprocessed scene, and the number of windows.
+        Args:
+            batch_pool: executor gathering the next batches while the model runs, default: in line
+        """
+        windows = plan_windows(scene['coords'], self.window_voxels, self.overlap_voxels, self.align)
+        merger = LogitMerger(len(scene['coords']), num_classes, self.merge)
+        batches = [windows[start:start + self.windows_per_batch] for start in range(0, len(windows), self.windows_per_batch)]
+        gather = partial(window_batch, scene)
+        prepared = map_bounded(batch_pool, gather, batches, max_pending=2) if batch_pool is not None else map(gather, batches)
+        with torch.no_grad():
+            for batch_windows, coords, feats in prepared:
+                logits = self.forward(coords, feats)
+                offset = 0
+                for window in batch_windows:
+                    rows = window['rows']
+                    window_logits = logits[offset:offset + len(rows)]
+                    offset += len(rows)
+                    priority = center_priority(scene['coords'][rows], window) if self.merge == "center" else None
+                    merger.add(rows, window_logits, priority)
+        return merger.result(), len(windows)
+
+
+def save_predictions(scene: dict, logits: np.ndarray, output_dir) -> str:
+    name = os.path.splitext(os.path.basename(scene['file']))[0]
+    output_file = os.path.join(output_dir, f"{name}_inference{SCENE_SUFFIX}")
+    arrays = {'coords': scene['coords'], 'predictions': np.argmax(logits, axis=1).astype(np.uint8)}
+    if cfg.inference_save_logits:
+        arrays['logits'] = logits.astype(np.float16)
+    if cfg.inference_point_predictions:
+        arrays['point_predictions'] = back_project(arrays['predictions'], scene['point_index'],
+                                                   dequantize(scene['coords'], scene['quantization']),
+                                                   scene['unmapped_points'], k=cfg.back_projection_neighbors, fill=255)
+    write_scene(output_file, arrays, meta={'quantization': scene['quantization'], 'source': scene['file']})
+    return output_file
+
+
+def main(pcd_files=None) -> dict:
+    """ Inference on pcd_files (default: every PCD file of cfg.inference_input_dir), returns the run report """
+    pcd_files = sorted(glob.glob(os.path.join(cfg.inference_input_dir, "*.pcd"))) if pcd_files is None else pcd_files
+    if not pcd_files:
+        logger.warning("No PCD files in %s", cfg.inference_input_dir)
+        return {}
+    os.makedirs(cfg.inference_output_dir, exist_ok=True)
+    device = inference_device()
+    model = load_model(cfg.model_save_path, device)
+    engine = InferenceEngine(model, device, cfg.inference_window_voxels, cfg.inference_overlap_voxels,
+                             cfg.inference_merge, cfg.inference_windows_per_batch, cfg.inference_align_voxels)
+    logger.info("%sInference on %d scans on %s, windows of %d voxels (overlap %d), %s merge%s", Fore.CYAN,
+                len(pcd_files), device, cfg.inference_window_voxels, cfg.inference_overlap_voxels, cfg.inference_merge,
+                Fore.RESET)
+
+    reset_peak_rss()
+    start = time.perf_counter()
+    scenes = []
+    workers = max(1, cfg.inference_workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=worker_init()) as scan_pool, ThreadPoolExecutor(max_workers=1) as batch_pool:
+        # the next scans are preprocessed while the model runs on the current one
+        for scene in map_bounded(scan_pool, preprocess_scan, pcd_files, max_pending=workers + 1):
+            model_start = time.perf_counter()
+            logits, num_windows = engine.predict(scene, cfg.num_classes, batch_pool)
+            output_file = save_predictions(scene, logits, cfg.inference_output_dir)
+            model_seconds = time.perf_counter() - model_start
+            record = {
+                'file': scene['file'],
+                'output_file': output_file,
+                'raw_points': scene['raw_points'],
+                'voxels': len(scene['coords']),
+                'windows': num_windows,
+                'preprocess_seconds': scene['preprocess_seconds'],
+                'model_seconds': model_seconds,
+                'voxels_per_s': len(scene['coords']) / max(model_seconds, 1e-9),
+            }
+            logger.info("%s: %d points, %d voxels in %d windows, preprocessed in %.2f s, model %.2f s (%.0f voxels/s)",
+                        os.path.basename(scene['file']), record['raw_points'], record['voxels'], num_windows,
+                        record['preprocess_seconds'], model_seconds, record['voxels_per_s'])
+            scenes.append(record)
+
+    seconds = time.perf_counter() - start
+    raw_points = sum(record['raw_points'] for record in scenes)
+    voxels = sum(record['voxels'] for record in scenes)
+    report = {
+        'scans': len(scenes),
+        'device': str(device),
+        'seconds': seconds,
+        'raw_points': raw_points,
+        'voxels': voxels,
+        'points_per_s': raw_points / max(seconds, 1e-9),
+        'voxels_per_s': voxels / max(seconds, 1e-9),
+        'peak_rss_bytes': peak_rss(),
+        # the largest preprocessing worker, ru_maxrss is in KiB on Linux
+        'peak_worker_rss_bytes': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        'scenes': scenes,
+    }
+    logger.info("Inference of %d scans in %.2f s: %.0f points/s, %.0f voxels/s, peak RSS %.1f MB (workers %.1f MB)",
+                len(scenes), seconds, report['points_per_s'], report['voxels_per_s'], report['peak_rss_bytes'] / 2**20,
+                report['peak_worker_rss_bytes'] / 2**20)
+    with open(cfg.inference_report_file, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
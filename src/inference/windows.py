@@ -0,0 +1,90 @@
+"""Overlapping spatial windows over a preprocessed scene and the merge of their logits.
+
+The horizontal plane is covered by square windows of window_voxels, one every window_voxels -
+overlap_voxels, starting on multiples of align (the largest tensor stride of the model, so a
+window is pooled on the same grid as the whole scene). Windows are found through the block
+index of crop sampling (utils/block_index.py): a window reads the row ranges of the blocks it
+overlaps, so planning costs O(points) and no window scans the whole scene.
+
+Every point lies in at least one window and, with overlap, in up to four. LogitMerger combines
+their logits per point: "average" takes the mean, "center" keeps the logits of the window whose
+center is closest (Chebyshev distance), where the receptive field is least cut off.
+"""
+import numpy as np
+
+from block_index import build_block_index, crop_ranges
+
+MERGE_MODES = ("average", "center")
+
+
+def plan_windows(coords: np.ndarray, window_voxels: int, overlap_voxels: int, align: int = 1) -> list:
+    """ Non-empty windows of the scene, each {'rows': rows of coords, 'low': (x, y), 'high': (x, y)} """
+    step = window_voxels - overlap_voxels
+    if not 0 <= overlap_voxels < window_voxels:
+        raise ValueError(f"The window overlap ({overlap_voxels} voxels) must be smaller than the window ({window_voxels} voxels)")
+    if window_voxels % align or step % align:
+        raise ValueError(f"Window ({window_voxels}) and window step ({step}) must be multiples of {align} voxels")
+    coords = np.asarray(coords)
+    if not len(coords):
+        return []
+    xy = coords[:, :2].astype(np.int64)
+    origin = np.floor_divide(xy.min(axis=0), align) * align
+    extent = xy.max(axis=0) - origin + 1
+    counts = np.maximum(-(-(extent - window_voxels) // step), 0) + 1  # ceil, at least one window per axis
+
+    order, index = build_block_index(xy - origin, np.zeros(len(xy), dtype=np.int64), step)
+    local = (xy - origin)[order]
+    windows = []
+    for i in range(counts[0]):
+        for j in range(counts[1]):
+            low = np.array([i, j]) * step
+            high = low + window_voxels
+            rows = []
+            for start, end in crop_ranges(index, step, low, high):
+                inside = np.all((local[start:end] >= low) & (local[start:end] < high), axis=1)
+                rows.append(order[start:end][inside])
+            rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+            if len(rows):
+                windows.append({'rows': np.sort(rows), 'low': origin + low, 'high': origin + high})
+    return windows
+
+
+def center_priority(coords: np.ndarray, window: dict) -> np.ndarray:
+    """ Higher for points closer to the window center, the negative Chebyshev distance in voxels """
+    center = (np.asarray(window['low']) + np.asarray(window['high'])) / 2.0
+    return -np.max(np.abs(np.asarray(coords)[:, :2] - center), axis=1)
+
+
+class LogitMerger:
+    """
+    Per-point logits of a scene, accumulated window by window.
+
+    Attributes:
+        mode (str): "average" (mean over all windows covering a point) or "center" (logits of the window
+            whose center is closest).
+        coverage (np.ndarray): windows per point.
+    """
+    def __init__(self, num_points: int, num_classes: int, mode: str = "average"):
+        if mode not in MERGE_MODES:
+            raise ValueError(f"Invalid merge mode {mode}. Must be one of {MERGE_MODES}")
+        self.mode = mode
+        self.logits = np.zeros((num_points, num_classes), dtype=np.float32)
+        self.coverage = np.zeros(num_points, dtype=np.int32)
+        if mode == "center":
+            self.priority = np.full(num_points, -np.inf)
+
+    def add(self, rows: np.ndarray, logits: np.ndarray, priority: np.ndarray = None) -> None:
+        """ Logits (len(rows), num_classes) of one window; priority is required by "center" """
+        self.coverage[rows] += 1
+        if self.mode == "average":
+            self.logits[rows] += logits
+            return
+        better = priority > self.priority[rows]
+        self.priority[rows[better]] = priority[better]
+        self.logits[rows[better]] = logits[better]
+
+    def result(self) -> np.ndarray:
+        """ Merged logits, rows not covered by any window stay 0 """
+        if self.mode == "average":
+            return self.logits / np.maximum(self.coverage, 1)[:, None]
+        return self.logits
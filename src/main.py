@@ -9,6 +9,7 @@ import pyfiglet
 import sys
 import preprocess_minkowski
 import test
+import inference
 from colorama import Fore
 from config import Config
 from utils import load_config_file, get_logger
@@ -62,7 +63,7 @@ def execute_command(command):
         set_seed(args.seed)
         mp.set_start_method('spawn', force=True)
         model = MyModel().to(device)
-        train_main()
+        train_main(seed=args.seed)
     elif command == "3":
         print(Fore.CYAN + "Executing Test..." + Fore.RESET)
         try: 
@@ -72,13 +73,17 @@ def execute_command(command):
             return
     elif command == "4":
         print(Fore.CYAN + "Executing Inference..." + Fore.RESET)
-        print(Fore.CYAN + "Loading Model" + Fore.RESET)
         try:
-            model = torch.load(cfg.model_save_path)
-            print("Model Loaded")
-        except:
-            print( Fore.RED + "Model not found. Please train the model first, or specify the correct path to the model." + Fore.RESET)
+            report = inference.main()
+        except Exception as e:
+            logger.exception("Inference failed: %s", e)
+            if isinstance(e, FileNotFoundError) and e.filename == cfg.model_save_path:
+                print( Fore.RED + "Model not found. Please train the model first, or specify the correct path to the model." + Fore.RESET)
+            else:
+                print( Fore.RED + f"Inference failed: {e}" + Fore.RESET)
             return
+        if report:
+            print(f"{report['scans']} scans, {report['points_per_s']:.0f} points/s, peak RSS {report['peak_rss_bytes'] / 2**20:.0f} MB")
     else:
         print(Fore.RED + "Invalid command. Just the number suffices. Please try again." + Fore.RESET)
         
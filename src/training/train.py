@@ -1,15 +1,20 @@
+import time
 import torch
 import pytorch_lightning as pl
 import torch.nn as nn
+import torch.nn.functional as F
 from torch.utils.data import DataLoader
 from pytorch_lightning.callbacks import ModelCheckpoint
 import MinkowskiEngine as ME
 from dataset import PointCloudDataset
+from shared_pool import SharedScenePool
+from batch_sampler import EpochSampler, PointBudgetBatchSampler
 from config import Config
 from pytorch_lightning.callbacks import EarlyStopping
 from model import MyModel
+from feature_codec import decode_features, decode_labels
 from colorama import Fore, Style
-from utils import load_config_file, get_logger
+from utils import load_config_file, get_logger, worker_init
 
 logger = get_logger("logs/log-train.txt", __name__)
 
@@ -18,42 +23,122 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 config_data = load_config_file("config.yaml")
 cfg = Config(config_data)
 
+class PointThroughput(pl.Callback):
+    """ Logs the training throughput per epoch in points (voxels) per second and the points per batch """
+    def on_train_epoch_start(self, trainer, pl_module):
+        self.points, self.batches, self.start = 0, 0, time.perf_counter()
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx, *args):
+        # batch_sparse_collate: (coords, feats, labels), one row per point of all scenes in the batch
+        self.points += len(batch[0])
+        self.batches += 1
+
+    def on_train_epoch_end(self, trainer, pl_module, *args):
+        seconds = time.perf_counter() - self.start
+        logger.info("Epoch %d: %d batches, %.0f points/batch, %.0f points/s", trainer.current_epoch, self.batches,
+                    self.points / max(self.batches, 1), self.points / max(seconds, 1e-9))
+
+class SegmentationModel(MyModel):
+    """ MyModel with the steps for the compact batches of PointCloudDataset: the uint8 features and class indices
+    are collated and transferred as they are and only expanded on the device, at the start of every step (see
+    feature_codec.py). The loss takes the class indices, no one-hot is built. """
+    def logits(self, coords, feats):
+        """ (rows, num_classes) logits in the order of the batch rows """
+        stensor = ME.SparseTensor(feats, coordinates=coords)
+        return self(stensor).features_at_coordinates(coords.float())
+
+    def loss(self, batch):
+        coords, feats, labels = batch
+        return F.cross_entropy(self.logits(coords, decode_features(feats)), decode_labels(labels))
+
+    def training_step(self, batch, batch_idx):
+        loss = self.loss(batch)
+        self.log('train_loss', loss)
+        return loss
+
+    def validation_step(self, batch, batch_idx):
+        loss = self.loss(batch)
+        self.log('val_loss', loss)
+        return loss
+
+    def test_step(self, batch, batch_idx):
+        loss = self.loss(batch)
+        self.log('test_loss', loss)
+        return loss
+
 # model is instantiated here, not shared in multiple processes
-def train_main() -> None:
+def train_main(seed: int = 1) -> None:
     
-    train_dataset = PointCloudDataset("train")
+    train_dataset = PointCloudDataset("train", seed=seed)
     val_dataset = PointCloudDataset("val")
     test_dataset = PointCloudDataset("test")
     
-    logger.info(f"trying to load {len(train_dataset)} files from train_dataset")
+    logger.info(f"trying to load {train_dataset.num_scenes()} files from train_dataset")
     logger.info(f"trying to load {len(val_dataset)} files from val_dataloader")
     logger.info(f"trying to load {len(test_dataset)} files from test_dataloader")
 
+    shared_pools = []
+    if cfg.shared_scene_pool:
+        # one copy of every split in shared memory, the dataloader workers attach to it read-only
+        for dataset in (train_dataset, val_dataset, test_dataset):
+            pool = SharedScenePool.from_dataset(dataset)
+            dataset.attach_pool(pool)
+            shared_pools.append(pool)
+            logger.info("Shared scene pool of %d scenes, %.1f MB", len(pool), pool.nbytes / 2**20)
+
+    try:
+        _fit(train_dataset, val_dataset, test_dataset, seed)
+    finally:
+        for pool in shared_pools:
+            pool.unlink()
+
+def _batching(dataset, shuffle: bool, seed: int) -> dict:
+    """ DataLoader arguments: batches of up to cfg.batch_point_budget points, or of cfg.batch_size scenes or crops """
+    if dataset.crop:
+        # crops have at most cfg.crop_max_points points, fixed batches bound the memory already
+        logger.info("%d random crops of %d voxels per epoch from %d scenes", len(dataset), cfg.crop_voxels,
+                    dataset.num_scenes())
+        return {'batch_size': cfg.batch_size, 'sampler': EpochSampler(len(dataset))}
+    if cfg.batch_point_budget is None:
+        return {'batch_size': cfg.batch_size, 'shuffle': shuffle}
+    # point counts come from the scene headers, nothing is loaded
+    sampler = PointBudgetBatchSampler(dataset.point_counts(), cfg.batch_point_budget, shuffle=shuffle, seed=seed,
+                                      bucket_size=cfg.batch_bucket_size)
+    stats = sampler.stats()
+    logger.info("%d scenes in %d batches of %.0f points on average (cv %.2f, %.0f%% of the budget, %d over it)",
+                len(dataset), stats['batches'], stats.get('points_mean', 0), stats.get('points_cv', 0),
+                100 * stats.get('budget_fill', 0), stats.get('over_budget', 0))
+    return {'batch_sampler': sampler}
+
+def _fit(train_dataset, val_dataset, test_dataset, seed: int = 1) -> None:
+    # spawned dataloader workers log through the queue of this process
+    log_init = worker_init()
+
     train_dataloader = DataLoader(
         train_dataset,
-        batch_size=cfg.batch_size,
         collate_fn=ME.utils.batch_sparse_collate,
         num_workers=cfg.num_workers,
-        shuffle=True,
-        pin_memory=True
+        worker_init_fn=log_init,
+        pin_memory=True,
+        **_batching(train_dataset, True, seed)
     )
 
     val_dataloader = DataLoader(
         val_dataset,
-        batch_size=cfg.batch_size,
         collate_fn=ME.utils.batch_sparse_collate,
         num_workers=cfg.num_workers,
-        shuffle=False,
-        pin_memory=True
+        worker_init_fn=log_init,
+        pin_memory=True,
+        **_batching(val_dataset, False, seed)
     )
 
     test_dataloader = DataLoader(
         test_dataset,
-        batch_size=cfg.batch_size,
         collate_fn=ME.utils.batch_sparse_collate,
         num_workers=cfg.num_workers,
-        shuffle=False,
-        pin_memory=True
+        worker_init_fn=log_init,
+        pin_memory=True,
+        **_batching(test_dataset, False, seed)
     )
 
     checkpoint_callback = ModelCheckpoint(
@@ -67,9 +152,9 @@ def train_main() -> None:
     # early stopping when the validation loss does not improve for a certain number of epochs
     early_stopping_callback = EarlyStopping(monitor='val_loss', patience=10, mode='min')
     logger.info(f"{Fore.CYAN}Preparing to train...{Style.RESET_ALL}")
-    trainer = pl.Trainer(gpus=cfg.num_gpus, callbacks=[checkpoint_callback, early_stopping_callback])
+    trainer = pl.Trainer(gpus=cfg.num_gpus, callbacks=[checkpoint_callback, early_stopping_callback, PointThroughput()])
     logger.info(f"{Fore.CYAN}Instantiating Model...{Style.RESET_ALL}")
-    model = MyModel()
+    model = SegmentationModel()
     logger.info(f"{Fore.CYAN}training... {Style.RESET_ALL}")
     trainer.fit(model, train_dataloader, val_dataloader)
     # how is it different from test.py
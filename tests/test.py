@@ -1,43 +1,208 @@
+import json
+import os
+import time
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import torch
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, Subset
 from dataset import PointCloudDataset
+from batch_sampler import shard_scenes
 from model import MyModel
 import yaml
 import numpy as np
-from utils import visualize_point_cloud_with_labels, calculate_metrics
+from utils import visualize_point_cloud_with_labels
+from metrics import ConfusionMatrix
+from feature_codec import decode_features, decode_labels
 import MinkowskiEngine as ME
 from config import Config
 from colorama import Fore, Style
-from utils import load_config_file, get_logger
+from utils import load_config_file, get_logger, worker_init
 
 logger = get_logger('logs/log-test.txt', __name__)
     
 config_data = load_config_file("config.yaml")
 cfg = Config(config_data)
 
-def evaluate(model, dataloader, device):
+def evaluate(model, dataloader, device, num_classes=None):
+    """ One confusion matrix over all batches (see metrics.py), and the predictions of the first batch for the visualization """
     model.eval()
-    all_preds, all_labels = [], []
+    confusion = ConfusionMatrix(num_classes or cfg.num_classes)
+    first_preds = None
 
     with torch.no_grad():
         for coords, feats, labels in dataloader:
             coords, feats, labels = coords.to(device), feats.to(device), labels.to(device)
+            # compact uint8 batch is transferred as is and only expanded on the device
+            feats, labels = decode_features(feats), decode_labels(labels)
             stensor = ME.SparseTensor(feats, coords=coords)
             outputs = model(stensor)
             preds = torch.argmax(outputs.F, dim=1)
-            all_preds.append(preds.cpu().numpy())
-            all_labels.append(labels.cpu().numpy())
+            # bincount on the device, only the C x C counts are copied back
+            confusion.update(preds, labels)
+            if first_preds is None:
+                first_preds = preds.cpu().numpy()
 
-    return all_preds, all_labels
+    return confusion, first_preds
+
+def log_metrics(metrics):
+    logger.info("Evaluation Metrics:")
+
+    for metric_name, metric_value in metrics.items():
+        if metric_name == "iou":
+            for idx, iou_value in enumerate(metric_value):
+                logger.info(f"IoU for class {idx}: {iou_value}")
+        elif np.ndim(metric_value) == 0:  # the other per-class arrays are not logged
+            logger.info(f"{metric_name}: {metric_value}")
+
+    logger.info("Per-class Accuracy:")
+    for idx, acc_value in enumerate(metrics["per_class_accuracy"]):
+        logger.info(f"Class {idx}: {acc_value}")
+
+# Sharded CPU evaluation: the test scenes are split into one shard per worker process by point count. A worker loads
+# the checkpoint once (memory-mapped where torch supports it), pins its intra-op threads (and cores) so that workers do
+# not oversubscribe the machine, and returns the confusion matrix of its shard, which the parent adds up. A scene is
+# always evaluated alone in its batch, but float reductions of the model can round differently with another intra-op
+# thread count and flip an argmax, so runs are only bit-identical with the same threads per worker: scaling_report
+# uses one thread count for every worker count, and one worker also runs in a spawned process like the others. It
+# also runs the in-process evaluation once, on the CPU with the same thread count and one scene per batch, as the
+# reference the sharded runs are compared with.
+_worker = {}
+
+def load_checkpoint(model_file, device):
+    try:
+        state = torch.load(model_file, map_location=device, mmap=True)
+    except (TypeError, RuntimeError):
+        # older torch, or a checkpoint not in the zip format
+        state = torch.load(model_file, map_location=device)
+    model = MyModel().to(device)
+    model.load_state_dict(state.get('state_dict', state))
+    return model
+
+def _init_worker(worker_ids, threads, log_init, dataset, load_model):
+    # records of the worker go to the log listener of the parent
+    log_init()
+    worker_id = worker_ids.get()
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if cfg.eval_pin_cores and len(cores) >= (worker_id + 1) * threads:
+        os.sched_setaffinity(0, cores[worker_id * threads:(worker_id + 1) * threads])
+    _worker['dataset'] = dataset
+    _worker['model'] = load_model(torch.device("cpu"))
+
+def evaluate_scenes(model, dataset, scenes, device):
+    """ Confusion matrix of the given scenes, one scene per batch """
+    dataloader = DataLoader(Subset(dataset, scenes), batch_size=1, collate_fn=ME.utils.batch_sparse_collate,
+                            shuffle=False, num_workers=0)
+    return evaluate(model, dataloader, device)[0]
+
+def _evaluate_shard(scenes):
+    start = time.perf_counter()
+    confusion = evaluate_scenes(_worker['model'], _worker['dataset'], scenes, torch.device("cpu"))
+    return confusion.matrix, time.perf_counter() - start
+
+def evaluate_sharded(dataset, num_workers, threads_per_worker=None, load_model=None):
+    """ Confusion matrix of the whole dataset, evaluated on the CPU in num_workers processes.
+    load_model(device) gives the model of a worker, by default the checkpoint at cfg.model_save_path.
+    Returns:
+        the reduced ConfusionMatrix and the seconds of every shard
+    """
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+    load_model = load_model or partial(load_checkpoint, cfg.model_save_path)
+    shards = shard_scenes(dataset.point_counts(), num_workers)
+    confusion = ConfusionMatrix(cfg.num_classes)
+    if not shards:
+        return confusion, [0.0]
+
+    context = multiprocessing.get_context("spawn")
+    worker_ids = context.Queue()
+    for worker_id in range(len(shards)):
+        worker_ids.put(worker_id)
+    # inherited by the spawned workers before they import torch, so OpenMP starts with the pinned thread count
+    previous = {name: os.environ.get(name) for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")}
+    os.environ.update({name: str(threads) for name in previous})
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context, initializer=_init_worker,
+                                 initargs=(worker_ids, threads, worker_init(), dataset, load_model)) as pool:
+            results = list(pool.map(_evaluate_shard, shards))
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    for matrix, _ in results:
+        confusion.merge(matrix)
+    return confusion, [seconds for _, seconds in results]
+
+def evaluate_in_process(dataset, threads, load_model=None):
+    """ Confusion matrix of evaluate in this process on the CPU, one scene per batch, with threads intra-op threads """
+    load_model = load_model or partial(load_checkpoint, cfg.model_save_path)
+    previous = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        start = time.perf_counter()
+        confusion = evaluate_scenes(load_model(torch.device("cpu")), dataset, range(dataset.num_scenes()),
+                                    torch.device("cpu"))
+        return confusion, time.perf_counter() - start
+    finally:
+        torch.set_num_threads(previous)
+
+def scaling_report(dataset, worker_counts, threads_per_worker=None, load_model=None):
+    """ Time, throughput and speedup over 1 worker for every worker count, and whether the confusion matrix is
+    identical to the 1 worker one and to the in-process evaluation. Every run uses the same threads per worker
+    (default: the cores divided by the largest worker count), see above. """
+    points = int(dataset.point_counts().sum())
+    worker_counts = sorted(set([1] + list(worker_counts)))
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // worker_counts[-1])
+    in_process, in_process_seconds = evaluate_in_process(dataset, threads, load_model)
+    logger.info("in process: %.2f s, %d threads", in_process_seconds, threads)
+    runs, reference, baseline = [], None, None
+    for num_workers in worker_counts:
+        start = time.perf_counter()
+        confusion, shard_seconds = evaluate_sharded(dataset, num_workers, threads, load_model)
+        seconds = time.perf_counter() - start
+        reference = confusion.matrix if reference is None else reference
+        baseline = seconds if baseline is None else baseline
+        run = {
+            'workers': num_workers,
+            'threads_per_worker': threads,
+            'seconds': seconds,
+            'points_per_s': points / max(seconds, 1e-9),
+            'speedup': baseline / max(seconds, 1e-9),
+            'efficiency': baseline / max(seconds, 1e-9) / num_workers,
+            'shard_imbalance': max(shard_seconds) / max(np.mean(shard_seconds), 1e-9),
+            'identical': bool(np.array_equal(confusion.matrix, reference)),
+            'identical_in_process': bool(np.array_equal(confusion.matrix, in_process.matrix)),
+        }
+        logger.info("%2d workers: %.2f s, %.0f points/s, speedup %.2f (efficiency %.0f%%), shard imbalance %.2f, %s, %s",
+                    num_workers, seconds, run['points_per_s'], run['speedup'], 100 * run['efficiency'],
+                    run['shard_imbalance'], "identical" if run['identical'] else "DIFFERENT from 1 worker",
+                    "identical" if run['identical_in_process'] else "DIFFERENT from in process")
+        runs.append(run)
+    with open(cfg.eval_scaling_report_file, "w") as f:
+        json.dump({'scenes': dataset.num_scenes(), 'points': points, 'threads_per_worker': threads,
+                   'in_process_seconds': in_process_seconds, 'runs': runs}, f, indent=2)
+    return runs
 
 def main():
     
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     test_dataset = PointCloudDataset("test")
+
+    if cfg.eval_scaling_workers:
+        scaling_report(test_dataset, cfg.eval_scaling_workers, cfg.eval_threads_per_worker)
+        return
+    if cfg.eval_workers > 1:
+        logger.info(f"{Fore.BLUE}evaluating in {cfg.eval_workers} processes... {Style.RESET_ALL}")
+        confusion, _ = evaluate_sharded(test_dataset, cfg.eval_workers, cfg.eval_threads_per_worker)
+        log_metrics(confusion.metrics())
+        return
     
     test_dataloader = DataLoader(
         test_dataset,
-        batch_size=batch_size,
+        batch_size=cfg.batch_size,
         collate_fn=ME.utils.batch_sparse_collate,
         shuffle=False,
         num_workers=cfg.num_workers
@@ -47,23 +212,12 @@ def main():
     model.load_state_dict(torch.load(cfg.model_save_path))
     logger.info(f"{Fore.BLUE}evaluating... {Style.RESET_ALL}")
 
-    all_preds, all_labels = evaluate(model, test_dataloader, device)
+    confusion, first_preds = evaluate(model, test_dataloader, device)
 
-    # Calculate evaluation metrics (e.g., accuracy, precision, recall, F1-score) using all_preds and all_labels
-    metrics = calculate_metrics(all_preds, all_labels)
-    logger.info("Evaluation Metrics:")
-    
-    for metric_name, metric_value in metrics.items():
-        if metric_name == "iou":
-            for idx, iou_value in enumerate(metric_value):
-                logger.info(f"IoU for class {idx}: {iou_value}")
-        elif metric_name != "per_class_accuracy":
-            logger.info(f"{metric_name}: {metric_value}")
+    # accuracy, precision, recall, F1-score and IoU, all from the one confusion matrix
+    metrics = confusion.metrics()
+    log_metrics(metrics)
 
-    logger.info("Per-class Accuracy:")
-    for idx, acc_value in enumerate(metrics["per_class_accuracy"]):
-        logger.info(f"Class {idx}: {acc_value}")
-    
     # visualize the results
     logger.info('Visualising the first point cloud with predicted labels...')
     test_index = 0  
@@ -71,7 +225,7 @@ def main():
     test_features, test_labels = test_dataset[test_index]
     # TODO: (check) coordinates are not part of the features in miunkowski
     test_coordinates, test_colors, test_normals = test_features[:, :3], test_features[:, 3:6], test_features[:, 6:9]
-    test_preds = all_preds[test_index]
+    test_preds = first_preds
    
     with open(cfg.yaml_file_path, 'r') as yaml_file:
         label_colors = yaml.safe_load(yaml_file)
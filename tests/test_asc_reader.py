@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from asc_reader import INVALID_LABEL, read_asc, iter_asc_chunks
+
+class TestAscReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.asc_file = os.path.join(self.tmp_dir.name, "scan.asc")
+        rng = np.random.default_rng(0)
+        n = 5000
+        self.array = np.column_stack([rng.random((n, 3)) * 10, rng.integers(0, 256, (n, 3)),
+                                      rng.integers(0, 30, n), rng.random((n, 3)) * 2 - 1])
+        np.savetxt(self.asc_file, self.array, delimiter=";", fmt="%.6f")
+        self.array = np.loadtxt(self.asc_file, delimiter=";")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check(self, records):
+        self.assertEqual(len(records), len(self.array))
+        np.testing.assert_allclose(records["x"], self.array[:, 0])
+        np.testing.assert_array_equal(records["label"], self.array[:, 6])
+        np.testing.assert_allclose(records["normal_z"], self.array[:, 9], atol=1e-6)
+
+    def test_chunks_cover_every_row_once(self):
+        chunks = list(iter_asc_chunks(self.asc_file, chunk_bytes=4096))
+        self.assertGreater(len(chunks), 1)
+        self.check(np.concatenate(chunks))
+
+    def test_parallel_ranges(self):
+        self.check(read_asc(self.asc_file, workers=3, cache=False, chunk_bytes=10_001))
+
+    def test_columns_and_dtypes(self):
+        records = read_asc(self.asc_file, columns=["x", "label"], dtypes={"x": np.float32}, cache=False)
+        self.assertEqual(records.dtype.names, ("x", "label"))
+        self.assertEqual(records["x"].dtype, np.float32)
+        self.assertEqual(records["label"].dtype, np.uint8)
+
+    def test_sidecar(self):
+        self.check(read_asc(self.asc_file, workers=2))
+        self.assertTrue(os.path.exists(self.asc_file + ".bin"))
+        cached = read_asc(self.asc_file, columns=["x", "label", "normal_z"])
+        self.assertIsInstance(cached.base, np.memmap)
+        self.check(cached)
+
+    def test_stale_sidecar_is_rebuilt(self):
+        read_asc(self.asc_file)
+        np.savetxt(self.asc_file, self.array[:10], delimiter=";", fmt="%.6f")
+        self.assertEqual(len(read_asc(self.asc_file)), 10)
+
+    def test_label_overflow(self):
+        self.array[0, 6] = 300
+        np.savetxt(self.asc_file, self.array, delimiter=";", fmt="%.6f")
+        with self.assertRaises(ValueError):
+            read_asc(self.asc_file, cache=False)
+
+    def test_bad_labels_are_invalid(self):
+        rows = np.loadtxt(self.asc_file, delimiter=";", dtype=str)
+        rows[[3, 40, 41], 6] = ["nan", "2.5", "-inf"]
+        np.savetxt(self.asc_file, rows, delimiter=";", fmt="%s")
+        for records in (read_asc(self.asc_file, cache=False), read_asc(self.asc_file)):
+            np.testing.assert_array_equal(records["label"][[3, 40, 41]], INVALID_LABEL)
+            np.testing.assert_array_equal(np.delete(records["label"], [3, 40, 41]), np.delete(self.array[:, 6], [3, 40, 41]))
+
+    def test_non_integer_colors(self):
+        self.array[5, 3] = np.nan
+        np.savetxt(self.asc_file, self.array, delimiter=";", fmt="%.6f")
+        with self.assertRaises(ValueError):
+            read_asc(self.asc_file, cache=False)
+
+if __name__ == '__main__':
+    unittest.main()
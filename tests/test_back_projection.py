@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from quantize import quantize, point_voxel_index, unique_voxels
+from back_projection import back_project, point_index_file, read_point_index, write_point_index
+
+class TestBackProjection(unittest.TestCase):
+    voxel_size = 0.05
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.points = rng.random((20000, 3))
+        grid, self.origin = quantize(self.points, self.voxel_size, self.points.min(axis=0) - self.voxel_size / 2, stride=2)
+        first = unique_voxels(grid)
+        # saved voxels in a shuffled order, a few dropped as if by validation
+        keep = rng.permutation(first)[:len(first) - 10]
+        self.grid = grid[keep]
+        self.point_grid = grid
+
+    def test_point_voxel_index(self):
+        index = point_voxel_index(self.points, self.grid, self.origin, self.voxel_size, stride=2)
+        self.assertEqual(index.dtype, np.int32)
+        found = index >= 0
+        np.testing.assert_array_equal(self.grid[index[found]], self.point_grid[found])
+        saved = {tuple(row) for row in self.grid.tolist()}
+        self.assertFalse(any(tuple(row) in saved for row in self.point_grid[~found].tolist()))
+        self.assertGreater(np.count_nonzero(~found), 0)
+
+    def test_gather_and_fallback(self):
+        index = point_voxel_index(self.points, self.grid, self.origin, self.voxel_size, stride=2)
+        labels = np.arange(len(self.grid), dtype=np.int64) % 7
+        projected = back_project(labels, index, fill=-1)
+        np.testing.assert_array_equal(projected[index >= 0], labels[index[index >= 0]])
+        self.assertTrue(np.all(projected[index < 0] == -1))
+
+        centers = self.origin + (self.grid / 2 + 0.5) * self.voxel_size
+        nearest = back_project(labels, index, centers, self.points, k=1)
+        missing = np.flatnonzero(index < 0)
+        brute = np.argmin(((self.points[missing, None] - centers[None]) ** 2).sum(axis=2), axis=1)
+        np.testing.assert_array_equal(nearest[missing], labels[brute])
+        # the coordinates of the missing rows alone give the same result
+        np.testing.assert_array_equal(back_project(labels, index, centers, self.points[missing], k=1), nearest)
+
+    def test_logits_and_non_finite(self):
+        index = point_voxel_index(self.points, self.grid, self.origin, self.voxel_size, stride=2)
+        index[:3] = -1
+        points = self.points.copy()
+        points[0] = np.nan
+        centers = self.origin + (self.grid / 2 + 0.5) * self.voxel_size
+        logits = np.random.default_rng(1).random((len(self.grid), 4)).astype(np.float32)
+        projected = back_project(logits, index, centers, points, k=3, fill=0.0)
+        self.assertEqual(projected.shape, (len(points), 4))
+        np.testing.assert_array_equal(projected[0], 0.0)
+        self.assertTrue(np.all(projected[1:3] > 0))
+        with self.assertRaises(ValueError):
+            back_project(logits, index, centers, points[:5], k=3)
+
+    def test_point_index_file(self):
+        index = point_voxel_index(self.points, self.grid, self.origin, self.voxel_size, stride=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_file = point_index_file(os.path.join(tmp_dir, "scan_preprocessed.scene"))
+            self.assertTrue(index_file.endswith("scan_preprocessed.points.npy"))
+            write_point_index(index_file, index)
+            np.testing.assert_array_equal(read_point_index(index_file), index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from batch_sampler import PointBudgetBatchSampler, fixed_batches, shard_scenes
+
+class TestPointBudgetBatchSampler(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.counts = np.maximum(rng.lognormal(np.log(10000), 1.0, 300).astype(np.int64), 100)
+        self.counts[7] = 500000  # larger than the budget
+        self.budget = 100000
+
+    def test_every_scene_once_within_budget(self):
+        sampler = PointBudgetBatchSampler(self.counts, self.budget, seed=1)
+        batches = list(sampler)
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(len(self.counts))))
+        for batch in batches:
+            if len(batch) > 1:
+                self.assertLessEqual(self.counts[batch].sum(), self.budget)
+        self.assertIn([7], batches)
+        self.assertEqual(sampler.stats(0)['over_budget'], (self.counts > self.budget).sum())
+
+    def test_reproducible(self):
+        first = PointBudgetBatchSampler(self.counts, self.budget, seed=1)
+        second = PointBudgetBatchSampler(self.counts, self.budget, seed=1)
+        self.assertEqual(list(first), list(second))
+        # the next epoch is shuffled differently, but the same for equal seeds
+        epoch1 = list(first)
+        self.assertEqual(epoch1, list(second))
+        self.assertNotEqual(epoch1, first.batches(0))
+        second.set_epoch(0)
+        self.assertEqual(list(second), first.batches(0))
+        self.assertNotEqual(list(PointBudgetBatchSampler(self.counts, self.budget, seed=2)), first.batches(0))
+
+    def test_len(self):
+        sampler = PointBudgetBatchSampler(self.counts, self.budget, seed=1)
+        self.assertEqual(len(sampler), len(list(sampler)))
+
+    def test_len_during_an_epoch(self):
+        sampler = PointBudgetBatchSampler(self.counts, self.budget // 4, seed=1)
+        counts = {epoch: len(sampler.batches(epoch)) for epoch in range(10)}
+        for epoch in range(3):
+            batches = iter(sampler)
+            next(batches)
+            # e.g. a progress bar asking mid-epoch: the current epoch, not the next one
+            self.assertEqual((sampler.epoch, len(sampler)), (epoch, counts[epoch]))
+            self.assertEqual(1 + len(list(batches)), counts[epoch])
+
+    def test_less_variance_than_fixed_batches(self):
+        sampler = PointBudgetBatchSampler(self.counts, self.budget, seed=1)
+        budget_points = np.array([self.counts[batch].sum() for batch in sampler.batches()])
+        fixed_points = np.array([self.counts[batch].sum() for batch in fixed_batches(len(self.counts), 8, seed=1)])
+        self.assertLess(budget_points.std() / budget_points.mean(), fixed_points.std() / fixed_points.mean())
+        self.assertGreater(sampler.stats()['budget_fill'], 0.5)
+
+    def test_no_shuffle(self):
+        sampler = PointBudgetBatchSampler([5, 1, 3, 2], 6, shuffle=False)
+        self.assertEqual(list(sampler), [[1, 3, 2], [0]])
+
+class TestShardScenes(unittest.TestCase):
+    def test_balanced_partition(self):
+        counts = np.random.default_rng(0).lognormal(10, 1, 200).astype(np.int64)
+        shards = shard_scenes(counts, 4)
+        self.assertEqual(sorted(i for shard in shards for i in shard), list(range(200)))
+        loads = [counts[shard].sum() for shard in shards]
+        self.assertLessEqual(max(loads) - min(loads), counts.max())
+        self.assertEqual(shards, [sorted(shard) for shard in shards])
+
+    def test_more_shards_than_scenes(self):
+        self.assertEqual(shard_scenes([5, 1], 4), [[0], [1]])
+
+if __name__ == '__main__':
+    unittest.main()
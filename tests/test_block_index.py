@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from block_index import build_block_index, class_weights, block_weights, sample_crop, unpack_blocks
+
+BLOCK = 16
+CROP = 40
+
+class TestBlockIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.coords = rng.integers(0, 200, (20000, 3)).astype(np.int32)
+        self.labels = np.where(self.coords[:, 0] < 20, 2, rng.integers(0, 2, len(self.coords))).astype(np.int32)
+        self.order, self.index = build_block_index(self.coords, self.labels, BLOCK, num_classes=3)
+        self.sorted_coords = self.coords[self.order]
+        self.sorted_labels = self.labels[self.order]
+
+    def test_index(self):
+        offsets = self.index['block_offsets']
+        self.assertEqual(offsets[-1], len(self.coords))
+        self.assertTrue(np.all(np.diff(self.index['block_keys']) > 0))
+        for b in range(0, len(self.index['block_keys']), 7):
+            rows = slice(offsets[b], offsets[b + 1])
+            bx, by = unpack_blocks(self.index['block_keys'][b])
+            self.assertTrue(np.all(self.sorted_coords[rows, 0] // BLOCK == bx))
+            self.assertTrue(np.all(self.sorted_coords[rows, 1] // BLOCK == by))
+            np.testing.assert_array_equal(self.index['block_class_counts'][b],
+                                          np.bincount(self.sorted_labels[rows], minlength=3))
+
+    def test_crop_matches_window(self):
+        for seed in range(20):
+            rows = sample_crop(self.index, self.sorted_coords, BLOCK, CROP, np.random.default_rng(seed))
+            self.assertGreater(len(rows), 0)
+            xy = self.sorted_coords[:, :2]
+            low = xy[rows].min(axis=0)
+            high = xy[rows].max(axis=0)
+            self.assertTrue(np.all(high - low < CROP))
+            # every point of the scene inside the bounding window of the crop is in the crop
+            inside = np.all((xy >= low) & (xy <= high), axis=1)
+            self.assertTrue(set(np.flatnonzero(inside)) <= set(rows.tolist()))
+
+    def test_unsorted_scene(self):
+        rng_sorted, rng_unsorted = np.random.default_rng(3), np.random.default_rng(3)
+        rows = sample_crop(self.index, self.sorted_coords, BLOCK, CROP, rng_sorted)
+        unsorted_rows = sample_crop(self.index, self.coords, BLOCK, CROP, rng_unsorted, order=self.order)
+        np.testing.assert_array_equal(np.sort(self.order[rows]), np.sort(unsorted_rows))
+
+    def test_max_points(self):
+        rows = sample_crop(self.index, self.sorted_coords, BLOCK, CROP, np.random.default_rng(1), max_points=100)
+        self.assertEqual(len(rows), 100)
+        self.assertEqual(len(np.unique(rows)), 100)
+
+    def test_rare_class_bias(self):
+        totals = self.index['block_class_counts'].sum(axis=0)
+        weights = class_weights(totals, 1.0)
+        self.assertGreater(weights[2], weights[0])
+        np.testing.assert_array_equal(class_weights([5, 0, 5], 1.0)[1], 0.0)
+
+        def rare_share(cumulative):
+            rng = np.random.default_rng(0)
+            shares = [np.mean(self.sorted_labels[sample_crop(self.index, self.sorted_coords, BLOCK, CROP, rng,
+                                                             cumulative)] == 2) for _ in range(200)]
+            return np.mean(shares)
+        uniform = rare_share(np.cumsum(block_weights(self.index)))
+        biased = rare_share(np.cumsum(block_weights(self.index, weights)))
+        self.assertGreater(biased, uniform)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from catalog import Catalog, match_pairs, summarize
+from synthetic_scene import write_pair
+from asc_reader import read_asc
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pcd_dir = os.path.join(self.tmp_dir.name, "pcd")
+        self.asc_dir = os.path.join(self.tmp_dir.name, "asc")
+        for i, num_points in enumerate([500, 800]):
+            write_pair(os.path.join(self.pcd_dir, f"scan{i}.pcd"), os.path.join(self.asc_dir, f"scan{i}.asc"), num_points, seed=i)
+        self.catalog = Catalog(os.path.join(self.tmp_dir.name, "catalog.sqlite"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp_dir.cleanup()
+
+    def test_match_pairs(self):
+        pairs, unmatched = match_pairs(["b/x.pcd", "b/y.pcd", "b/z.pcd"], ["a/z.asc", "a/x.asc"])
+        self.assertEqual(pairs, [("b/x.pcd", "a/x.asc"), ("b/z.pcd", "a/z.asc")])
+        self.assertEqual(unmatched, ["b/y.pcd"])
+
+    def test_entries(self):
+        entries, changes = self.catalog.refresh(self.pcd_dir, self.asc_dir, asc_cache=False)
+        self.assertEqual([entry['name'] for entry in entries], ["scan0", "scan1"])
+        self.assertEqual(changes['updated'], 2)
+        self.assertEqual([entry['points'] for entry in entries], [500, 800])
+        labels = read_asc(entries[1]['asc_file'], columns=["label"], cache=False)["label"]
+        self.assertEqual(entries[1]['label_histogram'], np.bincount(labels).tolist())
+        xyz = read_asc(entries[1]['asc_file'], columns=["x", "y", "z"], cache=False)
+        np.testing.assert_allclose(entries[1]['bbox'][:3], [xyz[axis].min() for axis in "xyz"], atol=1e-4)
+        np.testing.assert_allclose(entries[1]['bbox'][3:], [xyz[axis].max() for axis in "xyz"], atol=1e-4)
+        self.assertEqual(summarize(entries)['points'], 1300)
+
+    def test_incremental(self):
+        self.catalog.refresh(self.pcd_dir, self.asc_dir, asc_cache=False)
+        entries, changes = self.catalog.refresh(self.pcd_dir, self.asc_dir, asc_cache=False)
+        self.assertEqual(changes['updated'], 0)
+
+        # a changed file, a new pair, a removed pair and a PCD file without ASC file
+        write_pair(os.path.join(self.pcd_dir, "scan0.pcd"), os.path.join(self.asc_dir, "scan0.asc"), 600, seed=5)
+        write_pair(os.path.join(self.pcd_dir, "scan2.pcd"), os.path.join(self.asc_dir, "scan2.asc"), 300, seed=2)
+        os.remove(os.path.join(self.pcd_dir, "scan1.pcd"))
+        os.remove(os.path.join(self.asc_dir, "scan2.asc"))
+        os.rename(os.path.join(self.pcd_dir, "scan2.pcd"), os.path.join(self.pcd_dir, "lonely.pcd"))
+        write_pair(os.path.join(self.pcd_dir, "scan3.pcd"), os.path.join(self.asc_dir, "scan3.asc"), 300, seed=3)
+
+        entries, changes = self.catalog.refresh(self.pcd_dir, self.asc_dir, asc_cache=False)
+        self.assertEqual([(entry['name'], entry['points']) for entry in entries], [("scan0", 600), ("scan3", 300)])
+        self.assertEqual(changes['updated'], 2)
+        self.assertEqual(changes['removed'], 1)
+        self.assertEqual([os.path.basename(f) for f in changes['unmatched']], ["lonely.pcd"])
+
+    def test_persistent(self):
+        self.catalog.refresh(self.pcd_dir, self.asc_dir, with_stats=False)
+        self.catalog.close()
+        self.catalog = Catalog(os.path.join(self.tmp_dir.name, "catalog.sqlite"))
+        entries = self.catalog.entries(self.pcd_dir)
+        self.assertEqual(len(entries), 2)
+        self.assertIsNone(entries[0]['label_histogram'])
+        # statistics are filled in once they are asked for
+        entries, changes = self.catalog.refresh(self.pcd_dir, self.asc_dir, asc_cache=False)
+        self.assertEqual(changes['updated'], 2)
+        self.assertIsNotNone(entries[0]['label_histogram'])
+
+if __name__ == '__main__':
+    unittest.main()
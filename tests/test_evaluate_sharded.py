@@ -0,0 +1,77 @@
+# Sharded evaluation with a stub model in place of the checkpoint: the logits of a voxel depend on its own features
+# only, so the reduced confusion matrix of the workers must equal the one of evaluate in this process.
+import unittest
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+import MinkowskiEngine as ME
+import test
+from config import Config
+from feature_codec import encode_features, encode_labels
+from test import evaluate, evaluate_sharded, scaling_report
+
+class PerVoxelModel(torch.nn.Module):
+    def __init__(self, num_classes):
+        super().__init__()
+        torch.manual_seed(0)
+        self.linear = torch.nn.Linear(6, num_classes)
+
+    def forward(self, stensor):
+        return SimpleNamespace(F=self.linear(stensor.F))
+
+def stub_model(device):
+    """ The same weights in every worker """
+    return PerVoxelModel(test.cfg.num_classes).to(device).eval()
+
+class SceneList(Dataset):
+    """ Compact (coords, features, labels) scenes, picklable for the spawned workers """
+    def __init__(self, sizes, num_classes, seed=0):
+        rng = np.random.default_rng(seed)
+        self.scenes = []
+        for size in sizes:
+            # unique voxels, nothing is merged by the sparse tensor
+            cells = rng.choice(64 ** 3, size, replace=False)
+            coords = np.stack(np.unravel_index(cells, (64, 64, 64)), axis=1).astype(np.int32)
+            normals = rng.normal(size=(size, 3))
+            normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+            features = encode_features(np.c_[rng.random((size, 3)), normals])
+            self.scenes.append((coords, features, encode_labels(rng.integers(0, num_classes, size))))
+
+    def __len__(self):
+        return len(self.scenes)
+
+    def __getitem__(self, i):
+        return self.scenes[i]
+
+    def num_scenes(self):
+        return len(self.scenes)
+
+    def point_counts(self):
+        return np.array([len(coords) for coords, _, _ in self.scenes], dtype=np.int64)
+
+class TestEvaluateSharded(unittest.TestCase):
+    def setUp(self):
+        self.dataset = SceneList([300, 1200, 50, 800, 640, 75, 2000], test.cfg.num_classes)
+        dataloader = DataLoader(self.dataset, batch_size=1, collate_fn=ME.utils.batch_sparse_collate, shuffle=False)
+        self.expected = evaluate(stub_model(torch.device("cpu")), dataloader, torch.device("cpu"))[0].matrix
+
+    def test_sharded_equals_in_process(self):
+        for num_workers in (1, 3):
+            confusion, shard_seconds = evaluate_sharded(self.dataset, num_workers, 1, stub_model)
+            self.assertEqual(len(shard_seconds), num_workers)
+            np.testing.assert_array_equal(confusion.matrix, self.expected)
+
+    def test_scaling_report_compares_with_in_process(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_file = os.path.join(tmp_dir, "scaling.json")
+            with mock.patch.object(test, "cfg", Config(dict(test.config_data, eval_scaling_report_file=report_file))):
+                runs = scaling_report(self.dataset, [2], 1, stub_model)
+        self.assertEqual([run['workers'] for run in runs], [1, 2])
+        self.assertTrue(all(run['identical'] and run['identical_in_process'] for run in runs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from feature_codec import encode_features, encode_labels
+
+
+def decode_numpy(encoded):
+    """ numpy version of decode_features for the uint8 encoding """
+    out = encoded.astype(np.float32)
+    out[:, :3] /= 255.0
+    normals = out[:, 3:]
+    normals -= 256.0 * (normals > 127)
+    normals /= 127.0
+    return out
+
+
+class TestFeatureCodec(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        normals = rng.normal(size=(1000, 3))
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        self.features = np.concatenate([rng.random((1000, 3)), normals], axis=1)
+
+    def test_uint8_roundtrip(self):
+        encoded = encode_features(self.features, "uint8")
+        self.assertEqual(encoded.dtype, np.uint8)
+        self.assertEqual(encoded.shape, (1000, 6))
+        decoded = decode_numpy(encoded)
+        self.assertLessEqual(np.abs(decoded[:, :3] - self.features[:, :3]).max(), 0.5 / 255 + 1e-6)
+        self.assertLessEqual(np.abs(decoded[:, 3:] - self.features[:, 3:]).max(), 0.5 / 127 + 1e-6)
+
+    def test_uint8_extremes(self):
+        features = np.array([[0.0, 1.0, 0.5, -1.0, 1.0, 0.0]])
+        decoded = decode_numpy(encode_features(features, "uint8"))
+        np.testing.assert_allclose(decoded[0, [0, 1, 3, 4, 5]], [0.0, 1.0, -1.0, 1.0, 0.0])
+
+    def test_float_encodings(self):
+        self.assertEqual(encode_features(self.features, "float16").dtype, np.float16)
+        np.testing.assert_array_equal(encode_features(self.features, "float32"), self.features.astype(np.float32))
+        with self.assertRaises(ValueError):
+            encode_features(self.features, "int4")
+
+    def test_labels(self):
+        labels = encode_labels(np.array([0, 3, 24, 255]))
+        self.assertEqual(labels.dtype, np.uint8)
+        np.testing.assert_array_equal(labels, [0, 3, 24, 255])
+        with self.assertRaises(ValueError):
+            encode_labels(np.array([1, 256]))
+        with self.assertRaises(ValueError):
+            encode_labels(np.array([-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Sliding-window inference with a stub model in place of MyModel: the logits of a voxel depend on its own
+# features only, so every merge must give back the logits of the whole scene computed at once.
+import unittest
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from feature_codec import decode_features, encode_features
+from synthetic_scene import write_pair
+from windows import plan_windows
+from inference import InferenceEngine, preprocess_scan, window_batch
+
+class PerVoxelModel(torch.nn.Module):
+    def __init__(self, num_classes):
+        super().__init__()
+        torch.manual_seed(0)
+        self.linear = torch.nn.Linear(6, num_classes)
+
+    def forward(self, feats):
+        return self.linear(feats)
+
+class StubEngine(InferenceEngine):
+    """ The stub model runs on the decoded features, no sparse tensor """
+    def forward(self, coords, feats):
+        self.batches.append(len(coords))
+        return self.model(decode_features(feats)).numpy()
+
+class TestInference(unittest.TestCase):
+    num_classes = 5
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        coords = np.c_[rng.integers(0, 700, (20000, 2)), rng.integers(0, 40, 20000)].astype(np.int32)
+        normals = rng.normal(size=(len(coords), 3))
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        features = encode_features(np.c_[rng.random((len(coords), 3)), normals])
+        self.scene = {'coords': coords, 'features': features}
+        self.model = PerVoxelModel(self.num_classes).eval()
+        with torch.no_grad():
+            self.expected = self.model(decode_features(torch.from_numpy(features))).numpy()
+
+    def engine(self, merge, windows_per_batch=3):
+        engine = StubEngine(self.model, torch.device("cpu"), 256, 64, merge, windows_per_batch, align=32)
+        engine.batches = []
+        return engine
+
+    def test_window_batch(self):
+        windows = plan_windows(self.scene['coords'], 256, 64, align=32)[:3]
+        batch_windows, coords, feats = window_batch(self.scene, windows)
+        self.assertEqual(batch_windows, windows)
+        rows = np.concatenate([window['rows'] for window in windows])
+        np.testing.assert_array_equal(feats.numpy(), self.scene['features'][rows])
+        # batch index first, coordinates relative to the window origin
+        np.testing.assert_array_equal(coords[:, 0].numpy(), np.repeat(np.arange(3), [len(w['rows']) for w in windows]))
+        shifted = np.concatenate([self.scene['coords'][w['rows']] - np.r_[w['low'], 0] for w in windows])
+        np.testing.assert_array_equal(coords[:, 1:].numpy(), shifted)
+
+    def test_predict_merges_every_window(self):
+        for merge in ("average", "center"):
+            engine = self.engine(merge)
+            logits, num_windows = engine.predict(self.scene, self.num_classes)
+            self.assertEqual(num_windows, len(plan_windows(self.scene['coords'], 256, 64, align=32)))
+            self.assertEqual(len(engine.batches), -(-num_windows // 3))
+            np.testing.assert_allclose(logits, self.expected, rtol=1e-5, atol=1e-5)
+
+    def test_predict_with_batch_pool(self):
+        engine = self.engine("average", windows_per_batch=2)
+        with ThreadPoolExecutor(max_workers=1) as batch_pool:
+            logits, _ = engine.predict(self.scene, self.num_classes, batch_pool)
+        np.testing.assert_array_equal(logits, self.engine("average", 2).predict(self.scene, self.num_classes)[0])
+
+    def test_preprocess_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pcd_file = os.path.join(tmp_dir, "scan.pcd")
+            write_pair(pcd_file, os.path.join(tmp_dir, "scan.asc"), 5000, seed=1)
+            scene = preprocess_scan(pcd_file)
+        self.assertEqual((scene['file'], scene['raw_points']), (pcd_file, 5000))
+        self.assertEqual(len(scene['point_index']), 5000)
+        self.assertEqual(len(scene['features']), len(scene['coords']))
+        self.assertGreaterEqual(scene['preprocess_seconds'], 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
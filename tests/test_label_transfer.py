@@ -0,0 +1,29 @@
+import unittest
+from statistics import mode
+import numpy as np
+from label_transfer import majority_vote, transfer_labels
+
+class TestLabelTransfer(unittest.TestCase):
+    def test_majority_vote_matches_statistics_mode(self):
+        rng = np.random.default_rng(0)
+        neighbor_labels = rng.integers(0, 4, size=(2000, 5))
+        expected = np.array([mode(row.tolist()) for row in neighbor_labels])
+        np.testing.assert_array_equal(majority_vote(neighbor_labels), expected)
+
+    def test_majority_vote_tie_goes_to_nearest(self):
+        neighbor_labels = np.array([[3, 7, 7, 3, 1], [2, 2, 5, 5, 9]])
+        np.testing.assert_array_equal(majority_vote(neighbor_labels), [3, 2])
+
+    def test_transfer_labels(self):
+        source_points = np.array([[0, 0, 0], [0, 0, 0.1], [0, 0.1, 0], [5, 5, 5], [5, 5, 5.1]], dtype=float)
+        source_labels = np.array([1, 1, 2, 4, 4])
+        query_points = np.array([[0, 0, 0.01], [5, 5, 5.05]])
+        labels = transfer_labels(source_points, source_labels, query_points, k=3, chunk_size=1)
+        np.testing.assert_array_equal(labels, [1, 4])
+
+    def test_transfer_labels_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            transfer_labels(np.zeros((3, 3)), np.zeros(2), np.zeros((1, 3)))
+
+if __name__ == '__main__':
+    unittest.main()
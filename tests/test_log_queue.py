@@ -0,0 +1,108 @@
+import unittest
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import log_queue
+from log_queue import configure_logging, get_logger, lazy, worker_init
+
+
+def log_from_worker(args):
+    log_file, i = args
+    get_logger(log_file, "test_log_queue.worker").info("record %d from %d", i, os.getpid())
+    return os.getpid()
+
+
+def log_from_spawned_worker(args):
+    pid = log_from_worker(args)
+    # attached to the queue of the parent, no listener of its own
+    return pid, log_queue._state['listener'] is None, log_queue._state['owner']
+
+
+def wait_for_lines(path, count, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.read().splitlines()
+            if len(lines) >= count:
+                return lines
+        time.sleep(0.05)
+    raise AssertionError(f"{path} did not get {count} lines")
+
+
+class TestLogQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp_dir.name, "logs", "log-test.txt")
+
+    def tearDown(self):
+        configure_logging("DEBUG", json_lines=False)
+        self.tmp_dir.cleanup()
+
+    def test_repeated_calls_add_one_handler(self):
+        for _ in range(3):
+            logger = get_logger(self.log_file, "test_log_queue.dedupe")
+        self.assertEqual(len(logger.handlers), 1)
+        logger.info("once")
+        self.assertEqual(wait_for_lines(self.log_file, 1)[-1].split()[-1], "once")
+
+    def test_workers_only_enqueue(self):
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            pids = set(pool.map(log_from_worker, [(self.log_file, i) for i in range(30)]))
+        lines = wait_for_lines(self.log_file, 30)
+        self.assertEqual(sorted(int(line.split()[-3]) for line in lines), list(range(30)))
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_spawned_workers_attach_to_the_parent_queue(self):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context, initializer=worker_init()) as pool:
+            results = list(pool.map(log_from_spawned_worker, [(self.log_file, i) for i in range(20)]))
+        lines = wait_for_lines(self.log_file, 20)
+        self.assertEqual(sorted(int(line.split()[-3]) for line in lines), list(range(20)))
+        self.assertTrue(all(no_listener and owner is None for _, no_listener, owner in results))
+        self.assertNotIn(os.getpid(), {pid for pid, _, _ in results})
+
+    def test_level_gates_lazy_arguments(self):
+        configure_logging("INFO")
+        logger = get_logger(self.log_file, "test_log_queue.lazy")
+        calls = []
+        logger.debug("skipped %f", lazy(lambda: calls.append(1) or 1.0))
+        logger.info("value %.1f", lazy(lambda: calls.append(1) or 2.0))
+        self.assertEqual(calls, [1])
+        self.assertTrue(wait_for_lines(self.log_file, 1)[-1].endswith("value 2.0"))
+
+    def test_json_lines(self):
+        configure_logging("DEBUG", json_lines=True)
+        get_logger(self.log_file, "test_log_queue.json").warning("structured %s", "record")
+        entry = json.loads(wait_for_lines(os.path.splitext(self.log_file)[0] + ".jsonl", 1)[-1])
+        self.assertEqual((entry['level'], entry['message'], entry['name']), ("WARNING", "structured record", "test_log_queue.json"))
+
+    def test_json_lines_exception(self):
+        logger = get_logger(self.log_file, "test_log_queue.exception", json_lines=True)
+        try:
+            raise ValueError("broken scan")
+        except ValueError:
+            logger.exception("failed %d", 3)
+        entry = json.loads(wait_for_lines(os.path.splitext(self.log_file)[0] + ".jsonl", 1)[-1])
+        self.assertEqual(entry['message'], "failed 3")
+        self.assertIn("ValueError: broken scan", entry['exception'])
+        self.assertIn("ValueError: broken scan", "\n".join(wait_for_lines(self.log_file, 3)))
+
+    def test_format_of_an_existing_file_changes(self):
+        jsonl_file = os.path.splitext(self.log_file)[0] + ".jsonl"
+        logger = get_logger(self.log_file, "test_log_queue.switch")
+        logger.info("text only")
+        wait_for_lines(self.log_file, 1)
+        self.assertFalse(os.path.exists(jsonl_file))
+        # the file has its handler already, the JSON twin is still opened
+        get_logger(self.log_file, "test_log_queue.switch", json_lines=True).info("both")
+        self.assertEqual(json.loads(wait_for_lines(jsonl_file, 1)[-1])['message'], "both")
+        self.assertEqual(len(logger.handlers), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score
+from metrics import ConfusionMatrix
+
+class TestConfusionMatrix(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.labels = rng.integers(0, 6, 50000)
+        self.preds = np.where(rng.random(50000) < 0.7, self.labels, rng.integers(0, 6, 50000))
+
+    def test_matches_sklearn(self):
+        confusion = ConfusionMatrix(6)
+        for start in range(0, len(self.labels), 7000):
+            confusion.update(self.preds[start:start + 7000], self.labels[start:start + 7000])
+        np.testing.assert_array_equal(confusion.matrix, confusion_matrix(self.labels, self.preds))
+        metrics = confusion.metrics()
+        self.assertAlmostEqual(metrics['accuracy'], accuracy_score(self.labels, self.preds))
+        self.assertAlmostEqual(metrics['precision'], precision_score(self.labels, self.preds, average='weighted'))
+        self.assertAlmostEqual(metrics['recall'], recall_score(self.labels, self.preds, average='weighted'))
+        self.assertAlmostEqual(metrics['f1_score'], f1_score(self.labels, self.preds, average='weighted'))
+        np.testing.assert_allclose(metrics['per_class_f1'], f1_score(self.labels, self.preds, average=None))
+
+    def test_merge(self):
+        first, second, whole = ConfusionMatrix(6), ConfusionMatrix(6), ConfusionMatrix(6)
+        first.update(self.preds[:20000], self.labels[:20000])
+        second.update(self.preds[20000:], self.labels[20000:])
+        whole.update(self.preds, self.labels)
+        first += second
+        np.testing.assert_array_equal(first.matrix, whole.matrix)
+        np.testing.assert_array_equal(ConfusionMatrix.from_matrix(whole.matrix).matrix, whole.matrix)
+        with self.assertRaises(ValueError):
+            first.merge(ConfusionMatrix(5))
+
+    def test_absent_classes(self):
+        confusion = ConfusionMatrix(5)
+        # class 3 is absent but predicted once, class 4 is absent and never predicted, class 2 is never predicted
+        confusion.update(np.array([0, 0, 1, 3, 0]), np.array([0, 0, 1, 1, 2]))
+        metrics = confusion.metrics()
+        self.assertTrue(np.isnan(metrics['per_class_accuracy'][3]) and np.isnan(metrics['per_class_accuracy'][4]))
+        self.assertEqual(metrics['iou'][3], 0.0)
+        self.assertTrue(np.isnan(metrics['iou'][4]))
+        self.assertEqual(metrics['per_class_precision'][2], 0.0)
+        self.assertAlmostEqual(metrics['mean_iou'], np.mean([2 / 3, 1 / 2, 0.0, 0.0]))
+        self.assertAlmostEqual(metrics['overall_accuracy'], np.mean([1.0, 0.5, 0.0]))
+        self.assertAlmostEqual(metrics['accuracy'], 3 / 5)
+        np.testing.assert_array_equal(metrics['support'], [2, 2, 1, 0, 0])
+        self.assertTrue(np.isnan(ConfusionMatrix(3).metrics()['accuracy']))
+
+    def test_ignore_index_and_range(self):
+        confusion = ConfusionMatrix(3, ignore_index=0)
+        confusion.update(np.array([1, 2, 2]), np.array([0, 2, 1]))
+        self.assertEqual(confusion.matrix.sum(), 2)
+        with self.assertRaises(ValueError):
+            confusion.update(np.array([3]), np.array([1]))
+        with self.assertRaises(ValueError):
+            confusion.update(np.array([1, 1]), np.array([1]))
+
+if __name__ == '__main__':
+    unittest.main()
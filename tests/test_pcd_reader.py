@@ -0,0 +1,91 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import open3d as o3d
+import pcd_reader
+from pcd_reader import read_pcd, read_pcd_header, unpack_rgb, lzf_chunks
+
+class TestPcdReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 20000
+        # repeated values so that binary_compressed files contain back references
+        self.points = np.round(rng.random((n, 3)), 2)
+        self.colors = rng.integers(0, 4, (n, 3)) * 85
+        self.pcd = o3d.geometry.PointCloud()
+        self.pcd.points = o3d.utility.Vector3dVector(self.points)
+        self.pcd.colors = o3d.utility.Vector3dVector(self.colors / 255.0)
+        self.pcd.normals = o3d.utility.Vector3dVector(rng.random((n, 3)))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, **kwargs):
+        pcd_file = os.path.join(self.tmp_dir.name, name)
+        o3d.io.write_point_cloud(pcd_file, self.pcd, **kwargs)
+        return pcd_file
+
+    def check(self, records, step=1):
+        xyz = np.column_stack([records["x"], records["y"], records["z"]])
+        np.testing.assert_allclose(xyz, self.points[::step], atol=1e-6)
+        np.testing.assert_array_equal(unpack_rgb(records["rgb"]), self.colors[::step])
+
+    def test_binary_is_memory_mapped(self):
+        pcd_file = self.write("binary.pcd")
+        self.assertEqual(read_pcd_header(pcd_file)["data"], "binary")
+        records = read_pcd(pcd_file)
+        self.assertIsInstance(records, np.memmap)
+        self.check(records)
+
+    def test_compressed_and_ascii(self):
+        for pcd_file in (self.write("compressed.pcd", compressed=True), self.write("ascii.pcd", write_ascii=True)):
+            self.check(read_pcd(pcd_file))
+
+    def test_field_subset_and_step(self):
+        for pcd_file in (self.write("binary.pcd"), self.write("compressed.pcd", compressed=True)):
+            records = read_pcd(pcd_file, fields=["x", "y", "z", "rgb"], step=7, chunk_bytes=1000)
+            self.assertEqual(records.dtype.names, ("x", "y", "z", "rgb"))
+            self.check(records, step=7)
+        with self.assertRaises(ValueError):
+            read_pcd(pcd_file, fields=["intensity"])
+
+    def test_streaming_decoder_without_python_lzf(self):
+        pcd_file = self.write("compressed.pcd", compressed=True)
+        c_extension, pcd_reader.lzf = pcd_reader.lzf, None
+        try:
+            self.check(read_pcd(pcd_file, fields=["x", "y", "z", "rgb"], step=3, chunk_bytes=1000), step=3)
+        finally:
+            pcd_reader.lzf = c_extension
+
+    def test_lzf_chunks_keep_back_references(self):
+        pcd_file = self.write("compressed.pcd", compressed=True)
+        with open(pcd_file, "rb") as f:
+            f.seek(read_pcd_header(pcd_file)["data_offset"])
+            compressed_size = int(np.frombuffer(f.read(8), dtype="<u4")[0])
+            data = f.read(compressed_size)
+        decompressed = b"".join(lzf_chunks(data))
+        self.assertEqual(b"".join(lzf_chunks(data, chunk_bytes=100)), decompressed)
+        if pcd_reader.lzf is not None:
+            self.assertEqual(pcd_reader.lzf.decompress(data, len(decompressed)), decompressed)
+
+    def test_float_rgb_padding_and_count(self):
+        pcd_file = os.path.join(self.tmp_dir.name, "pcl.pcd")
+        dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("rgb", "<f4"), ("_", "<u1", (4,)), ("hist", "<f4", (2,))])
+        records = np.zeros(3, dtype=dtype)
+        records["x"] = [1, 2, 3]
+        records["rgb"] = np.array([0xFF0000, 0x00FF00, 0x0102FE], dtype=np.uint32).view(np.float32)
+        records["hist"] = [[1, 2], [3, 4], [5, 6]]
+        with open(pcd_file, "wb") as f:
+            f.write(b"# .PCD v0.7\nVERSION 0.7\nFIELDS x y z rgb _ hist\nSIZE 4 4 4 4 1 4\nTYPE F F F F U F\n"
+                    b"COUNT 1 1 1 1 4 2\nWIDTH 3\nHEIGHT 1\nVIEWPOINT 0 0 0 1 0 0 0\nPOINTS 3\nDATA binary\n")
+            f.write(records.tobytes())
+        loaded = read_pcd(pcd_file, fields=["x", "rgb", "hist"])
+        np.testing.assert_array_equal(loaded["x"], [1, 2, 3])
+        np.testing.assert_array_equal(unpack_rgb(loaded["rgb"]), [[255, 0, 0], [0, 255, 0], [1, 2, 254]])
+        np.testing.assert_array_equal(loaded["hist"][2], [5, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
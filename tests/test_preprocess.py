@@ -1,23 +1,38 @@
 import unittest
 import os
+import tempfile
+from unittest import mock
 import numpy as np
-import pickle
-from preprocess_minkowski import Preprocessor
+import preprocessing
+from preprocessing import Preprocessor
+from config import Config
+from scene_format import read_scene
+from synthetic_scene import ensure_pair, write_pair
+from pcd_reader import read_pcd_header
+from asc_reader import read_asc
+from preprocess_cache import key_file
+from quantize import dequantize
 
 class TestPreprocessor(unittest.TestCase):
     def setUp(self):
         self.voxel_size = 0.1
         self.preprocessor = Preprocessor(self.voxel_size)
-        self.base_file_name = None
 
-        self.test_pcd_file = 'data/raw/train/pcd/14NH_A_1st_floor_offices-color_SR_AN_20230309_REV_20230411.pcd'
-        self.test_asc_file = 'data/raw/train/asc/14NH_A_1st_floor_offices-color_SR_AN_20230309_REV_20230411.asc'
+        # a synthetic PCD + ASC pair instead of a real scan, written to and preprocessed into a temp dir
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.test_pcd_file, self.test_asc_file = ensure_pair(os.path.join(self.tmp_dir.name, "raw"), 20000, seed=0)
+        self.output_dir = os.path.join(self.tmp_dir.name, "preprocessed")
+        os.makedirs(self.output_dir)
+        self.cfg = mock.patch.object(preprocessing, "cfg", Config(dict(preprocessing.config_data,
+                                                                       preprocessed_data_dir=self.output_dir)))
+        self.cfg.start()
 
-        self.output_file = os.path.join('data/preprocessed', "14NH_A_1st_floor_offices-color_SR_AN_20230309_REV_20230411_preprocessed.pkl")
+        self.output_file = preprocessing.processed_file_path("synthetic_20000_0")
 
     def tearDown(self):
-        if os.path.exists(self.output_file):
-            os.remove(self.output_file)
+        self.cfg.stop()
+        self.tmp_dir.cleanup()
+
     # tests everything
     def test_preprocessing(self):
         self.preprocessor.process_files(self.test_pcd_file, self.test_asc_file)
@@ -26,8 +41,7 @@ class TestPreprocessor(unittest.TestCase):
         self.assertTrue(os.path.exists(self.output_file))
 
         # Load the preprocessed data
-        with open(self.output_file, 'rb') as f:
-            data = pickle.load(f)
+        data = read_scene(self.output_file)
 
         # Check if the necessary keys are in the preprocessed data
         self.assertIn('coords', data)
@@ -57,8 +71,110 @@ class TestPreprocessor(unittest.TestCase):
         self.assertIsNotNone(self.preprocessor.feature_arr)
         self.assertIsNotNone(self.preprocessor.label_arr)
 
-        self.preprocessor.check_and_remove_incomplete_rows()
+        self.preprocessor.validate_rows()
         self.assertTrue(np.all(np.isfinite(self.preprocessor.feature_arr)))
+        self.assertTrue(np.all(self.preprocessor.label_arr != 0))
+
+    def test_pending_pairs(self):
+        pair = (self.test_pcd_file, self.test_asc_file)
+        self.assertTrue(preprocessing.process_pcd(pair, preprocessing.cfg.voxel_size))
+        self.assertEqual(preprocessing.pending_pairs([pair]), [])
+        # forced: the pair is redone and its skip record is gone until it is
+        forced = Config(dict(preprocessing.config_data, preprocessed_data_dir=self.output_dir, preprocess_force=True))
+        with mock.patch.object(preprocessing, "cfg", forced):
+            self.assertEqual(preprocessing.pending_pairs([pair]), [pair])
+        self.assertFalse(os.path.exists(key_file(self.output_file)))
+        self.assertEqual(preprocessing.pending_pairs([pair]), [pair])
+
+    def test_non_finite_pcd_rows(self):
+        pcd_file = os.path.join(self.tmp_dir.name, "nan", "pcd", "scan.pcd")
+        asc_file = os.path.join(self.tmp_dir.name, "nan", "asc", "scan.asc")
+        write_pair(pcd_file, asc_file, 5000, seed=2)
+        # NaN and inf coordinates in the PCD file only, the ASC file keeps a label for every row
+        header = read_pcd_header(pcd_file)
+        records = np.memmap(pcd_file, dtype=header["dtype"], mode="r+", offset=header["data_offset"], shape=(5000,))
+        records["x"][[3, 100]] = np.nan
+        records["z"][4000] = np.inf
+        records.flush()
+        del records
+
+        self.preprocessor.load_pcd(pcd_file)
+        self.preprocessor.load_asc(asc_file)
+        self.assertEqual(len(self.preprocessor.pcd.points), 4997)
+        kept = np.setdiff1d(np.arange(5000), [3, 100, 4000])
+        np.testing.assert_array_equal(self.preprocessor.point_labels(), read_asc(asc_file, cache=False)["label"][kept])
+
+        self.preprocessor.process_files(pcd_file, asc_file)
+        self.assertTrue(os.path.exists(preprocessing.processed_file_path("scan")))
+
+    def test_process_scan(self):
+        pcd_file = os.path.join(self.tmp_dir.name, "scan", "pcd", "scan.pcd")
+        write_pair(pcd_file, os.path.join(self.tmp_dir.name, "scan", "asc", "scan.asc"), 5000, seed=4)
+        header = read_pcd_header(pcd_file)
+        records = np.memmap(pcd_file, dtype=header["dtype"], mode="r+", offset=header["data_offset"], shape=(5000,))
+        records["y"][10] = np.nan
+        records.flush()
+        points = np.c_[records["x"], records["y"], records["z"]].astype(np.float64)
+        del records
+
+        scene = self.preprocessor.process_scan(pcd_file)
+        coords, index = scene['coords'], scene['point_index']
+        self.assertEqual(coords.dtype, np.int32)
+        self.assertEqual(scene['features'].shape, (len(coords), 6))
+        self.assertEqual(len(np.unique(coords, axis=0)), len(coords))
+        # nothing is saved for an unlabeled scan
+        self.assertEqual(os.listdir(os.path.dirname(self.output_file)), [])
+
+        # every row of the file: its voxel, or -1 with its metric coordinates (NaN for the non-finite row) kept
+        self.assertEqual(len(index), 5000)
+        self.assertEqual(index[10], -1)
+        mapped = np.flatnonzero(index >= 0)
+        centers = dequantize(coords[index[mapped]], scene['quantization'])
+        half_diagonal = np.sqrt(3) / 2 * self.voxel_size / scene['quantization']['scale']
+        self.assertLessEqual(np.linalg.norm(centers - points[mapped], axis=1).max(), half_diagonal + 1e-6)
+        self.assertEqual(len(scene['unmapped_points']), np.count_nonzero(index < 0))
+        unmapped = np.flatnonzero(index < 0)
+        self.assertTrue(np.isnan(scene['unmapped_points'][unmapped == 10]).all())
+        np.testing.assert_allclose(scene['unmapped_points'][unmapped != 10], points[unmapped[unmapped != 10]], atol=1e-6)
+
+    def write_plane_asc(self, name, normals=True):
+        """ ASC export of a noisy horizontal plane, stored normals (2, 0, 0): not unit length and not what estimation gives """
+        rng = np.random.default_rng(3)
+        points = np.c_[rng.random((3000, 2)), rng.normal(0.0, 1e-3, 3000)]
+        rows = np.c_[points, rng.integers(0, 256, (3000, 3)), np.arange(3000) % 5 + 1]
+        if normals:
+            rows = np.c_[rows, np.tile([2.0, 0.0, 0.0], (3000, 1))]
+        rows[[7, 1500], 0] = np.nan
+        rows[2999, 2] = np.inf
+        asc_file = os.path.join(self.tmp_dir.name, f"{name}.asc")
+        np.savetxt(asc_file, rows, delimiter=";", fmt="%.6f")
+        return asc_file, rows
+
+    def test_asc_cloud_labels_aligned(self):
+        asc_file, rows = self.write_plane_asc("aligned")
+        preprocessor = Preprocessor(self.voxel_size, "asc")
+        preprocessor.load_asc_cloud(asc_file)
+        finite = np.isfinite(rows[:, :3]).all(axis=1)
+        self.assertEqual(np.count_nonzero(~finite), 3)
+        np.testing.assert_allclose(np.asarray(preprocessor.pcd.points), rows[finite, :3], atol=1e-6)
+        np.testing.assert_array_equal(preprocessor.labels, rows[finite, 6])
+        np.testing.assert_array_equal(preprocessor.source_rows, np.flatnonzero(finite))
+
+    def test_asc_reused_normals_are_normalized(self):
+        asc_file, _ = self.write_plane_asc("reused")
+        preprocessor = Preprocessor(self.voxel_size, "asc", reuse_normals=True)
+        preprocessor.process_files(asc_file, asc_file)
+        normals = preprocessor.feature_arr[:, 3:]
+        np.testing.assert_allclose(normals, np.tile([1.0, 0.0, 0.0], (len(normals), 1)), atol=1e-6)
+
+    def test_asc_without_normal_columns_estimates_normals(self):
+        asc_file, _ = self.write_plane_asc("estimated", normals=False)
+        preprocessor = Preprocessor(self.voxel_size, "asc", reuse_normals=True)
+        preprocessor.process_files(asc_file, asc_file)
+        normals = preprocessor.feature_arr[:, 3:]
+        np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1.0, atol=1e-5)
+        # estimated from the plane, not the stored (1, 0, 0)
+        self.assertGreater(np.abs(normals[:, 2]).min(), 0.9)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+from preprocess_cache import cache_key, is_up_to_date, mark_done, invalidate
+
+class TestPreprocessCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pcd_file = os.path.join(self.tmp_dir.name, "scan.pcd")
+        self.asc_file = os.path.join(self.tmp_dir.name, "scan.asc")
+        self.output_file = os.path.join(self.tmp_dir.name, "scan_preprocessed.pkl")
+        for path in (self.pcd_file, self.asc_file, self.output_file):
+            with open(path, "w") as f:
+                f.write("data")
+        self.params = {"voxel_size": 0.01, "stride": 1}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_unchanged_inputs_are_up_to_date(self):
+        record = cache_key([self.pcd_file, self.asc_file], self.params)
+        self.assertFalse(is_up_to_date(self.output_file, record))
+        mark_done(self.output_file, record)
+        self.assertTrue(is_up_to_date(self.output_file, cache_key([self.pcd_file, self.asc_file], self.params)))
+
+    def test_parameter_change_invalidates(self):
+        mark_done(self.output_file, cache_key([self.pcd_file, self.asc_file], self.params))
+        changed = cache_key([self.pcd_file, self.asc_file], dict(self.params, voxel_size=0.02))
+        self.assertFalse(is_up_to_date(self.output_file, changed))
+
+    def test_input_change_invalidates(self):
+        for full_hash in (False, True):
+            record = cache_key([self.pcd_file, self.asc_file], self.params, full_hash)
+            mark_done(self.output_file, record)
+            with open(self.asc_file, "a") as f:
+                f.write("more")
+            self.assertFalse(is_up_to_date(self.output_file, cache_key([self.pcd_file, self.asc_file], self.params, full_hash)))
+
+    def test_missing_output_or_invalidated(self):
+        record = cache_key([self.pcd_file, self.asc_file], self.params)
+        mark_done(self.output_file, record)
+        invalidate(self.output_file)
+        self.assertFalse(is_up_to_date(self.output_file, record))
+        mark_done(self.output_file, record)
+        os.remove(self.output_file)
+        self.assertFalse(is_up_to_date(self.output_file, record))
+
+if __name__ == '__main__':
+    unittest.main()
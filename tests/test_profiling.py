@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from profiling import StageProfiler, aggregate_profiles, clear_profiles, peak_rss, reset_peak_rss
+
+
+class TestProfiling(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        profiler = StageProfiler(enabled=False)
+        with profiler.stage("load", lambda: self.fail("point counts must not be evaluated")):
+            pass
+        self.assertEqual(profiler.records, [])
+
+    def test_stage_record(self):
+        profiler = StageProfiler(enabled=True)
+        points = [100]
+        with profiler.stage("downsample", lambda: points[0]):
+            block = np.ones(64 * 2**20, dtype=np.uint8)  # touch 64 MiB
+            points[0] = 10
+        del block
+        record = profiler.records[0]
+        self.assertEqual((record['stage'], record['points_in'], record['points_out']), ("downsample", 100, 10))
+        self.assertGreater(record['wall_seconds'], 0)
+        self.assertGreaterEqual(record['cpu_seconds'], 0)
+        self.assertGreaterEqual(record['peak_rss_delta_bytes'], 32 * 2**20)
+
+    def test_peak_of_outer_window_survives_nested_stages(self):
+        reset_peak_rss()
+        block = np.ones(64 * 2**20, dtype=np.uint8)
+        del block
+        outer = peak_rss()
+        profiler = StageProfiler(enabled=True)
+        with profiler.stage("small"):
+            pass
+        self.assertGreaterEqual(peak_rss(), outer)
+
+    def test_aggregate(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            for i in range(10):
+                profiler = StageProfiler(enabled=True)
+                profiler.records = [{'stage': stage, 'wall_seconds': float(i + 1), 'cpu_seconds': 1.0,
+                                     'peak_rss_delta_bytes': 0, 'points_in': 1, 'points_out': 1} for stage in ("load", "save")]
+                profiler.flush(f"file{i}", profile_dir)
+            summary = aggregate_profiles(profile_dir)
+            self.assertEqual(summary['load']['files'], 10)
+            self.assertEqual(summary['load']['wall_seconds']['max'], 10.0)
+            self.assertAlmostEqual(summary['load']['wall_seconds']['p50'], 5.5)
+            self.assertAlmostEqual(summary['save']['share_of_wall'], 0.5)
+            self.assertTrue(os.path.exists(os.path.join(profile_dir, "stages.csv")))
+            clear_profiles(profile_dir)
+            self.assertEqual(aggregate_profiles(profile_dir), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
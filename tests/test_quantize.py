@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from quantize import quantize, dequantize, voxel_keys, unique_voxels
+
+class TestQuantize(unittest.TestCase):
+    def test_grid_is_integer_zero_based_and_stride_aligned(self):
+        points = np.random.default_rng(0).random((1000, 3)) * 2 - 1
+        for stride in (1, 2, 4):
+            grid, origin = quantize(points, 0.1, points.min(axis=0) - 0.05, stride)
+            self.assertEqual(grid.dtype, np.int32)
+            np.testing.assert_array_equal(grid.min(axis=0), [0, 0, 0])
+            self.assertTrue(np.all(grid % stride == 0))
+
+    def test_dequantize_recovers_metric_positions(self):
+        metric = np.random.default_rng(1).random((500, 3)) * 20
+        scale = 1 / 20
+        normalized = metric * scale
+        voxel_size = 0.001
+        grid, origin = quantize(normalized, voxel_size, normalized.min(axis=0), stride=2)
+        meta = {'origin': origin.tolist(), 'voxel_size': voxel_size, 'stride': 2, 'scale': scale}
+        error = np.abs(dequantize(grid, meta) - metric)
+        self.assertLessEqual(error.max(), voxel_size / scale)
+
+    def test_unique_voxels_keeps_first_occurrence(self):
+        grid = np.array([[0, 0, 1], [2, 0, 0], [0, 0, 1], [2, 0, 0], [5, 5, 5]], dtype=np.int32)
+        np.testing.assert_array_equal(unique_voxels(grid), [0, 1, 4])
+
+    def test_voxel_keys_large_grid_fallback(self):
+        grid = np.array([[0, 0, 0], [1 << 22, 0, 0], [0, 0, 0]], dtype=np.int32)
+        keys = voxel_keys(grid)
+        self.assertEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[0], keys[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+import open3d as o3d
+from raw_report import chunk_stats, main, merge_stats, report_file, run
+
+class TestRawReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 5000
+        self.values = np.column_stack([rng.normal(size=(n, 3)), rng.integers(0, 256, (n, 3)), rng.integers(0, 5, n),
+                                       rng.normal(size=(n, 3))])
+        self.values[::97, 0] = 0.0
+        self.values[::101, 7] = np.nan
+        self.values[::103, 8] = np.inf
+        self.asc_file = os.path.join(self.tmp_dir.name, "scan.asc")
+        np.savetxt(self.asc_file, self.values, delimiter=";", fmt="%.6f")
+        self.values = np.loadtxt(self.asc_file, delimiter=";")  # as rounded in the file
+
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(rng.random((n, 3)))
+        pcd.colors = o3d.utility.Vector3dVector(rng.integers(0, 256, (n, 3)) / 255.0)
+        self.pcd_file = os.path.join(self.tmp_dir.name, "scan.pcd")
+        o3d.io.write_point_cloud(self.pcd_file, pcd)
+        self.points = np.asarray(pcd.points)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_merged_chunks_equal_whole(self):
+        whole = chunk_stats(self.values)
+        merged = None
+        for start in range(0, len(self.values), 700):
+            merged = merge_stats(merged, chunk_stats(self.values[start:start + 700]))
+        for name in whole:
+            np.testing.assert_allclose(merged[name], whole[name])
+
+    def test_asc_report(self):
+        report = report_file(self.asc_file, chunk_bytes=4096)
+        self.assertEqual(report['points'], len(self.values))
+        columns = list(report['columns'].values())
+        for i, column in enumerate(columns):
+            values = self.values[:, i]
+            finite = values[np.isfinite(values)]
+            self.assertEqual(column['zeros'], np.count_nonzero(values == 0))
+            self.assertEqual(column['nans'], np.count_nonzero(np.isnan(values)))
+            self.assertEqual(column['infs'], np.count_nonzero(np.isinf(values)))
+            self.assertEqual(column['min'], finite.min())
+            self.assertEqual(column['max'], finite.max())
+            self.assertAlmostEqual(column['mean'], finite.mean())
+
+    def test_step_is_independent_of_chunks(self):
+        sampled = self.values[::3]
+        for chunk_bytes in (4096, 10000, 2**20):
+            report = report_file(self.asc_file, chunk_bytes=chunk_bytes, step=3)
+            self.assertEqual((report['points'], report['sampled_points']), (5000, 1667))
+            for i, column in enumerate(report['columns'].values()):
+                self.assertEqual(column['nans'], np.count_nonzero(np.isnan(sampled[:, i])))
+                self.assertEqual(column['zeros'], np.count_nonzero(sampled[:, i] == 0))
+
+    def test_pcd_report(self):
+        report = report_file(self.pcd_file, chunk_bytes=1024)
+        self.assertEqual(report['points'], len(self.points))
+        self.assertIn('r', report['columns'])
+        self.assertAlmostEqual(report['columns']['x']['min'], self.points[:, 0].min(), places=6)
+        self.assertAlmostEqual(report['columns']['z']['max'], self.points[:, 2].max(), places=6)
+
+    def test_run_writes_logs(self):
+        broken = os.path.join(self.tmp_dir.name, "broken.pcd")
+        with open(broken, "w") as f:
+            f.write("not a pcd file")
+        log_dir = os.path.join(self.tmp_dir.name, "logs")
+        reports = run([self.tmp_dir.name], log_dir, workers=2)
+        self.assertEqual(len(reports), 3)
+        self.assertIn('error', [r for r in reports if r['file'] == broken][0])
+        with open(os.path.join(log_dir, "scan_asc_log.log")) as f:
+            self.assertIn("Number of NaNs found in normal_x: ", f.read())
+        with open(os.path.join(log_dir, "scan.pcd_report.json")) as f:
+            self.assertEqual(json.load(f)['points'], len(self.points))
+        with open(os.path.join(log_dir, "raw_report.json")) as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+    def test_single_format_reports_do_not_overwrite(self):
+        log_dir = os.path.join(self.tmp_dir.name, "logs")
+        main([self.tmp_dir.name, "--log-dir", log_dir], default_suffix=".asc")
+        main([self.tmp_dir.name, "--log-dir", log_dir], default_suffix=".pcd")
+        for suffix in ("asc", "pcd"):
+            with open(os.path.join(log_dir, f"raw_report_{suffix}.json")) as f:
+                self.assertEqual([r['format'] for r in json.load(f)], [suffix])
+
+if __name__ == '__main__':
+    unittest.main()
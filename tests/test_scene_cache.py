@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from scene_cache import SceneCache
+
+class TestSceneCache(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+        self.cache = SceneCache(self.load, max_bytes=2500)
+
+    def load(self, key):
+        self.loads.append(key)
+        return {'coords': np.zeros(1000, dtype=np.uint8), 'labels': np.zeros(100, dtype=np.uint8)}
+
+    def test_hits_and_misses(self):
+        self.cache.get(0)
+        self.cache.get(0)
+        self.cache.get(1)
+        self.assertEqual(self.loads, [0, 1])
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertEqual(stats['cached_bytes'], 2200)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get(0)
+        self.cache.get(1)
+        self.cache.get(0)
+        self.cache.get(2)
+        self.assertIn(0, self.cache)
+        self.assertNotIn(1, self.cache)
+        self.assertLessEqual(self.cache.current_bytes, self.cache.max_bytes)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_keeps_newest_scene_over_budget(self):
+        cache = SceneCache(self.load, max_bytes=10)
+        cache.get(0)
+        cache.get(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(1, cache)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import pickle
+import tempfile
+import numpy as np
+from scene_format import write_scene, read_scene, read_scene_header, convert_pkl
+
+class TestSceneFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.scene_file = os.path.join(self.tmp_dir.name, "scan_preprocessed.scene")
+        rng = np.random.default_rng(0)
+        self.data = {
+            'coords': rng.random((1000, 3)).astype(np.float32),
+            'features': rng.random((1000, 6)).astype(np.float32),
+            'labels': rng.integers(1, 25, 1000),
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_is_memory_mapped_and_aligned(self):
+        write_scene(self.scene_file, self.data, meta={'voxel_size': 0.01})
+        scene = read_scene(self.scene_file)
+        for name, array in self.data.items():
+            self.assertIsInstance(scene[name], np.memmap)
+            self.assertEqual(scene[name].dtype, array.dtype)
+            np.testing.assert_array_equal(scene[name], array)
+        header = read_scene_header(self.scene_file)
+        self.assertEqual(header['meta'], {'voxel_size': 0.01})
+        self.assertTrue(all(entry['offset'] % 64 == 0 for entry in header['arrays'].values()))
+
+    def test_empty_arrays(self):
+        write_scene(self.scene_file, {name: array[:0] for name, array in self.data.items()})
+        scene = read_scene(self.scene_file)
+        self.assertEqual(scene['coords'].shape, (0, 3))
+
+    def test_not_a_scene(self):
+        with open(self.scene_file, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            read_scene(self.scene_file)
+
+    def test_convert_pkl(self):
+        pkl_file = os.path.join(self.tmp_dir.name, "scan_preprocessed.pkl")
+        with open(pkl_file, 'wb') as f:
+            pickle.dump(self.data, f)
+        scene = read_scene(convert_pkl(pkl_file, remove=True))
+        np.testing.assert_array_equal(scene['labels'], self.data['labels'])
+        self.assertFalse(os.path.exists(pkl_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+import time
+import numpy as np
+from scheduler import CostModel, count_points, run_scheduled, schedule_order, summarize
+
+
+def timed_sleep(seconds):
+    start = time.time()
+    time.sleep(seconds)
+    return start, time.time()
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.model = CostModel(seconds_per_point=1e-3, bytes_per_point=10)
+
+    def test_longest_first(self):
+        estimates = [self.model.estimate(points) for points in (10, 300, 20, 100)]
+        self.assertEqual(schedule_order(estimates), [1, 3, 2, 0])
+
+    def test_memory_budget_serializes_large_tasks(self):
+        items = [0.2, 0.2, 0.2]
+        estimates = [self.model.estimate(points) for points in (100, 100, 100)]
+        # two workers, but the budget only holds one task at a time
+        results, records = run_scheduled(timed_sleep, items, estimates, max_workers=2, memory_budget=1500)
+        intervals = sorted(results)
+        for (_, end), (start, _) in zip(intervals[:-1], intervals[1:]):
+            self.assertGreaterEqual(start, end - 0.01)
+        self.assertTrue(all(record['actual_seconds'] >= 0.19 for record in records))
+        self.assertTrue(all(record['actual_peak_bytes'] > 0 for record in records))
+
+    def test_oversized_task_still_runs(self):
+        results, records = run_scheduled(timed_sleep, [0.01], [self.model.estimate(10**6)], max_workers=2, memory_budget=1)
+        self.assertEqual(len(results), 1)
+
+    def test_summary_fits_cost_model(self):
+        points = np.array([1e5, 1e6, 5e6])
+        records = [dict(self.model.estimate(int(n)), actual_seconds=2e-6 * n + 1, actual_peak_bytes=300 * n + 1e8)
+                   for n in points]
+        summary = summarize(records, ['a', 'b', 'c'], wall_seconds=12.0)
+        self.assertAlmostEqual(summary['fitted']['seconds_per_point'], 2e-6)
+        self.assertAlmostEqual(summary['fitted']['base_seconds'], 1, places=6)
+        self.assertAlmostEqual(summary['fitted']['bytes_per_point'], 300, places=3)
+        self.assertEqual([task['name'] for task in summary['tasks']], ['a', 'b', 'c'])
+
+    def test_count_points(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pcd_file = os.path.join(tmp_dir, "scan.pcd")
+            with open(pcd_file, "w") as f:
+                f.write("VERSION 0.7\nFIELDS x y z\nSIZE 4 4 4\nTYPE F F F\nCOUNT 1 1 1\nWIDTH 1234\nHEIGHT 1\nPOINTS 1234\nDATA binary\n")
+            asc_file = os.path.join(tmp_dir, "scan.asc")
+            with open(asc_file, "w") as f:
+                f.write("0;0;0;0;0;0;0\n" * 100)
+            self.assertEqual(count_points(pcd_file, asc_file), 1234)
+            self.assertEqual(count_points(asc_file, asc_file), os.path.getsize(asc_file) // 70)
+
+
+if __name__ == '__main__':
+    unittest.main()
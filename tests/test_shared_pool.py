@@ -0,0 +1,49 @@
+import unittest
+import multiprocessing
+import pickle
+from multiprocessing import resource_tracker
+from unittest import mock
+import numpy as np
+from shared_pool import SharedScenePool
+
+def scene_sum(pool, i):
+    return float(pool[i]['coords'].sum()), int(pool[i]['labels'].sum())
+
+class TestSharedScenePool(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.scenes = [{'coords': rng.random((n, 3)).astype(np.float32), 'labels': rng.integers(1, 25, n)}
+                       for n in (10, 1000, 0)]
+        layouts = [{name: (array.dtype, array.shape) for name, array in scene.items()} for scene in self.scenes]
+        self.pool = SharedScenePool(layouts, lambda i: self.scenes[i])
+
+    def tearDown(self):
+        self.pool.unlink()
+
+    def test_views_are_read_only_copies(self):
+        for i, scene in enumerate(self.scenes):
+            np.testing.assert_array_equal(self.pool[i]['coords'], scene['coords'])
+        with self.assertRaises(ValueError):
+            self.pool[0]['coords'][0, 0] = 1
+
+    def test_pickle_only_carries_the_layout(self):
+        self.assertLess(len(pickle.dumps(self.pool)), 2048)
+
+    def test_spawned_worker_attaches(self):
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as workers:
+            result = workers.apply(scene_sum, (self.pool, 1))
+        self.assertAlmostEqual(result[0], float(self.scenes[1]['coords'].sum()), places=2)
+        self.assertEqual(result[1], int(self.scenes[1]['labels'].sum()))
+    def test_attach_leaves_the_tracker_alone(self):
+        # the tracker is shared with the workers: an attach must neither register nor unregister the owner's block
+        with mock.patch.object(resource_tracker, "register") as register, \
+                mock.patch.object(resource_tracker, "unregister") as unregister:
+            attached = pickle.loads(pickle.dumps(self.pool))
+            attached.close()
+        register.assert_not_called()
+        unregister.assert_not_called()
+        self.assertFalse(attached.owner)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from splits import (assign_splits, class_presence, materialize, read_manifest, split_scenes, split_sizes,
+                    write_manifest)
+
+RATIOS = {'train': 0.7, 'val': 0.15, 'test': 0.15}
+
+class TestSplits(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.names = [f"scene{i:03d}" for i in range(100)]
+        self.histograms = []
+        for i in range(len(self.names)):
+            histogram = np.zeros(12, dtype=int)
+            histogram[1:4] = rng.integers(100, 1000, 3)
+            # classes 4..11 are rare, each in 3 to 10 scenes
+            for label in range(4, 12):
+                if rng.random() < 0.03 + 0.01 * (label - 4):
+                    histogram[label] = rng.integers(1, 50)
+            self.histograms.append(histogram.tolist())
+
+    def test_split_sizes(self):
+        self.assertEqual(split_sizes(100, RATIOS), {'train': 70, 'val': 15, 'test': 15})
+        self.assertEqual(sum(split_sizes(7, RATIOS).values()), 7)
+
+    def test_random(self):
+        splits = assign_splits(self.names, RATIOS, seed=1)
+        self.assertEqual({split: len(names) for split, names in splits.items()}, {'train': 70, 'val': 15, 'test': 15})
+        self.assertEqual(sorted(sum(splits.values(), [])), self.names)
+        self.assertEqual(splits, assign_splits(self.names, RATIOS, seed=1))
+        self.assertEqual(assign_splits(self.names, RATIOS, shuffle=False)['val'], self.names[70:85])
+
+    def test_stratified(self):
+        splits = assign_splits(self.names, RATIOS, seed=1, histograms=self.histograms)
+        self.assertEqual({split: len(names) for split, names in splits.items()}, {'train': 70, 'val': 15, 'test': 15})
+        self.assertEqual(sorted(sum(splits.values(), [])), self.names)
+        presence = class_presence(splits, dict(zip(self.names, self.histograms)))
+        scenes_per_class = (np.array(self.histograms) > 0).sum(axis=0)
+        for label in np.flatnonzero(scenes_per_class >= len(RATIOS)):
+            for split in RATIOS:
+                self.assertIn(label, presence[split], f"class {label} missing in {split}")
+
+    def test_unlabeled_scenes(self):
+        histograms = [None] * 10 + self.histograms[:10]
+        splits = assign_splits(self.names[:20], RATIOS, seed=0, histograms=histograms)
+        self.assertEqual(sorted(sum(splits.values(), [])), self.names[:20])
+
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manifest_file = os.path.join(tmp_dir, "splits.json")
+            splits = assign_splits(self.names, RATIOS, seed=2)
+            write_manifest(manifest_file, splits, seed=2)
+            manifest = read_manifest(manifest_file)
+            self.assertEqual(manifest['seed'], 2)
+            self.assertEqual(split_scenes(manifest, "val"), set(splits['val']))
+            self.assertEqual(split_scenes(manifest), set(self.names))
+            with self.assertRaises(KeyError):
+                split_scenes(manifest, "holdout")
+
+    def test_materialize(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = os.path.join(tmp_dir, "a.pcd")
+            with open(src, "w") as f:
+                f.write("data")
+            for mode in ("symlink", "hardlink", "copy"):
+                out_dir = os.path.join(tmp_dir, mode)
+                materialize([src], out_dir, mode)
+                materialize([src], out_dir, mode)  # again, replacing the first one
+                with open(os.path.join(out_dir, "a.pcd")) as f:
+                    self.assertEqual(f.read(), "data")
+            self.assertTrue(os.path.islink(os.path.join(tmp_dir, "symlink", "a.pcd")))
+            self.assertEqual(os.stat(os.path.join(tmp_dir, "hardlink", "a.pcd")).st_ino, os.stat(src).st_ino)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import synthetic_scene
+from synthetic_scene import ensure_pair, iter_scene, write_pair
+from pcd_reader import read_pcd, unpack_rgb
+from asc_reader import read_asc
+
+class TestSyntheticScene(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_deterministic(self):
+        first = next(iter_scene(5000, seed=3))
+        second = next(iter_scene(5000, seed=3))
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+        self.assertFalse(np.array_equal(first[0], next(iter_scene(5000, seed=4))[0]))
+
+    def test_chunks(self):
+        chunk_points = synthetic_scene.CHUNK_POINTS
+        synthetic_scene.CHUNK_POINTS = 1000
+        try:
+            chunks = list(iter_scene(2500, seed=0))
+        finally:
+            synthetic_scene.CHUNK_POINTS = chunk_points
+        self.assertEqual([len(chunk[0]) for chunk in chunks], [1000, 1000, 500])
+
+    def test_scene_content(self):
+        points, colors, normals, labels = next(iter_scene(20000, seed=0))
+        self.assertEqual(set(np.unique(labels)), {0, 1, 2, 3, 4, 5})
+        np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1.0, atol=1e-5)
+        # floor and ceiling points lie on their planes up to the noise
+        self.assertLess(np.abs(points[labels == 1, 2]).max(), 0.03)
+        self.assertLess(np.abs(points[labels == 2, 2] - synthetic_scene.HEIGHT).max(), 0.03)
+
+    def test_pcd_matches_asc(self):
+        pcd_file, asc_file = ensure_pair(self.tmp_dir.name, 3000, seed=1)
+        self.assertTrue(pcd_file.endswith(os.path.join("pcd", "synthetic_3000_1.pcd")))
+        records = read_pcd(pcd_file)
+        asc = read_asc(asc_file, cache=False)
+        self.assertEqual(len(records), 3000)
+        self.assertEqual(len(asc), 3000)
+        for axis in "xyz":
+            np.testing.assert_allclose(records[axis], asc[axis], atol=1e-4)
+        colors = unpack_rgb(records["rgb"])
+        np.testing.assert_array_equal(colors, np.column_stack([asc["r"], asc["g"], asc["b"]]))
+
+        # existing pairs are reused, rewriting gives the same bytes
+        mtime = os.path.getmtime(pcd_file)
+        ensure_pair(self.tmp_dir.name, 3000, seed=1)
+        self.assertEqual(os.path.getmtime(pcd_file), mtime)
+        copy = os.path.join(self.tmp_dir.name, "copy.pcd")
+        write_pair(copy, os.path.join(self.tmp_dir.name, "copy.asc"), 3000, seed=1)
+        with open(pcd_file, "rb") as a, open(copy, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+if __name__ == '__main__':
+    unittest.main()
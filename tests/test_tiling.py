@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import open3d as o3d
+from tiling import iter_tiles, process_tile, stitch_tiles, voxel_index
+from label_transfer import transfer_labels
+
+
+def synthetic_scan(num_points=60000, seed=0):
+    """ floor, two walls and noise, labelled by surface """
+    rng = np.random.default_rng(seed)
+    n = num_points // 3
+    floor = np.c_[rng.random((n, 2)), np.zeros(n)]
+    wall_x = np.c_[np.zeros(n), rng.random(n), rng.random(n) * 0.5]
+    wall_y = np.c_[rng.random(n), np.ones(n), rng.random(n) * 0.5]
+    points = np.concatenate([floor, wall_x, wall_y]) + rng.normal(scale=0.001, size=(3 * n, 3))
+    labels = np.repeat([1, 2, 3], n)
+    return points, rng.random((3 * n, 3)), labels
+
+
+class TestTiling(unittest.TestCase):
+    voxel_size = 0.02
+    radius = 0.04
+
+    def setUp(self):
+        self.points, self.colors, self.labels = synthetic_scan()
+        self.origin = self.points.min(axis=0) - self.voxel_size * 0.5
+
+    def tiled(self, tile_voxels, overlap_voxels):
+        tiles = iter_tiles(self.points, self.origin, self.voxel_size, tile_voxels, overlap_voxels,
+                           colors=self.colors, labels=self.labels)
+        return stitch_tiles(process_tile(tile, self.origin, self.voxel_size, self.radius, 30, 5) for tile in tiles)
+
+    def test_matches_untiled_open3d(self):
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(self.points)
+        pcd.colors = o3d.utility.Vector3dVector(self.colors)
+        down = pcd.voxel_down_sample(self.voxel_size)
+        down.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=self.radius, max_nn=30))
+        down_points = np.asarray(down.points)
+        order = np.lexsort(voxel_index(down_points, self.origin, self.voxel_size).T[::-1])
+        down_points = down_points[order]
+        labels = transfer_labels(self.points, self.labels, down_points, k=5)
+
+        result = self.tiled(tile_voxels=8, overlap_voxels=4)
+        np.testing.assert_array_equal(result['voxels'], voxel_index(down_points, self.origin, self.voxel_size))
+        np.testing.assert_allclose(result['points'], down_points, atol=1e-12)
+        np.testing.assert_allclose(result['colors'], np.asarray(down.colors)[order], atol=1e-12)
+        np.testing.assert_array_equal(result['labels'], labels)
+        cosine = np.abs(np.sum(result['normals'] * np.asarray(down.normals)[order], axis=1))
+        self.assertGreater(cosine.min(), 0.999)
+
+    def test_tile_size_does_not_change_the_result(self):
+        small, large = self.tiled(5, 3), self.tiled(1000, 0)
+        np.testing.assert_array_equal(small['voxels'], large['voxels'])
+        np.testing.assert_array_equal(small['labels'], large['labels'])
+        np.testing.assert_allclose(small['points'], large['points'], atol=1e-12)
+
+    def test_overlap_must_be_smaller_than_tile(self):
+        with self.assertRaises(ValueError):
+            next(iter_tiles(self.points, self.origin, self.voxel_size, 4, 4, labels=self.labels))
+
+
+if __name__ == '__main__':
+    unittest.main()
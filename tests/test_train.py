@@ -0,0 +1,52 @@
+# The training batches stay compact (uint8 features, class indices) through collate and are only decoded in the
+# steps, with a stub in place of the MinkowskiEngine logits.
+import unittest
+import numpy as np
+import torch
+import torch.nn.functional as F
+import MinkowskiEngine as ME
+from feature_codec import decode_features, encode_features, encode_labels
+from train import SegmentationModel, cfg
+
+class StubSegmentation(torch.nn.Module):
+    """ The loss of SegmentationModel on per-row logits of the decoded features, no sparse tensor """
+    loss = SegmentationModel.loss
+
+    def __init__(self, num_classes):
+        super().__init__()
+        torch.manual_seed(0)
+        self.linear = torch.nn.Linear(6, num_classes)
+
+    def logits(self, coords, feats):
+        self.feats = feats
+        return self.linear(feats)
+
+class TestTrainingBatches(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        normals = rng.normal(size=(50, 3))
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        self.features = encode_features(np.concatenate([rng.random((50, 3)), normals], axis=1))
+        self.labels = rng.integers(0, cfg.num_classes, 50)
+        self.items = [(rng.integers(0, 100, (25, 3)).astype(np.int32), self.features[i:i + 25],
+                       encode_labels(self.labels[i:i + 25])) for i in (0, 25)]
+
+    def test_collate_keeps_the_compact_batch(self):
+        coords, feats, labels = ME.utils.batch_sparse_collate(self.items)
+        self.assertEqual(coords.shape, (50, 4))
+        self.assertEqual(feats.dtype, torch.uint8)
+        np.testing.assert_array_equal(feats.numpy(), self.features)
+        np.testing.assert_array_equal(labels.numpy().ravel(), self.labels)
+
+    def test_loss_on_class_indices(self):
+        model = StubSegmentation(cfg.num_classes)
+        batch = ME.utils.batch_sparse_collate(self.items)
+        loss = model.loss(batch)
+        # decoded in the step, cross entropy against the indices
+        self.assertEqual(model.feats.dtype, torch.float32)
+        feats = decode_features(torch.from_numpy(self.features))
+        expected = F.cross_entropy(model.linear(feats), torch.from_numpy(self.labels))
+        self.assertAlmostEqual(loss.item(), expected.item(), places=6)
+
+if __name__ == "__main__":
+    unittest.main()
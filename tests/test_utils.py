@@ -1,8 +1,14 @@
 import unittest
+import os
+import tempfile
+from unittest import mock
 import numpy as np
 import open3d as o3d
-from utils import load_label_color_map, mp, out_pcd, visualize_point_cloud_with_labels
+import utils
+from utils import load_label_color_map, mp, out_pcd, split_data, visualize_point_cloud_with_labels
 from config import Config
+from splits import read_manifest
+from synthetic_scene import write_pair
 
 cfg = Config("config.yaml")
 
@@ -46,5 +52,21 @@ class TestUtils(unittest.TestCase):
     def test_visualize_point_cloud_with_labels(self):
         pass
 
+    def test_split_data_with_the_shipped_config(self):
+        # split_manifest is null in config.yaml: the manifest goes next to the catalog
+        self.assertIsNone(utils.cfg.split_manifest)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = {'pcd_files': os.path.join(tmp_dir, "pcd"), 'asc_files': os.path.join(tmp_dir, "asc")}
+            for i in range(10):
+                write_pair(os.path.join(paths['pcd_files'], f"scene{i}.pcd"),
+                           os.path.join(paths['asc_files'], f"scene{i}.asc"), 500, seed=i)
+            catalog_file = os.path.join(tmp_dir, "catalog.sqlite")
+            with mock.patch.object(utils, "cfg", Config(dict(utils.config_data, catalog_file=catalog_file))):
+                ratios = {'train': cfg.train_ratio, 'val': cfg.val_ratio, 'test': cfg.test_ratio}
+                assignment = split_data(paths, ratios, cfg.shuffle, 0)
+            manifest = read_manifest(os.path.join(tmp_dir, "splits.json"))
+        self.assertEqual(manifest['splits'], assignment)
+        self.assertEqual(sorted(sum(assignment.values(), [])), [f"scene{i}" for i in range(10)])
+
 if __name__ == '__main__':
     unittest.main()
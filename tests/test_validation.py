@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from validation import validate_rows
+
+
+class TestValidation(unittest.TestCase):
+    def setUp(self):
+        self.arrays = {
+            'coords': np.array([[0, 0, 0], [1, 0, 0], [1, 0, 0], [2, 0, 0], [3, 0, 0], [-1, 0, 0], [4, 0, 0]], dtype=np.int32),
+            'features': np.ones((7, 6), dtype=np.float32),
+            'labels': np.array([1, 0, 2, 3, 4, 5, 6]),
+        }
+        self.arrays['features'][3, 4] = np.nan
+
+    def test_counts_and_compaction(self):
+        arrays, dropped = validate_rows(self.arrays)
+        self.assertEqual(dropped, {'non_finite': 1, 'invalid_label': 1, 'out_of_bounds': 1, 'duplicate_voxels': 0})
+        # row 1 has label 0, so its duplicate row 2 is the valid voxel that is kept
+        np.testing.assert_array_equal(arrays['labels'], [1, 2, 4, 6])
+        np.testing.assert_array_equal(arrays['coords'][:, 0], [0, 1, 3, 4])
+        self.assertTrue(np.isfinite(arrays['features']).all())
+
+    def test_duplicates_keep_first(self):
+        self.arrays['labels'][1] = 7
+        arrays, dropped = validate_rows(self.arrays, filters=['duplicate_voxels'])
+        self.assertEqual(dropped, {'duplicate_voxels': 1})
+        np.testing.assert_array_equal(arrays['labels'], [1, 7, 3, 4, 5, 6])
+
+    def test_bounds_and_custom_filter(self):
+        def small_label(arrays, keep, **_):
+            return arrays['labels'] < 5
+        arrays, dropped = validate_rows(self.arrays, filters=['out_of_bounds', small_label], coord_bounds=(0, 4))
+        self.assertEqual(dropped, {'out_of_bounds': 2, 'small_label': 0})
+        np.testing.assert_array_equal(arrays['labels'], [1, 0, 2, 3, 4])
+
+    def test_nothing_dropped_returns_inputs(self):
+        arrays, dropped = validate_rows({'labels': np.array([1, 2])}, filters=['invalid_label'])
+        self.assertEqual(dropped, {'invalid_label': 0})
+        self.assertIs(arrays['labels'].base, None)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            validate_rows({'coords': np.zeros((2, 3)), 'labels': np.zeros(3)})
+
+
+if __name__ == '__main__':
+    unittest.main()
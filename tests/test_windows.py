@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from windows import LogitMerger, center_priority, plan_windows
+
+class TestWindows(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.coords = np.c_[rng.integers(-100, 700, (30000, 2)), rng.integers(0, 50, 30000)].astype(np.int32)
+
+    def test_plan_covers_every_point(self):
+        windows = plan_windows(self.coords, 256, 64, align=32)
+        coverage = np.zeros(len(self.coords), dtype=int)
+        for window in windows:
+            self.assertTrue(np.all(window['low'] % 32 == 0))
+            xy = self.coords[window['rows'], :2]
+            self.assertTrue(np.all((xy >= window['low']) & (xy < window['high'])))
+            # nothing inside the window is missed
+            inside = np.all((self.coords[:, :2] >= window['low']) & (self.coords[:, :2] < window['high']), axis=1)
+            np.testing.assert_array_equal(np.flatnonzero(inside), window['rows'])
+            coverage[window['rows']] += 1
+        self.assertTrue(np.all(coverage >= 1))
+        self.assertLessEqual(coverage.max(), 4)
+
+    def test_invalid_windows(self):
+        with self.assertRaises(ValueError):
+            plan_windows(self.coords, 256, 256)
+        with self.assertRaises(ValueError):
+            plan_windows(self.coords, 250, 64, align=32)
+        self.assertEqual(plan_windows(self.coords[:0], 256, 64), [])
+
+    def test_average_merge(self):
+        windows = plan_windows(self.coords, 256, 128)
+        merger = LogitMerger(len(self.coords), 3)
+        for window in windows:
+            # logits that only depend on the point: every merge gives them back
+            rows = window['rows']
+            merger.add(rows, np.c_[rows, -rows, np.full(len(rows), 2.0)].astype(np.float32))
+        rows = np.arange(len(self.coords))
+        np.testing.assert_allclose(merger.result(), np.c_[rows, -rows, np.full(len(rows), 2.0)], rtol=1e-6)
+
+    def test_center_merge(self):
+        windows = plan_windows(self.coords, 256, 128)
+        merger = LogitMerger(len(self.coords), len(windows), "center")
+        for k, window in enumerate(windows):
+            rows = window['rows']
+            logits = np.zeros((len(rows), len(windows)), dtype=np.float32)
+            logits[:, k] = 1.0
+            merger.add(rows, logits, center_priority(self.coords[rows], window))
+        chosen = np.argmax(merger.result(), axis=1)
+        distances = np.full((len(self.coords), len(windows)), np.inf)
+        for k, window in enumerate(windows):
+            distances[window['rows'], k] = -center_priority(self.coords[window['rows']], window)
+        np.testing.assert_array_equal(distances[np.arange(len(self.coords)), chosen], distances.min(axis=1))
+
+    def test_invalid_merge(self):
+        with self.assertRaises(ValueError):
+            LogitMerger(10, 3, "max")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+"""Chunked reader for semicolon separated ASC exports with a memory-mappable binary sidecar.
+
+The text is parsed block by block (np.loadtxt on newline aligned byte ranges), optionally
+split across processes. On first read all columns are written to a raw binary sidecar
+(<file>.bin) described by a small JSON header (<file>.json), later reads memory-map it and
+skip text parsing entirely. A sidecar is reused only while the source size and mtime match.
+Rows whose label is not a finite integer (NaN, 2.5, ...) get INVALID_LABEL instead of a truncated
+class, so that the invalid_label row filter of validation.py drops them.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+# CloudCompare ASC export: x;y;z;r;g;b;Classification;normal_x;normal_y;normal_z
+ASC_FIELDS = ("x", "y", "z", "r", "g", "b", "label", "normal_x", "normal_y", "normal_z")
+ASC_DTYPES = {
+    "x": np.float64, "y": np.float64, "z": np.float64,
+    "r": np.uint8, "g": np.uint8, "b": np.uint8,
+    "label": np.uint8,
+    "normal_x": np.float32, "normal_y": np.float32, "normal_z": np.float32,
+}
+# the 'Invalid' class, see validation.invalid_label
+INVALID_LABEL = 0
+SIDECAR_VERSION = 2
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _sniff(asc_file):
+    """ Return the field names of the file and the byte offset of the first data row. """
+    with open(asc_file, "rb") as f:
+        first_line = f.readline()
+    tokens = first_line.strip().split(b";")
+    try:
+        float(tokens[0])
+        data_start = 0
+    except ValueError:
+        # header row, e.g. "//X;Y;Z;R;G;B;..." written by CloudCompare with -ADD_HEADER
+        data_start = len(first_line)
+    fields = [ASC_FIELDS[i] if i < len(ASC_FIELDS) else f"col{i}" for i in range(len(tokens))]
+    return fields, data_start
+
+
+def _record_dtype(fields, dtypes=None):
+    dtypes = dtypes or {}
+    return np.dtype([(name, dtypes.get(name, ASC_DTYPES.get(name, np.float64))) for name in fields])
+
+
+def _to_records(block, usecols, record_dtype):
+    values = np.loadtxt(io.BytesIO(block), delimiter=";", usecols=usecols, dtype=np.float64, ndmin=2)
+    records = np.empty(len(values), dtype=record_dtype)
+    for i, name in enumerate(record_dtype.names):
+        dtype, column = record_dtype[name], values[:, i]
+        if dtype.kind in "iu":
+            integral = np.isfinite(column) & (column == np.rint(column))
+            if name == "label":
+                column = np.where(integral, column, INVALID_LABEL)
+            elif not integral.all():
+                raise ValueError(f"Column '{name}' has values that are not finite integers")
+            info = np.iinfo(dtype)
+            if len(column) and (column.min() < info.min or column.max() > info.max):
+                raise ValueError(f"Column '{name}' does not fit into {dtype}")
+        records[name] = column
+    return records
+
+
+def _line_ranges(asc_file, data_start, num_ranges):
+    size = os.path.getsize(asc_file)
+    bounds = np.linspace(data_start, size, num_ranges + 1).astype(np.int64)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def iter_asc_chunks(asc_file, columns: Optional[Sequence[str]] = None, dtypes: Optional[dict] = None,
+                    chunk_bytes: int = CHUNK_BYTES, start: Optional[int] = None,
+                    end: Optional[int] = None) -> Iterator[np.ndarray]:
+    """ Stream a (byte range of an) ASC file as structured arrays of about chunk_bytes of text each.
+    Args:
+        columns: field names to keep, default all columns of the file
+        dtypes: per field dtype overrides of ASC_DTYPES, e.g. {"x": np.float32}
+        start, end: byte range, a row belongs to the range its first byte falls into
+    """
+    fields, data_start = _sniff(asc_file)
+    columns = list(columns) if columns is not None else fields
+    unknown = set(columns) - set(fields)
+    if unknown:
+        raise KeyError(f"{asc_file} has no column(s) {sorted(unknown)}, available: {fields}")
+    usecols = [fields.index(name) for name in columns]
+    record_dtype = _record_dtype(columns, dtypes)
+    start = data_start if start is None else max(start, data_start)
+    end = os.path.getsize(asc_file) if end is None else end
+
+    with open(asc_file, "rb") as f:
+        if start > data_start:
+            # skip the row that started in the previous range
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(start)
+        while f.tell() < end:
+            block = f.read(min(chunk_bytes, end - f.tell()))
+            if not block.endswith(b"\n"):
+                block += f.readline()
+            if block.strip():
+                yield _to_records(block, usecols, record_dtype)
+
+
+def _parse_range(asc_file, start, end, chunk_bytes, part_file):
+    """ Worker: parse one byte range with all columns and append the records to part_file. """
+    rows = 0
+    with open(part_file, "wb") as out:
+        for records in iter_asc_chunks(asc_file, chunk_bytes=chunk_bytes, start=start, end=end):
+            records.tofile(out)
+            rows += len(records)
+    return rows
+
+
+def _sidecar_paths(asc_file, cache_dir):
+    base = os.path.basename(asc_file) if cache_dir else asc_file
+    base = os.path.join(cache_dir, base) if cache_dir else base
+    return base + ".bin", base + ".json"
+
+
+def _load_sidecar(asc_file, cache_dir):
+    bin_file, header_file = _sidecar_paths(asc_file, cache_dir)
+    if not (os.path.exists(bin_file) and os.path.exists(header_file)):
+        return None
+    with open(header_file) as f:
+        header = json.load(f)
+    stat = os.stat(asc_file)
+    if (header.get("version") != SIDECAR_VERSION or header["source_size"] != stat.st_size
+            or header["source_mtime_ns"] != stat.st_mtime_ns):
+        return None
+    record_dtype = np.dtype([(name, dtype) for name, dtype in header["fields"]])
+    if header["rows"] == 0:
+        return np.empty(0, dtype=record_dtype)
+    return np.memmap(bin_file, dtype=record_dtype, mode="r", shape=(header["rows"],))
+
+
+def _parse_to_parts(asc_file, part_dir, workers, chunk_bytes):
+    _, data_start = _sniff(asc_file)
+    ranges = _line_ranges(asc_file, data_start, max(workers, 1))
+    part_files = [os.path.join(part_dir, f"part{i:04d}.bin") for i in range(len(ranges))]
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_parse_range, [asc_file] * len(ranges), [s for s, _ in ranges],
+                                     [e for _, e in ranges], [chunk_bytes] * len(ranges), part_files))
+    else:
+        rows = [_parse_range(asc_file, s, e, chunk_bytes, p) for (s, e), p in zip(ranges, part_files)]
+    return part_files, sum(rows)
+
+
+def _write_sidecar(asc_file, cache_dir, workers, chunk_bytes):
+    bin_file, header_file = _sidecar_paths(asc_file, cache_dir)
+    out_dir = os.path.dirname(os.path.abspath(bin_file))
+    os.makedirs(out_dir, exist_ok=True)
+    fields, _ = _sniff(asc_file)
+    record_dtype = _record_dtype(fields)
+    stat = os.stat(asc_file)
+    if os.path.exists(header_file):
+        os.remove(header_file)
+
+    with tempfile.TemporaryDirectory(dir=out_dir) as part_dir:
+        part_files, rows = _parse_to_parts(asc_file, part_dir, workers, chunk_bytes)
+        tmp_bin = os.path.join(part_dir, "sidecar.bin")
+        with open(tmp_bin, "wb") as out:
+            for part_file in part_files:
+                with open(part_file, "rb") as part:
+                    shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+        os.replace(tmp_bin, bin_file)
+
+    header = {
+        "version": SIDECAR_VERSION,
+        "fields": [(name, record_dtype[name].str) for name in record_dtype.names],
+        "rows": rows,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+    }
+    # the header is written last, a sidecar without it is incomplete and ignored
+    with open(header_file + ".tmp", "w") as f:
+        json.dump(header, f)
+    os.replace(header_file + ".tmp", header_file)
+
+
+def _select(records, columns, dtypes):
+    if columns is None and not dtypes:
+        return records
+    columns = list(columns) if columns is not None else list(records.dtype.names)
+    wanted = _record_dtype(columns, {name: records.dtype[name] for name in columns} | (dtypes or {}))
+    if all(wanted[name] == records.dtype[name] for name in columns):
+        return records[columns]  # view, no copy of a memory-mapped sidecar
+    selected = np.empty(len(records), dtype=wanted)
+    for name in columns:
+        selected[name] = records[name]
+    return selected
+
+
+def read_asc(asc_file, columns: Optional[Sequence[str]] = None, dtypes: Optional[dict] = None,
+             workers: int = 1, cache: bool = True, cache_dir: Optional[str] = None,
+             chunk_bytes: int = CHUNK_BYTES) -> np.ndarray:
+    """ Read an ASC file into a structured array with one field per column.
+    Args:
+        columns: field names to return, see ASC_FIELDS, default all
+        dtypes: per field dtype overrides, e.g. {"x": np.float32, "label": np.uint8}
+        workers: processes parsing newline aligned byte ranges of the file in parallel
+        cache: read from / write to the binary sidecar, the result is then memory-mapped
+        cache_dir: where sidecars go, default next to the ASC file
+    """
+    asc_file = os.fspath(asc_file)
+    if not cache:
+        if workers <= 1:
+            chunks = list(iter_asc_chunks(asc_file, columns, dtypes, chunk_bytes))
+            if chunks:
+                return np.concatenate(chunks)
+            fields, _ = _sniff(asc_file)
+            return np.empty(0, dtype=_record_dtype(columns or fields, dtypes))
+        with tempfile.TemporaryDirectory() as part_dir:
+            part_files, _ = _parse_to_parts(asc_file, part_dir, workers, chunk_bytes)
+            record_dtype = _record_dtype(_sniff(asc_file)[0])
+            records = np.concatenate([np.fromfile(p, dtype=record_dtype) for p in part_files] or
+                                     [np.empty(0, dtype=record_dtype)])
+        return _select(records, columns, dtypes)
+
+    records = _load_sidecar(asc_file, cache_dir)
+    if records is None:
+        _write_sidecar(asc_file, cache_dir, workers, chunk_bytes)
+        records = _load_sidecar(asc_file, cache_dir)
+    return _select(records, columns, dtypes)
@@ -0,0 +1,118 @@
+"""Per-scene index of horizontal blocks for random spatial crops.
+
+Preprocessing sorts the rows of a scene by the (x, y) block of block_voxels x block_voxels voxels
+they fall into and stores, next to the arrays:
+
+    block_keys          (B,) int64    packed (bx, by) of every non-empty block, ascending
+    block_offsets       (B + 1,) int64 rows of block b are block_offsets[b]:block_offsets[b + 1]
+    block_class_counts  (B, C) uint32  points per class in every block
+
+A crop of crop_voxels around a point then reads one contiguous row range per block column it
+overlaps (found by binary search), so its cost depends on the crop, not on the scene size, and
+with a memory-mapped scene only those pages are touched. Crop centers are drawn per block, in
+proportion to the points of the block or, for rare-class biasing, to its class counts weighted
+by the inverse global class frequency.
+"""
+import numpy as np
+
+INDEX_ARRAYS = ("block_keys", "block_offsets", "block_class_counts")
+_SHIFT = np.int64(32)
+
+
+def pack_blocks(bx, by) -> np.ndarray:
+    """ (bx, by) -> one sortable int64, bx major; block coordinates must be non-negative """
+    return (np.asarray(bx, dtype=np.int64) << _SHIFT) | np.asarray(by, dtype=np.int64)
+
+
+def unpack_blocks(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> _SHIFT, keys & np.int64(0xFFFFFFFF)
+
+
+def build_block_index(coords: np.ndarray, labels: np.ndarray, block_voxels: int, num_classes: int = None):
+    """ Row order that groups the rows by block, and the index arrays of the reordered scene
+    Returns:
+        order (n,) int64 and {name: array} for INDEX_ARRAYS
+    """
+    coords = np.asarray(coords)
+    labels = np.asarray(labels)
+    keys = pack_blocks(coords[:, 0] // block_voxels, coords[:, 1] // block_voxels)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    block_keys, starts = np.unique(sorted_keys, return_index=True)
+    offsets = np.append(starts, len(keys)).astype(np.int64)
+    num_classes = max(num_classes or 1, int(labels.max()) + 1 if len(labels) else 1)
+    block_of_row = np.repeat(np.arange(len(block_keys), dtype=np.int64), np.diff(offsets))
+    class_counts = np.bincount(block_of_row * num_classes + labels[order].astype(np.int64),
+                               minlength=len(block_keys) * num_classes).reshape(len(block_keys), num_classes)
+    return order, {
+        'block_keys': block_keys,
+        'block_offsets': offsets,
+        'block_class_counts': class_counts.astype(np.uint32),
+    }
+
+
+def has_block_index(arrays: dict) -> bool:
+    return all(name in arrays for name in INDEX_ARRAYS)
+
+
+def class_weights(class_totals: np.ndarray, alpha: float) -> np.ndarray:
+    """ Per-class weight (frequency ** -alpha) of a point, 0 for absent classes; alpha 0 weights every point alike """
+    class_totals = np.asarray(class_totals, dtype=np.float64)
+    frequency = class_totals / max(class_totals.sum(), 1.0)
+    weights = np.zeros_like(frequency)
+    present = frequency > 0
+    weights[present] = frequency[present] ** -alpha
+    return weights
+
+
+def block_weights(index: dict, weights: np.ndarray = None) -> np.ndarray:
+    """ Probability mass of every block: its points, or its points weighted by class """
+    if weights is None:
+        return np.diff(index['block_offsets']).astype(np.float64)
+    counts = np.asarray(index['block_class_counts'], dtype=np.float64)
+    return counts @ weights[:counts.shape[1]]
+
+
+def crop_ranges(index: dict, block_voxels: int, low, high) -> list:
+    """ Row ranges (start, end) of all blocks overlapping the window [low, high) in x and y """
+    keys, offsets = index['block_keys'], index['block_offsets']
+    bx0, by0 = int(low[0]) // block_voxels, int(low[1]) // block_voxels
+    bx1, by1 = (int(high[0]) - 1) // block_voxels, (int(high[1]) - 1) // block_voxels
+    ranges = []
+    for bx in range(max(bx0, 0), bx1 + 1):
+        # the blocks of one column are consecutive keys, hence consecutive rows
+        first, last = np.searchsorted(keys, pack_blocks([bx, bx], [max(by0, 0), by1 + 1]))
+        if first < last:
+            ranges.append((int(offsets[first]), int(offsets[last])))
+    return ranges
+
+
+def sample_crop(index: dict, coords: np.ndarray, block_voxels: int, crop_voxels: int, rng, cumulative_weights=None,
+                max_points: int = None, order: np.ndarray = None) -> np.ndarray:
+    """ Rows of one random crop of crop_voxels x crop_voxels (full height) around a random center.
+    Args:
+        coords: the block-sorted coordinates of the scene, typically memory-mapped
+        cumulative_weights: np.cumsum(block_weights(...)) to draw the center block from, default by points
+        max_points: a crop with more rows is subsampled at random to this many
+        order: for scenes stored unsorted, the order of build_block_index; rows are returned in stored order
+    """
+    if cumulative_weights is None:
+        cumulative_weights = np.cumsum(block_weights(index))
+    block = int(np.searchsorted(cumulative_weights, rng.random() * cumulative_weights[-1], side="right"))
+    block = min(block, len(cumulative_weights) - 1)
+    bx, by = unpack_blocks(index['block_keys'][block])
+    center = (np.array([bx, by]) + rng.random(2)) * block_voxels
+    low = np.floor(center - crop_voxels / 2).astype(np.int64)
+    high = low + crop_voxels
+
+    rows = []
+    for start, end in crop_ranges(index, block_voxels, low, high):
+        block_rows = np.arange(start, end) if order is None else order[start:end]
+        xy = np.asarray(coords[start:end, :2]) if order is None else np.asarray(coords[block_rows, :2])
+        inside = (xy[:, 0] >= low[0]) & (xy[:, 0] < high[0]) & (xy[:, 1] >= low[1]) & (xy[:, 1] < high[1])
+        rows.append(block_rows[inside])
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    if max_points is not None and len(rows) > max_points:
+        rows = np.sort(rng.choice(rows, max_points, replace=False))
+    return rows
@@ -0,0 +1,211 @@
+"""Persistent catalog of the raw PCD + ASC pairs, in one SQLite file.
+
+Every entry holds the matched pair with the sizes and mtimes of both files, the point count
+from the PCD header, the bounding box and the per-class label histogram. refresh() lists both
+directories once, matches them by file stem through a dict and only (re)computes the entries
+of files that are new or whose size or mtime changed; entries of removed files are dropped.
+An unchanged directory costs one stat per file, so planning a run over tens of thousands of
+scans takes well under a second.
+
+    python utils/catalog.py data/raw/train/pcd data/raw/train/asc --db data/raw/catalog.sqlite
+"""
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from asc_reader import read_asc
+from pcd_reader import read_pcd, read_pcd_header
+
+CATALOG_VERSION = 1
+ASC_BYTES_PER_ROW = 70  # point count estimate for pairs whose PCD header is unusable
+
+COLUMNS = ("name", "pcd_file", "asc_file", "pcd_size", "pcd_mtime_ns", "asc_size", "asc_mtime_ns", "points",
+           "bbox", "label_histogram")
+
+
+def _listing(directory, suffix: str) -> dict:
+    """ {stem: (absolute path, size, mtime_ns)} of the files with suffix in directory """
+    files = {}
+    # entry.path of an absolute directory is absolute
+    with os.scandir(os.path.abspath(directory)) as entries:
+        for entry in entries:
+            if entry.name.endswith(suffix) and entry.is_file():
+                stat = entry.stat()
+                files[entry.name[:-len(suffix)]] = (entry.path, stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def match_pairs(pcd_files, asc_files):
+    """ Match by file stem through a dict, O(n + m).
+    Returns:
+        (pcd_file, asc_file) pairs in the order of pcd_files, and the PCD files without an ASC file
+    """
+    asc_by_stem = {os.path.splitext(os.path.basename(asc_file))[0]: asc_file for asc_file in asc_files}
+    pairs, unmatched = [], []
+    for pcd_file in pcd_files:
+        asc_file = asc_by_stem.get(os.path.splitext(os.path.basename(pcd_file))[0])
+        if asc_file is None:
+            unmatched.append(pcd_file)
+        else:
+            pairs.append((pcd_file, asc_file))
+    return pairs, unmatched
+
+
+def scan_stats(pcd_file, asc_file, with_stats: bool = True, asc_cache: bool = True,
+               asc_cache_dir: Optional[str] = None) -> dict:
+    """ Point count, bounding box [min x, y, z, max x, y, z] and label histogram of one pair. A file that
+    cannot be read leaves its statistics None and the reason in 'error'. """
+    try:
+        points = read_pcd_header(pcd_file)["points"]
+    except (OSError, ValueError, KeyError):
+        points = os.path.getsize(asc_file) // ASC_BYTES_PER_ROW
+    stats = {'points': points, 'bbox': None, 'label_histogram': None, 'error': None}
+    if not with_stats:
+        return stats
+    try:
+        records = read_pcd(pcd_file, fields=["x", "y", "z"])
+        lows = [float(np.nanmin(records[axis])) if len(records) else None for axis in "xyz"]
+        highs = [float(np.nanmax(records[axis])) if len(records) else None for axis in "xyz"]
+        stats['bbox'] = lows + highs
+    except (OSError, ValueError) as e:
+        stats['error'] = f"{pcd_file}: {e}"
+    try:
+        # with asc_cache this leaves the binary sidecar behind that preprocessing reads later anyway
+        labels = read_asc(asc_file, columns=["label"], cache=asc_cache, cache_dir=asc_cache_dir)["label"]
+        stats['label_histogram'] = np.bincount(labels).tolist()
+    except (OSError, ValueError) as e:
+        stats['error'] = f"{asc_file}: {e}"
+    return stats
+
+
+def _scan_stats(args):
+    return scan_stats(*args)
+
+
+class Catalog:
+    """
+    Attributes:
+        db_file (str): SQLite file, created on first use.
+    """
+    def __init__(self, db_file):
+        self.db_file = db_file
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_file)
+        with self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != CATALOG_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS scans")
+                self.connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS scans (name TEXT, pcd_file TEXT PRIMARY KEY, asc_file TEXT, pcd_dir TEXT, "
+                "pcd_size INTEGER, pcd_mtime_ns INTEGER, asc_size INTEGER, asc_mtime_ns INTEGER, points INTEGER, "
+                "bbox TEXT, label_histogram TEXT, with_stats INTEGER)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scans_pcd_dir ON scans (pcd_dir)")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def entries(self, pcd_dir) -> list:
+        """ Catalogued entries of pcd_dir, sorted by name, without looking at the files """
+        rows = self.connection.execute(f"SELECT {', '.join(COLUMNS)} FROM scans WHERE pcd_dir = ? ORDER BY name",
+                                       (os.path.abspath(pcd_dir),)).fetchall()
+        entries = [dict(zip(COLUMNS, row)) for row in rows]
+        for column in ("bbox", "label_histogram"):
+            # one JSON document for all rows, a json.loads per row dominates for tens of thousands of scans
+            values = json.loads("[" + ",".join(entry[column] or "null" for entry in entries) + "]")
+            for entry, value in zip(entries, values):
+                entry[column] = value
+        return entries
+
+    def refresh(self, pcd_dir, asc_dir, workers: int = 1, with_stats: bool = True, asc_cache: bool = True,
+                asc_cache_dir: Optional[str] = None):
+        """ Bring the entries of pcd_dir up to date with the files.
+        Returns:
+            the entries (see entries) and {'updated': n, 'removed': n, 'unmatched': [pcd files], 'errors': [messages]}
+        """
+        pcd_dir = os.path.abspath(pcd_dir)
+        pcd_listing, asc_listing = _listing(pcd_dir, ".pcd"), _listing(asc_dir, ".asc")
+        known = {row[0]: row[1:] for row in self.connection.execute(
+            "SELECT pcd_file, asc_file, pcd_size, pcd_mtime_ns, asc_size, asc_mtime_ns, with_stats FROM scans "
+            "WHERE pcd_dir = ?", (pcd_dir,))}
+
+        stale, current, unmatched = [], set(), []
+        for stem in sorted(pcd_listing):
+            pcd_file, pcd_size, pcd_mtime = pcd_listing[stem]
+            if stem not in asc_listing:
+                unmatched.append(pcd_file)
+                continue
+            asc_file, asc_size, asc_mtime = asc_listing[stem]
+            current.add(pcd_file)
+            signature = (asc_file, pcd_size, pcd_mtime, asc_size, asc_mtime)
+            if pcd_file not in known or known[pcd_file][:5] != signature or known[pcd_file][5] < with_stats:
+                stale.append((stem, pcd_file, signature))
+
+        tasks = [(pcd_file, signature[0], with_stats, asc_cache, asc_cache_dir) for _, pcd_file, signature in stale]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                stats = list(pool.map(_scan_stats, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+        else:
+            stats = [_scan_stats(task) for task in tasks]
+
+        with self.connection:
+            removed = [(pcd_file,) for pcd_file in known if pcd_file not in current]
+            self.connection.executemany("DELETE FROM scans WHERE pcd_file = ?", removed)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(stem, pcd_file, signature[0], pcd_dir, *signature[1:], entry['points'],
+                  json.dumps(entry['bbox']) if entry['bbox'] is not None else None,
+                  json.dumps(entry['label_histogram']) if entry['label_histogram'] is not None else None, int(with_stats))
+                 for (stem, pcd_file, signature), entry in zip(stale, stats)])
+        changes = {'updated': len(stale), 'removed': len(removed), 'unmatched': unmatched,
+                   'errors': [entry['error'] for entry in stats if entry['error']]}
+        return self.entries(pcd_dir), changes
+
+
+def summarize(entries) -> dict:
+    """ Totals over catalog entries: pairs, points, bytes and the summed label histogram """
+    histograms = [entry['label_histogram'] for entry in entries if entry['label_histogram']]
+    total_histogram = np.zeros(max((len(h) for h in histograms), default=0), dtype=np.int64)
+    for histogram in histograms:
+        total_histogram[:len(histogram)] += histogram
+    return {
+        'pairs': len(entries),
+        'points': int(sum(entry['points'] for entry in entries)),
+        'bytes': int(sum(entry['pcd_size'] + entry['asc_size'] for entry in entries)),
+        'label_histogram': {label: int(count) for label, count in enumerate(total_histogram) if count},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update and summarize the raw data catalog")
+    parser.add_argument("pcd_dir")
+    parser.add_argument("asc_dir")
+    parser.add_argument("--db", default="data/raw/catalog.sqlite")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-stats", action="store_true", help="only pairs, sizes and point counts")
+    args = parser.parse_args()
+    with Catalog(args.db) as catalog:
+        entries, changes = catalog.refresh(args.pcd_dir, args.asc_dir, workers=args.workers, with_stats=not args.no_stats)
+    for pcd_file in changes['unmatched']:
+        print(f"Warning: No corresponding ASC file found for PCD file {pcd_file}.")
+    for error in changes['errors']:
+        print(f"Warning: {error}")
+    print(json.dumps(dict(summarize(entries), updated=changes['updated'], removed=changes['removed']), indent=2))
+
+
+if __name__ == "__main__":
+    main()
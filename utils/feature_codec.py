@@ -0,0 +1,49 @@
+"""Compact storage of per-point features and labels.
+
+Features are [r, g, b, normal_x, normal_y, normal_z] with colors in [0, 1] and unit normals.
+Encodings (cfg.feature_encoding):
+    uint8    6 bytes/point: colors as uint8 0..255, normals as int8 round(n * 127),
+             both packed into one (n, 6) uint8 array (the normal bytes are int8 reinterpreted)
+    float16  12 bytes/point
+    float32  24 bytes/point, the original layout
+Labels are stored as class indices (uint8), never one-hot. Expansion to float32 happens on the
+device with decode_features / decode_labels, after the compact batch has been transferred.
+"""
+import numpy as np
+
+FEATURE_ENCODINGS = ("uint8", "float16", "float32")
+
+
+def encode_features(features: np.ndarray, encoding: str = "uint8") -> np.ndarray:
+    if encoding not in FEATURE_ENCODINGS:
+        raise ValueError(f"Invalid feature encoding {encoding}. Must be one of {FEATURE_ENCODINGS}")
+    if encoding != "uint8":
+        return np.ascontiguousarray(features, dtype=encoding)
+    encoded = np.empty((len(features), 6), dtype=np.uint8)
+    encoded[:, :3] = np.clip(np.rint(features[:, :3] * 255.0), 0, 255)
+    encoded[:, 3:] = np.clip(np.rint(features[:, 3:] * 127.0), -127, 127).astype(np.int8).view(np.uint8)
+    return encoded
+
+
+def encode_labels(labels: np.ndarray) -> np.ndarray:
+    labels = np.asarray(labels)
+    if len(labels) and (labels.min() < 0 or labels.max() > np.iinfo(np.uint8).max):
+        raise ValueError(f"Labels in [{labels.min()}, {labels.max()}] do not fit into uint8")
+    return labels.astype(np.uint8)
+
+
+def decode_features(feats):
+    """ Encoded features as a torch tensor (ideally already on the device) -> float32 (n, 6). """
+    if feats.element_size() != 1:
+        return feats.float()
+    out = feats.float()
+    out[:, :3] /= 255.0
+    normals = out[:, 3:]
+    normals -= 256.0 * (normals > 127)  # the normal bytes are int8 two's complement
+    normals /= 127.0
+    return out
+
+
+def decode_labels(labels):
+    """ uint8 class indices as a torch tensor -> int64, as expected by the loss functions. """
+    return labels.long()
@@ -0,0 +1,226 @@
+"""Queue based logging shared by the main process and its worker processes.
+
+Loggers returned by get_logger only put records on one multiprocessing queue. A listener
+thread in the process that created the queue (the first process that logs and was not started
+by multiprocessing) owns the file handlers, one per log file however often get_logger is
+called, and does all file I/O. Forked workers inherit the queue; spawned workers get it from
+their initializer:
+
+    ProcessPoolExecutor(mp_context=spawn, initializer=worker_init())
+    DataLoader(dataset, num_workers=4, worker_init_fn=worker_init())
+
+A worker never starts a listener or opens a log file. Records it logs before the initializer
+ran (e.g. at import) are kept and sent once it is attached. This way the records of all
+processes end up in the same files, in order and without interleaved lines, and a worker never
+waits for a disk write. Messages are formatted before they are queued, only for
+enabled levels; wrap expensive arguments in lazy() so they are not even computed otherwise:
+
+    logger.debug("Normals: min %s", lazy(np.min, normals))
+
+With json_lines every file gets a <name>.jsonl twin with one JSON object per record (exception
+tracebacks in an 'exception' field). The format is decided per record: configure_logging or the
+json_lines argument of get_logger also apply to files that already have handlers.
+"""
+import atexit
+import copy
+import functools
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import threading
+
+FORMAT = "%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+_lock = threading.Lock()
+_state = {'queue': None, 'listener': None, 'owner': None, 'level': logging.DEBUG, 'json_lines': False, 'pending': []}
+# records a worker keeps until it is attached
+MAX_PENDING = 10000
+_loggers = {}
+
+
+class lazy:
+    """ Log argument computed only when the record is formatted, i.e. when its level is enabled. """
+    def __init__(self, fn, *args, **kwargs):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+
+    def value(self):
+        # computed once even if several handlers format the record
+        if self.fn is not None:
+            self.result = self.fn(*self.args, **self.kwargs)
+            self.fn = self.args = self.kwargs = None
+        return self.result
+
+    def __str__(self):
+        return str(self.value())
+
+    def __float__(self):
+        return float(self.value())
+
+    def __int__(self):
+        return int(self.value())
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'name': record.name,
+            'level': record.levelname,
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # formatted by _FileQueueHandler before the record was queued
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class _FileQueueHandler(logging.handlers.QueueHandler):
+    """ Formats the message in the calling process and tags the record with its destination file and
+    whether it also goes to the JSON lines file (json_lines None: the setting of configure_logging). """
+    def __init__(self, queue, log_file, json_lines=None):
+        super().__init__(queue)
+        self.log_file = log_file
+        self.json_lines = json_lines
+
+    def prepare(self, record):
+        # like QueueHandler.prepare, but the traceback stays apart from the message, in exc_text,
+        # which the text formatter appends and the JSON formatter puts into its own field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.log_file = self.log_file
+        record.json_lines = self.json_lines if self.json_lines is not None else _state['json_lines']
+        return record
+
+    def enqueue(self, record):
+        # the queue of the process, which a spawned worker only gets from attach()
+        queue = _state['queue']
+        if queue is None:
+            if len(_state['pending']) < MAX_PENDING:
+                _state['pending'].append(record)
+            return
+        try:
+            queue.put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+
+class _FileRouter(logging.Handler):
+    """ Listener side: writes every record to the file(s) it was tagged with, one handler per (file, format). """
+    def __init__(self):
+        super().__init__()
+        self.handlers = {}
+
+    def _handler_for(self, log_file, kind):
+        if (log_file, kind) not in self.handlers:
+            log_directory = os.path.dirname(log_file)
+            if log_directory:
+                os.makedirs(log_directory, exist_ok=True)
+            if kind == "json":
+                handler = logging.FileHandler(os.path.splitext(log_file)[0] + ".jsonl", mode="a")
+                handler.setFormatter(JsonFormatter())
+            else:
+                handler = logging.FileHandler(log_file, mode="a")
+                handler.setFormatter(logging.Formatter(fmt=FORMAT, datefmt=DATE_FORMAT))
+            self.handlers[(log_file, kind)] = handler
+        return self.handlers[(log_file, kind)]
+
+    def emit(self, record):
+        self._handler_for(record.log_file, "text").handle(record)
+        if getattr(record, "json_lines", False):
+            self._handler_for(record.log_file, "json").handle(record)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+        super().close()
+
+
+def _start():
+    """ Create the queue and the listener thread, in the first process that logs. """
+    # a spawn context queue can be handed to forked and spawned workers alike
+    _state['queue'] = multiprocessing.get_context("spawn").Queue()
+    router = _FileRouter()
+    _state['router'] = router
+    _state['listener'] = logging.handlers.QueueListener(_state['queue'], router)
+    _state['listener'].start()
+    _state['owner'] = os.getpid()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """ Write out the queued records and close the files (registered with atexit). """
+    listener = _state['listener']
+    if listener is not None and _state['owner'] == os.getpid():
+        listener.stop()
+        _state['router'].close()
+        _state['listener'] = None
+
+
+def _is_worker() -> bool:
+    return multiprocessing.parent_process() is not None
+
+
+def get_queue():
+    """ The queue of this process, started in the owner on first use, None in a worker that is not attached yet. """
+    with _lock:
+        if _state['queue'] is None and not _is_worker():
+            _start()
+        return _state['queue']
+
+
+def attach(queue, level: int = None, worker_id: int = None) -> None:
+    """ Worker initializer: send the records of this process to queue, the one of the owner process. No listener
+    and no file handler is started here. worker_id is the argument of DataLoader's worker_init_fn, unused.
+    """
+    with _lock:
+        _state['queue'] = queue
+        if level is not None:
+            _state['level'] = level
+            for logger in _loggers.values():
+                logger.setLevel(level)
+        pending, _state['pending'] = _state['pending'], []
+    for record in pending:
+        queue.put_nowait(record)
+
+
+def worker_init():
+    """ Initializer for process pools and DataLoaders whose workers may be spawned, see the module docstring """
+    return functools.partial(attach, get_queue(), _state['level'])
+
+
+def get_logger(filename: str, name: str = None, level: int = None, json_lines: bool = None) -> logging.Logger:
+    """ Logger writing to filename through the queue. Calling it again for the same name returns the
+    same logger without adding a second handler; a json_lines given again replaces the earlier one.
+    """
+    with _lock:
+        if _state['queue'] is None and not _is_worker():
+            _start()
+        logger = logging.getLogger(name)
+        logger.setLevel(level if level is not None else _state['level'])
+        handlers = [handler for handler in logger.handlers
+                    if isinstance(handler, _FileQueueHandler) and handler.log_file == filename]
+        if not handlers:
+            logger.addHandler(_FileQueueHandler(_state['queue'], filename, json_lines))
+        elif json_lines is not None:
+            handlers[0].json_lines = json_lines
+        _loggers[name] = logger
+        return logger
+
+
+def configure_logging(level="DEBUG", json_lines: bool = False) -> None:
+    """ Set the level of all loggers created by get_logger (and of later ones) and toggle JSON lines output. """
+    level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    _state['level'] = level
+    _state['json_lines'] = json_lines
+    for logger in _loggers.values():
+        logger.setLevel(level)
@@ -0,0 +1,112 @@
+"""Segmentation metrics from one streaming confusion matrix.
+
+    confusion = ConfusionMatrix(cfg.num_classes)
+    for preds, labels in batches:
+        confusion.update(preds, labels)  # numpy arrays or torch tensors, on any device
+    metrics = confusion.metrics()
+
+Every update is one bincount of labels * C + preds into a C x C int64 matrix (rows: true class,
+columns: predicted class); torch tensors are counted on their device and only the C x C result
+is copied back. Partial matrices of shards or workers are merged by adding them. All metrics are
+derived from the matrix in O(C^2), nothing per point is kept.
+
+Classes absent from the split (no true points) have no accuracy or recall (NaN) and no weight in
+the weighted averages; their precision, F1 and IoU are 0 if they were predicted (false positives
+only) and NaN if not. Means over classes skip NaN.
+"""
+import numpy as np
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """ numerator / denominator, NaN where the denominator is 0 """
+    out = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _nanmean(values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else float("nan")
+
+
+class ConfusionMatrix:
+    """
+    Attributes:
+        num_classes (int): C, labels and predictions must be in [0, C).
+        ignore_index (int): label of points that are not counted, e.g. unlabeled, None counts all.
+        matrix (np.ndarray): (C, C) int64, matrix[true, predicted].
+    """
+    def __init__(self, num_classes: int, ignore_index: int = None):
+        self.num_classes = num_classes
+        self.ignore_index = ignore_index
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, preds, labels) -> None:
+        """ Count one batch of predicted and true class indices (any shape, flattened) """
+        c = self.num_classes
+        if hasattr(labels, "bincount"):
+            # torch: counted on the device of the batch
+            labels, preds = labels.reshape(-1).long(), preds.reshape(-1).long()
+        else:
+            labels, preds = np.asarray(labels).reshape(-1).astype(np.int64), np.asarray(preds).reshape(-1).astype(np.int64)
+        if len(labels) != len(preds):
+            raise ValueError(f"Got {len(preds)} predictions but {len(labels)} labels")
+        if self.ignore_index is not None:
+            keep = labels != self.ignore_index
+            labels, preds = labels[keep], preds[keep]
+        if len(labels) and (min(labels.min(), preds.min()) < 0 or max(labels.max(), preds.max()) >= c):
+            raise ValueError(f"Class indices must be in [0, {c})")
+        keys = labels * c + preds
+        if hasattr(keys, "bincount"):
+            counts = keys.bincount(minlength=c * c).cpu().numpy()
+        else:
+            counts = np.bincount(keys, minlength=c * c)
+        self.matrix += counts.reshape(c, c)
+
+    def merge(self, other) -> "ConfusionMatrix":
+        """ Add the counts of another matrix (a ConfusionMatrix or a (C, C) array) of the same classes """
+        matrix = other.matrix if isinstance(other, ConfusionMatrix) else np.asarray(other)
+        if matrix.shape != self.matrix.shape:
+            raise ValueError(f"Cannot merge a {matrix.shape} confusion matrix into a {self.matrix.shape} one")
+        self.matrix += matrix
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    @classmethod
+    def from_matrix(cls, matrix, ignore_index: int = None) -> "ConfusionMatrix":
+        confusion = cls(len(matrix), ignore_index)
+        return confusion.merge(matrix)
+
+    def metrics(self) -> dict:
+        """ Accuracy, per-class accuracy, weighted precision/recall/F1 and IoU, see the module docstring """
+        matrix = self.matrix.astype(np.float64)
+        tp = np.diag(matrix)
+        support = matrix.sum(axis=1)  # true points per class
+        predicted = matrix.sum(axis=0)
+        present = support > 0
+
+        recall = _ratio(tp, support)
+        precision = _ratio(tp, predicted)
+        precision[present & (predicted == 0)] = 0.0  # present but never predicted
+        f1 = _ratio(2 * tp, support + predicted)
+        iou = _ratio(tp, support + predicted - tp)
+        total = support.sum()
+
+        def weighted(values):
+            return float(np.sum(np.nan_to_num(values[present]) * support[present]) / total) if total else float("nan")
+
+        return {
+            'accuracy': float(tp.sum() / total) if total else float("nan"),
+            'per_class_accuracy': recall,
+            'overall_accuracy': _nanmean(recall),  # mean over the present classes
+            'precision': weighted(precision),
+            'recall': weighted(recall),
+            'f1_score': weighted(f1),
+            'per_class_precision': precision,
+            'per_class_f1': f1,
+            'iou': iou,
+            'mean_iou': _nanmean(iou),
+            'support': support.astype(np.int64),
+        }
@@ -0,0 +1,221 @@
+"""Native reader for PCD files (ascii, binary and binary_compressed) into structured NumPy arrays.
+
+binary payloads are memory-mapped as they are, so reading a field subset or a strided sample
+only touches those bytes. binary_compressed payloads (one LZF block holding the fields one
+after the other) are decompressed in one call with the python-lzf C extension when it is
+installed, otherwise as a stream by a pure Python decoder that keeps only the fields that were
+asked for (bounded memory, but about 100 times slower). The packed rgb field is unpacked with
+unpack_rgb.
+
+    python utils/pcd_reader.py scan.pcd --fields x y z rgb --step 100 --show
+"""
+import argparse
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+try:
+    import lzf
+except ImportError:
+    lzf = None
+
+PCD_TYPES = {"F": "f", "I": "i", "U": "u"}
+CHUNK_BYTES = 64 * 1024 * 1024
+_LZF_WINDOW = 8192  # largest back reference of LZF
+
+
+def read_pcd_header(pcd_file) -> dict:
+    """ Parse the header lines, returning them by keyword plus 'dtype' (one record) and 'data_offset'. """
+    header = {}
+    with open(pcd_file, "rb") as f:
+        while "data" not in header:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{pcd_file} has no DATA line, not a PCD file")
+            tokens = line.decode("ascii", errors="replace").split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+            header[tokens[0].lower()] = tokens[1:]
+        data_offset = f.tell()
+
+    fields, sizes, types = header["fields"], header["size"], header["type"]
+    counts = header.get("count", ["1"] * len(fields))
+    names = []
+    for i, name in enumerate(fields):
+        # padding fields are all called "_"
+        names.append(f"_{i}" if name == "_" or name in names else name)
+    dtype = np.dtype([(name, f"<{PCD_TYPES[kind]}{size}", (int(count),) if int(count) > 1 else ())
+                      for name, size, kind, count in zip(names, sizes, types, counts)])
+    points = int(header["points"][0]) if "points" in header else int(header["width"][0]) * int(header["height"][0])
+    return {
+        "version": header.get("version", [""])[0],
+        "fields": names,
+        "width": int(header["width"][0]),
+        "height": int(header["height"][0]),
+        "viewpoint": [float(v) for v in header.get("viewpoint", [0, 0, 0, 1, 0, 0, 0])],
+        "points": points,
+        "data": header["data"][0].lower(),
+        "dtype": dtype,
+        "data_offset": data_offset,
+    }
+
+
+def unpack_rgb(rgb: np.ndarray) -> np.ndarray:
+    """ Packed rgb field (float32 or uint32 holding 0x00RRGGBB) -> (n, 3) uint8 """
+    packed = np.ascontiguousarray(rgb).view(np.uint32).reshape(-1)
+    colors = np.empty((len(packed), 3), dtype=np.uint8)
+    colors[:, 0] = packed >> 16
+    colors[:, 1] = packed >> 8
+    colors[:, 2] = packed
+    return colors
+
+
+def lzf_chunks(data, chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """ Decompress an LZF block as consecutive pieces of about chunk_bytes, holding at most one piece in memory. """
+    out = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        ctrl = data[i]
+        i += 1
+        if ctrl < 32:
+            # literal run of ctrl + 1 bytes
+            out += data[i:i + ctrl + 1]
+            i += ctrl + 1
+            if i > n:
+                raise ValueError("Truncated LZF literal run")
+        else:
+            length = ctrl >> 5
+            if length == 7:
+                length += data[i]
+                i += 1
+            length += 2
+            distance = ((ctrl & 0x1F) << 8) + data[i] + 1
+            i += 1
+            start = len(out) - distance
+            if start < 0:
+                raise ValueError("Invalid LZF back reference")
+            if distance >= length:
+                out += out[start:start + length]
+            else:
+                # overlapping copy, the last `distance` bytes repeat
+                period = bytes(out[start:])
+                out += (period * (length // distance + 1))[:length]
+        if len(out) >= chunk_bytes + _LZF_WINDOW:
+            yield bytes(out[:-_LZF_WINDOW])
+            del out[:-_LZF_WINDOW]
+    yield bytes(out)
+
+
+def _read_compressed(pcd_file, header: dict, fields: Sequence[str], chunk_bytes: int) -> dict:
+    """ {field: (points, ...) array} of the requested fields of a binary_compressed file """
+    dtype, points = header["dtype"], header["points"]
+    with open(pcd_file, "rb") as f:
+        f.seek(header["data_offset"])
+        compressed_size, uncompressed_size = np.frombuffer(f.read(8), dtype="<u4")
+        data = f.read(int(compressed_size))
+    if uncompressed_size != dtype.itemsize * points:
+        raise ValueError(f"{pcd_file}: uncompressed size {uncompressed_size} != {points} points * {dtype.itemsize} bytes")
+
+    # the decompressed payload stores every field for all points, one field after the other
+    ranges, offset = {}, 0
+    for name in dtype.names:
+        nbytes = dtype[name].itemsize * points
+        if name in fields:
+            ranges[name] = (offset, offset + nbytes)
+        offset += nbytes
+    if lzf is not None:
+        payload = lzf.decompress(data, int(uncompressed_size))
+        return {name: np.frombuffer(payload, dtype=dtype[name].base, count=(end - start) // dtype[name].base.itemsize,
+                                    offset=start).reshape((points,) + dtype[name].shape)
+                for name, (start, end) in ranges.items()}
+
+    buffers = {name: bytearray(end - start) for name, (start, end) in ranges.items()}
+    last = max((end for _, end in ranges.values()), default=0)
+
+    position = 0
+    for chunk in lzf_chunks(data, chunk_bytes):
+        chunk_end = position + len(chunk)
+        for name, (start, end) in ranges.items():
+            low, high = max(start, position), min(end, chunk_end)
+            if low < high:
+                buffers[name][low - start:high - start] = chunk[low - position:high - position]
+        position = chunk_end
+        if position >= last:
+            break
+    return {name: np.frombuffer(buffer, dtype=dtype[name].base).reshape((points,) + dtype[name].shape)
+            for name, buffer in buffers.items()}
+
+
+def read_pcd(pcd_file, fields: Optional[Sequence[str]] = None, step: int = 1, mmap: bool = True,
+             chunk_bytes: int = CHUNK_BYTES) -> np.ndarray:
+    """ Read a PCD file as a structured array with one record per point.
+    Args:
+        fields: field names to keep, default all
+        step: keep every step-th point only, e.g. for previews and reports
+        mmap: for DATA binary return the read-only memory map itself when all fields of every point are read
+        chunk_bytes: decompressed bytes held at a time for DATA binary_compressed without python-lzf
+    """
+    header = read_pcd_header(pcd_file)
+    dtype, points = header["dtype"], header["points"]
+    fields = list(fields) if fields is not None else list(dtype.names)
+    unknown = set(fields) - set(dtype.names)
+    if unknown:
+        raise ValueError(f"{pcd_file} has no fields {sorted(unknown)}, available: {dtype.names}")
+    out_dtype = np.dtype([(name, dtype[name]) for name in fields])
+
+    if header["data"] == "binary":
+        records = np.memmap(pcd_file, dtype=dtype, mode="r", offset=header["data_offset"], shape=(points,))
+        if mmap and step == 1 and fields == list(dtype.names):
+            return records
+        columns = {name: records[name][::step] for name in fields}
+    elif header["data"] == "binary_compressed":
+        columns = {name: array[::step] for name, array in _read_compressed(pcd_file, header, fields, chunk_bytes).items()}
+    elif header["data"] == "ascii":
+        with open(pcd_file, "rb") as f:
+            header_lines = f.read(header["data_offset"]).count(b"\n")
+        flat = np.loadtxt(pcd_file, skiprows=header_lines, max_rows=points, ndmin=2, dtype=np.float64)[::step]
+        columns, column = {}, 0
+        for name in dtype.names:
+            width = int(np.prod(dtype[name].shape, dtype=int))
+            if name in fields:
+                values = flat[:, column:column + width].reshape((-1,) + dtype[name].shape)
+                if name == "rgb" and dtype[name].kind == "f":
+                    # packed rgb is written as the float with the same bits, read it as such
+                    values = values.astype(np.float32)
+                columns[name] = values
+            column += width
+    else:
+        raise ValueError(f"{pcd_file}: unsupported DATA {header['data']}")
+
+    out = np.empty(len(next(iter(columns.values()))) if columns else 0, dtype=out_dtype)
+    for name, values in columns.items():
+        out[name] = values
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or preview a PCD file without loading all of it")
+    parser.add_argument("pcd_file")
+    parser.add_argument("--fields", nargs="+", default=None)
+    parser.add_argument("--step", type=int, default=1, help="read every step-th point")
+    parser.add_argument("--show", action="store_true", help="display the (sampled) points with open3d")
+    args = parser.parse_args()
+
+    header = read_pcd_header(args.pcd_file)
+    print({key: value for key, value in header.items() if key != "dtype"})
+    records = read_pcd(args.pcd_file, fields=args.fields, step=args.step)
+    for name in records.dtype.names:
+        values = records[name]
+        print(f"{name:>12}: {values.dtype} min {np.nanmin(values)} max {np.nanmax(values)}")
+    if args.show:
+        import open3d as o3d
+        records = read_pcd(args.pcd_file, step=args.step)
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(np.column_stack([records["x"], records["y"], records["z"]]))
+        if "rgb" in records.dtype.names:
+            pcd.colors = o3d.utility.Vector3dVector(unpack_rgb(records["rgb"]) / 255.0)
+        o3d.visualization.draw_geometries([pcd])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Raw data report of PCD and ASC files: zeros, NaNs, infinite values, min/max and mean per column.
+
+    python utils/raw_report.py data/raw --log-dir logs --workers 4
+
+Every file is streamed in chunks (byte ranges of an ASC file, row slices of the memory-mapped
+PCD data), the statistics of a chunk are vectorized reductions over a (rows, columns) float64
+matrix and the per-chunk results are merged, so memory is bounded by the chunk size whatever the
+file size. Files are reported in parallel in a process pool, largest first. For every file the
+text log of the former asc_report.py / pcd_report.py is written (<stem>_asc_log.log,
+<name>.pcd_report.log) plus the same content as <log name>.json, and all reports together go
+to raw_report.json in the log directory (raw_report_asc.json / raw_report_pcd.json for the
+single format scripts, so running both into one log directory keeps both).
+
+With --step only every step-th row of a file is reported, counted over the whole file whatever
+the chunk size; 'points' is the number of rows of the file, 'sampled_points' the reported ones.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from asc_reader import iter_asc_chunks, ASC_FIELDS, CHUNK_BYTES
+from pcd_reader import read_pcd, read_pcd_header, unpack_rgb
+
+
+def chunk_stats(matrix: np.ndarray) -> dict:
+    """ Per column statistics of one (rows, columns) float64 chunk """
+    finite = np.isfinite(matrix)
+    finite_values = np.where(finite, matrix, 0.0)
+    return {
+        'count': np.full(matrix.shape[1], len(matrix), dtype=np.int64),
+        'zeros': np.count_nonzero(matrix == 0.0, axis=0),
+        'nans': np.count_nonzero(np.isnan(matrix), axis=0),
+        'infs': np.count_nonzero(np.isinf(matrix), axis=0),
+        'finite': np.count_nonzero(finite, axis=0),
+        'min': np.where(finite, matrix, np.inf).min(axis=0, initial=np.inf),
+        'max': np.where(finite, matrix, -np.inf).max(axis=0, initial=-np.inf),
+        'sum': finite_values.sum(axis=0),
+    }
+
+
+def merge_stats(first: dict, second: dict) -> dict:
+    """ Statistics of two chunks together, either may be None """
+    if first is None or second is None:
+        return first if second is None else second
+    merged = {name: first[name] + second[name] for name in ("count", "zeros", "nans", "infs", "finite", "sum")}
+    merged['min'] = np.minimum(first['min'], second['min'])
+    merged['max'] = np.maximum(first['max'], second['max'])
+    return merged
+
+
+def column_report(names, stats: dict) -> dict:
+    """ {column: {count, zeros, nans, infs, min, max, mean}}, min/max/mean None without finite values """
+    report = {}
+    for i, name in enumerate(names):
+        has_finite = stats is not None and stats['finite'][i] > 0
+        report[name] = {
+            'count': int(stats['count'][i]) if stats is not None else 0,
+            'zeros': int(stats['zeros'][i]) if stats is not None else 0,
+            'nans': int(stats['nans'][i]) if stats is not None else 0,
+            'infs': int(stats['infs'][i]) if stats is not None else 0,
+            'min': float(stats['min'][i]) if has_finite else None,
+            'max': float(stats['max'][i]) if has_finite else None,
+            'mean': float(stats['sum'][i] / stats['finite'][i]) if has_finite else None,
+        }
+    return report
+
+
+def _pcd_columns(records) -> tuple:
+    """ Column names and the (rows, columns) float64 matrix of PCD records, rgb unpacked into r, g, b """
+    names, columns = [], []
+    for name in records.dtype.names:
+        if name.startswith("_"):
+            continue  # padding
+        values = records[name]
+        if name == "rgb":
+            colors = unpack_rgb(values)
+            names += ["r", "g", "b"]
+            columns += [colors[:, 0], colors[:, 1], colors[:, 2]]
+        elif values.ndim > 1:
+            values = values.reshape(len(values), -1)
+            names += [f"{name}[{i}]" for i in range(values.shape[1])]
+            columns += list(values.T)
+        else:
+            names.append(name)
+            columns.append(values)
+    matrix = np.empty((len(records), len(columns)), dtype=np.float64)
+    for i, column in enumerate(columns):
+        matrix[:, i] = column
+    return names, matrix
+
+
+def iter_pcd_chunks(pcd_file, chunk_points: int, step: int = 1):
+    """ Row slices of the PCD records: views of the memory map for DATA binary, of the decoded data otherwise """
+    records = read_pcd(pcd_file, step=step)
+    for start in range(0, len(records), chunk_points):
+        yield records[start:start + chunk_points]
+
+
+def report_file(path, chunk_bytes: int = CHUNK_BYTES, step: int = 1) -> dict:
+    """ Report of one .pcd or .asc file, {'file', 'format', 'columns', ...} or {'file', 'error'} """
+    start = time.perf_counter()
+    try:
+        if path.endswith(".asc"):
+            stats, names, rows = None, None, 0
+            for records in iter_asc_chunks(path, dtypes=dict.fromkeys(ASC_FIELDS, np.float64), chunk_bytes=chunk_bytes):
+                # report on the raw values, no narrowing to the storage dtypes
+                names = list(records.dtype.names)
+                matrix = np.column_stack([records[name] for name in names]).astype(np.float64, copy=False)
+                # every step-th row of the file: the stride continues from the previous chunk
+                stats = merge_stats(stats, chunk_stats(matrix[(-rows) % step::step]))
+                rows += len(matrix)
+            report = {'format': "asc", 'points': rows, 'step': step, 'columns': column_report(names or [], stats)}
+        else:
+            header = read_pcd_header(path)
+            chunk_points = max(1, chunk_bytes // max(header["dtype"].itemsize, 1))
+            stats, names, first_rows = None, [], None
+            for records in iter_pcd_chunks(path, chunk_points, step):
+                first_rows = str(records[:3]) if first_rows is None else first_rows
+                names, matrix = _pcd_columns(records)
+                stats = merge_stats(stats, chunk_stats(matrix))
+            report = {'format': "pcd", 'points': header["points"], 'data': header["data"], 'fields': header["fields"],
+                      'step': step, 'first_rows': first_rows, 'columns': column_report(names, stats)}
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}", 'seconds': time.perf_counter() - start}
+    sampled = int(stats['count'][0]) if stats is not None and len(stats['count']) else 0
+    return dict(report, sampled_points=sampled, file=path, seconds=time.perf_counter() - start)
+
+
+def log_file_name(path) -> str:
+    """ The log names of the former report scripts """
+    file_name = os.path.basename(path)
+    if path.endswith(".asc"):
+        return f"{os.path.splitext(file_name)[0]}_asc_log.log"
+    return f"{file_name}_report.log"
+
+
+def write_text_log(report: dict, log_file) -> None:
+    with open(log_file, "w") as f:
+        if 'error' in report:
+            f.write(f"Error loading {report['file']}: {report['error']}\n")
+            return
+        if report['format'] == "pcd":
+            f.write(f"PCD file information for '{report['file']}':\n")
+            f.write(f"{report['points']} points, DATA {report['data']}, fields {report['fields']}, "
+                    f"every {report['step']}. point read\n")
+            f.write("First three rows:\n")
+            f.write(f"{report['first_rows']}\n")
+        else:
+            f.write(f"File: {report['file']}\n")
+            f.write(f"{report['points']} points, every {report['step']}. point read\n")
+        for name, column in report['columns'].items():
+            f.write(f"Number of zeros found in {name}: {column['zeros']}\n")
+            f.write(f"Number of NaNs found in {name}: {column['nans']}\n")
+            f.write(f"Number of infinite values found in {name}: {column['infs']}\n")
+            if column['min'] is not None:
+                f.write(f"Min and max values for {name}: {column['min']}, {column['max']}\n")
+        f.write("Done writing to file\n")
+
+
+def find_files(paths) -> list:
+    """ .pcd and .asc files among paths, directories are searched recursively """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in names if name.endswith((".pcd", ".asc"))]
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def run(paths, log_dir, workers: int = 1, chunk_bytes: int = CHUNK_BYTES, step: int = 1,
+        report_name: str = "raw_report.json") -> list:
+    """ Report every file in paths, write the per-file logs and report_name to log_dir, return the reports """
+    files = find_files(paths)
+    os.makedirs(log_dir, exist_ok=True)
+    # largest first, so one huge scan does not start last
+    order = sorted(range(len(files)), key=lambda i: os.path.getsize(files[i]), reverse=True)
+    reports = [None] * len(files)
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(report_file, files[i], chunk_bytes, step) for i in order}
+            for i, future in futures.items():
+                reports[i] = future.result()
+    else:
+        for i in order:
+            reports[i] = report_file(files[i], chunk_bytes, step)
+
+    for report in reports:
+        log_file = os.path.join(log_dir, log_file_name(report['file']))
+        write_text_log(report, log_file)
+        with open(os.path.splitext(log_file)[0] + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+    with open(os.path.join(log_dir, report_name), "w") as f:
+        json.dump(reports, f, indent=2)
+    return reports
+
+
+def main(argv=None, default_suffix=None):
+    parser = argparse.ArgumentParser(description="Zeros, NaNs, infinite values and ranges of raw PCD/ASC files")
+    parser.add_argument("paths", nargs="*", default=["data/raw"], help="files or directories, default data/raw")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--workers", type=int, default=1, help="files reported in parallel")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20, help="input read per chunk")
+    parser.add_argument("--step", type=int, default=1, help="report every step-th point only")
+    args = parser.parse_args(argv)
+
+    paths, report_name = args.paths, "raw_report.json"
+    if default_suffix is not None:
+        # asc_report.py / pcd_report.py: one format only, with a report of its own
+        paths = [path for path in find_files(paths) if path.endswith(default_suffix)]
+        report_name = f"raw_report_{default_suffix.lstrip('.')}.json"
+    reports = run(paths, args.log_dir, args.workers, int(args.chunk_mb * 2**20), args.step, report_name)
+    for report in reports:
+        status = report.get('error') or (f"{report['points']} points ({report['sampled_points']} reported), "
+                                         f"{len(report['columns'])} columns")
+        print(f"{report['file']}: {status} ({report['seconds']:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Versioned, memory-mappable on-disk format for preprocessed scenes.
+
+Layout of a .scene file:
+    8 bytes   magic b"RPTUSCN\\0"
+    4 bytes   format version (uint32, little endian)
+    4 bytes   header length in bytes (uint32, little endian)
+    header    JSON: {"arrays": {name: {"dtype", "shape", "offset"}}, "meta": {...}}
+    payload   C-contiguous arrays, each starting on a 64-byte boundary
+
+read_scene maps every array with np.memmap, so opening a scene costs no resident memory until
+its pages are touched. Convert existing pickles with:
+    python utils/scene_format.py data/preprocessed/train data/preprocessed/val
+"""
+import argparse
+import json
+import os
+import pickle
+import struct
+from pathlib import Path
+
+import numpy as np
+
+SCENE_MAGIC = b"RPTUSCN\0"
+SCENE_VERSION = 1
+SCENE_SUFFIX = ".scene"
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_scene(scene_file, arrays: dict, meta: dict = None) -> None:
+    """ Write named arrays (and JSON serializable metadata) to scene_file, atomically. """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise TypeError(f"Array '{name}' has dtype {array.dtype}, object arrays can not be memory-mapped")
+
+    # offsets depend on the header length and vice versa, iterate until the header fits
+    header_len = 0
+    while True:
+        offset = _align(_PREAMBLE.size + header_len)
+        entries = {}
+        for name, array in arrays.items():
+            entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _align(offset + array.nbytes)
+        header = json.dumps({"arrays": entries, "meta": meta or {}}).encode()
+        if len(header) <= header_len:
+            break
+        header_len = len(header)
+    header = header.ljust(header_len)
+
+    tmp_file = f"{scene_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(_PREAMBLE.pack(SCENE_MAGIC, SCENE_VERSION, header_len))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(entries[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(offset)
+    os.replace(tmp_file, scene_file)
+
+
+def read_scene_header(scene_file) -> dict:
+    with open(scene_file, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != SCENE_MAGIC:
+            raise ValueError(f"{scene_file} is not a scene file")
+        if version > SCENE_VERSION:
+            raise ValueError(f"{scene_file} has format version {version}, this reader supports up to {SCENE_VERSION}")
+        header = json.loads(f.read(header_len))
+    header["version"] = version
+    return header
+
+
+def read_scene(scene_file, mmap: bool = True) -> dict:
+    """ Open a scene as {name: array}, memory-mapped read-only unless mmap=False. """
+    header = read_scene_header(scene_file)
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+        if mmap and int(np.prod(shape)) > 0:
+            arrays[name] = np.memmap(scene_file, dtype=dtype, mode="r", offset=entry["offset"], shape=shape)
+        else:
+            arrays[name] = np.fromfile(scene_file, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=entry["offset"]).reshape(shape)
+    return arrays
+
+
+def convert_pkl(pkl_file, scene_file=None, remove: bool = False) -> str:
+    """ Convert a *_preprocessed.pkl dict of arrays to a .scene file next to it. """
+    scene_file = scene_file or str(Path(pkl_file).with_suffix(SCENE_SUFFIX))
+    with open(pkl_file, "rb") as f:
+        data = pickle.load(f)
+    arrays = {name: value for name, value in data.items() if isinstance(value, np.ndarray)}
+    meta = {name: value for name, value in data.items() if name not in arrays}
+    write_scene(scene_file, arrays, meta=meta)
+    if remove:
+        os.remove(pkl_file)
+    return scene_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert preprocessed .pkl files to the .scene format")
+    parser.add_argument("paths", nargs="+", help=".pkl files or directories containing them")
+    parser.add_argument("--remove", action="store_true", help="delete each .pkl after a successful conversion")
+    args = parser.parse_args()
+
+    for path in map(Path, args.paths):
+        pkl_files = sorted(path.glob("*.pkl")) if path.is_dir() else [path]
+        for pkl_file in pkl_files:
+            print(f"{pkl_file} -> {convert_pkl(pkl_file, remove=args.remove)}")
+
+
+if __name__ == "__main__":
+    main()
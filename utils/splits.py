@@ -0,0 +1,154 @@
+"""Train / val / test splits as a manifest of scene names instead of copies of the raw files.
+
+The manifest is a small JSON file; preprocessing and PointCloudDataset resolve scene names
+against the raw and preprocessed directories, nothing is copied. Tools that need one
+directory per split get hardlinks or symlinks from materialize().
+
+With per-scene label histograms the assignment is stratified (iterative stratification on
+class presence): scenes holding the rarest class are placed first, each into a split that does
+not have that class yet, else into the one that misses most of it. Every class present in at
+least as many scenes as there are splits reaches every split (as long as the splits have room)
+while the split sizes follow the ratios.
+"""
+import json
+import os
+import shutil
+from typing import Optional, Sequence
+
+import numpy as np
+
+MANIFEST_VERSION = 1
+MATERIALIZE_MODES = ("symlink", "hardlink", "copy")
+
+
+def split_sizes(num_scenes: int, ratios: dict) -> dict:
+    """ Scenes per split, rounded by largest remainder so that they sum to num_scenes """
+    exact = {split: ratio * num_scenes for split, ratio in ratios.items()}
+    sizes = {split: int(np.floor(value)) for split, value in exact.items()}
+    for split in sorted(exact, key=lambda split: sizes[split] - exact[split])[:num_scenes - sum(sizes.values())]:
+        sizes[split] += 1
+    return sizes
+
+
+def _presence(histograms, num_scenes: int) -> np.ndarray:
+    """ (scenes, classes) bool, True where a scene has at least one point of a class """
+    num_classes = max((len(histogram) for histogram in histograms if histogram), default=0)
+    presence = np.zeros((num_scenes, num_classes), dtype=bool)
+    for i, histogram in enumerate(histograms):
+        if histogram:
+            presence[i, :len(histogram)] = np.asarray(histogram) > 0
+    return presence
+
+
+def assign_splits(names: Sequence[str], ratios: dict, seed: Optional[int] = None, shuffle: bool = True,
+                  histograms: Optional[Sequence] = None) -> dict:
+    """ {split: [scene names]} with split sizes by ratios.
+    Args:
+        shuffle: random assignment, otherwise consecutive runs of names (ignored when stratified)
+        histograms: per scene label histogram (counts by class index) to stratify by, None entries are allowed
+    """
+    assert abs(sum(ratios.values()) - 1.0) < 1e-9, "The ratios must add up to 1.0."
+    splits = list(ratios)
+    remaining = split_sizes(len(names), ratios)
+    rng = np.random.default_rng(seed)
+
+    if histograms is None:
+        order = rng.permutation(len(names)) if shuffle else np.arange(len(names))
+        assignment, start = {}, 0
+        for split in splits:
+            assignment[split] = [names[i] for i in order[start:start + remaining[split]]]
+            start += remaining[split]
+        return assignment
+
+    presence = _presence(histograms, len(names))
+    ratio = np.array([ratios[split] for split in splits])
+    # scenes of each class every split should still receive
+    wanted = ratio[:, None] * presence.sum(axis=0)[None, :]
+    have = np.zeros(wanted.shape, dtype=np.int64)
+    left = np.array([remaining[split] for split in splits], dtype=np.float64)
+    assigned = np.full(len(names), -1)
+
+    def place(scene, cls=None):
+        candidates = np.flatnonzero(left > 0) if (left > 0).any() else np.arange(len(splits))
+        classes = presence[scene]
+        if cls is not None:
+            absent, need = (have[candidates, cls] == 0).astype(np.float64), wanted[candidates, cls]
+        else:
+            absent, need = np.zeros(len(candidates)), np.zeros(len(candidates))
+        # a split without the class being placed first, then the one missing most of it, then most free places
+        keys = np.lexsort((rng.random(len(candidates)), -left[candidates], -need, -absent))
+        split = candidates[keys[0]]
+        assigned[scene] = split
+        wanted[split] -= classes
+        have[split] += classes
+        left[split] -= 1
+
+    unassigned_presence = presence.copy()
+    while unassigned_presence.any():
+        counts = unassigned_presence.sum(axis=0)
+        rarest = np.flatnonzero(counts == counts[counts > 0].min())
+        cls = rarest[rng.integers(len(rarest))]
+        for scene in rng.permutation(np.flatnonzero(unassigned_presence[:, cls])):
+            place(scene, cls)
+            unassigned_presence[scene] = False
+    for scene in rng.permutation(np.flatnonzero(assigned < 0)):
+        # scenes without labels only fill up the sizes
+        place(scene)
+    return {split: [name for name, s in zip(names, assigned) if s == i] for i, split in enumerate(splits)}
+
+
+def class_presence(assignment: dict, histograms_by_name: dict) -> dict:
+    """ {split: {class: number of scenes with that class}} """
+    presence = {}
+    for split, names in assignment.items():
+        counts = {}
+        for name in names:
+            for label, count in enumerate(histograms_by_name.get(name) or []):
+                if count:
+                    counts[label] = counts.get(label, 0) + 1
+        presence[split] = dict(sorted(counts.items()))
+    return presence
+
+
+def write_manifest(manifest_file, assignment: dict, **meta) -> dict:
+    manifest = dict(version=MANIFEST_VERSION, **meta, splits=assignment)
+    directory = os.path.dirname(manifest_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{manifest_file}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_file}.tmp", manifest_file)
+    return manifest
+
+
+def read_manifest(manifest_file) -> dict:
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{manifest_file}: unsupported split manifest version {manifest.get('version')}")
+    return manifest
+
+
+def split_scenes(manifest: dict, split: Optional[str] = None) -> set:
+    """ Scene names of one split, or of all splits """
+    if split is None:
+        return {name for names in manifest["splits"].values() for name in names}
+    if split not in manifest["splits"]:
+        raise KeyError(f"Split '{split}' not in manifest, available: {list(manifest['splits'])}")
+    return set(manifest["splits"][split])
+
+
+def materialize(files: Sequence[str], out_dir, mode: str = "symlink") -> None:
+    """ Make files appear in out_dir under their own names, as symlinks, hardlinks (same file system only) or copies """
+    assert mode in MATERIALIZE_MODES, f"Invalid mode {mode}. Must be one of {MATERIALIZE_MODES}"
+    os.makedirs(out_dir, exist_ok=True)
+    for src in files:
+        dst = os.path.join(out_dir, os.path.basename(src))
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if mode == "symlink":
+            os.symlink(os.path.abspath(src), dst)
+        elif mode == "hardlink":
+            os.link(src, dst)
+        else:
+            shutil.copy2(src, dst)
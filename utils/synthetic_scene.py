@@ -0,0 +1,175 @@
+"""Deterministic synthetic labeled scans written as matching PCD + ASC pairs.
+
+A scene is a room (floor, ceiling, four walls) with boxes standing on the floor, cylindrical
+columns and a little clutter, sampled at a uniform surface density with Gaussian noise, i.e.
+roughly what a terrestrial laser scan of an office floor looks like. The room grows with the
+point count, so the density stays realistic from 100K to 50M points. The same (num_points,
+seed) always gives the same files; points are generated in fixed chunks, each from its own
+seeded generator, so memory stays bounded for large scenes.
+
+Labels: 0 clutter (the 'Invalid' class), 1 floor, 2 ceiling, 3 wall, 4 box, 5 column.
+
+    python utils/synthetic_scene.py data/synthetic --sizes 100000 1000000 --seed 0
+"""
+import argparse
+import os
+
+import numpy as np
+
+CLASS_COLORS = {0: (128, 128, 128), 1: (150, 120, 90), 2: (235, 235, 230), 3: (200, 200, 190), 4: (120, 60, 30), 5: (170, 170, 175)}
+CHUNK_POINTS = 1_000_000
+HEIGHT = 3.0
+CLUTTER_FRACTION = 0.01
+
+
+def scene_layout(num_points: int, seed: int = 0, density: float = 5000.0) -> list:
+    """ Primitives of a room sized for num_points at density points per square meter.
+    Returns:
+        list of (kind, label, params) with kind "plane" (origin, u, v) or "cylinder" (center, radius, z0, z1)
+    """
+    rng = np.random.default_rng(seed)
+    floor_area = max(num_points / density / 2.6, 4.0)  # floor + ceiling + walls + furniture ~ 2.6 floor areas
+    length = np.sqrt(floor_area / 1.5)
+    width = 1.5 * length
+    primitives = [
+        ("plane", 1, (np.array([0.0, 0.0, 0.0]), np.array([width, 0.0, 0.0]), np.array([0.0, length, 0.0]))),
+        ("plane", 2, (np.array([0.0, 0.0, HEIGHT]), np.array([0.0, length, 0.0]), np.array([width, 0.0, 0.0]))),
+        ("plane", 3, (np.array([0.0, 0.0, 0.0]), np.array([0.0, 0.0, HEIGHT]), np.array([width, 0.0, 0.0]))),
+        ("plane", 3, (np.array([0.0, length, 0.0]), np.array([width, 0.0, 0.0]), np.array([0.0, 0.0, HEIGHT]))),
+        ("plane", 3, (np.array([0.0, 0.0, 0.0]), np.array([0.0, length, 0.0]), np.array([0.0, 0.0, HEIGHT]))),
+        ("plane", 3, (np.array([width, 0.0, 0.0]), np.array([0.0, 0.0, HEIGHT]), np.array([0.0, length, 0.0]))),
+    ]
+    for _ in range(max(1, int(floor_area / 10))):
+        size = rng.uniform([0.4, 0.4, 0.4], [2.0, 1.2, 1.2])
+        corner = np.r_[rng.uniform([0, 0], [width - size[0], length - size[1]]), 0.0]
+        dx, dy, dz = np.diag(size)
+        # four sides and the top, outward normals (u x v)
+        primitives += [
+            ("plane", 4, (corner, dx, dz)),
+            ("plane", 4, (corner + dy, dz, dx)),
+            ("plane", 4, (corner, dz, dy)),
+            ("plane", 4, (corner + dx, dy, dz)),
+            ("plane", 4, (corner + dz, dx, dy)),
+        ]
+    for _ in range(max(1, int(floor_area / 30))):
+        radius = rng.uniform(0.15, 0.4)
+        center = rng.uniform([radius, radius], [width - radius, length - radius])
+        primitives.append(("cylinder", 5, (center, radius, 0.0, HEIGHT)))
+    return primitives
+
+
+def _area(kind, params) -> float:
+    if kind == "plane":
+        _, u, v = params
+        return float(np.linalg.norm(np.cross(u, v)))
+    _, radius, z0, z1 = params
+    return 2 * np.pi * radius * (z1 - z0)
+
+
+def _sample(kind, params, count, rng):
+    a, b = rng.random(count), rng.random(count)
+    if kind == "plane":
+        origin, u, v = params
+        normal = np.cross(u, v)
+        normal /= np.linalg.norm(normal)
+        return origin + a[:, None] * u + b[:, None] * v, np.broadcast_to(normal, (count, 3))
+    center, radius, z0, z1 = params
+    theta = 2 * np.pi * a
+    normals = np.column_stack([np.cos(theta), np.sin(theta), np.zeros(count)])
+    points = np.column_stack([center[0] + radius * normals[:, 0], center[1] + radius * normals[:, 1], z0 + (z1 - z0) * b])
+    return points, normals
+
+
+def generate_chunk(layout, num_points: int, chunk_index: int, seed: int = 0, noise: float = 0.003):
+    """ Points number chunk_index * CHUNK_POINTS .. + num_points of the scene.
+    Returns:
+        points (n, 3) float64, colors (n, 3) uint8, normals (n, 3) float32, labels (n,) uint8
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    areas = np.array([_area(kind, params) for kind, _, params in layout])
+    num_clutter = rng.binomial(num_points, CLUTTER_FRACTION)
+    counts = rng.multinomial(num_points - num_clutter, areas / areas.sum())
+
+    points, normals, labels = [], [], []
+    for (kind, label, params), count in zip(layout, counts):
+        if count:
+            p, n = _sample(kind, params, count, rng)
+            points.append(p)
+            normals.append(n)
+            labels.append(np.full(count, label, dtype=np.uint8))
+    room = layout[0][2]
+    high = room[1] + room[2] + np.array([0.0, 0.0, HEIGHT])
+    points.append(rng.random((num_clutter, 3)) * high)
+    clutter_normals = rng.normal(size=(num_clutter, 3))
+    normals.append(clutter_normals / np.linalg.norm(clutter_normals, axis=1, keepdims=True))
+    labels.append(np.zeros(num_clutter, dtype=np.uint8))
+
+    points = np.concatenate(points) + rng.normal(scale=noise, size=(num_points, 3))
+    normals = np.concatenate(normals).astype(np.float32)
+    labels = np.concatenate(labels)
+    base = np.array([CLASS_COLORS[label] for label in range(len(CLASS_COLORS))], dtype=np.float64)
+    colors = np.clip(base[labels] + rng.normal(scale=12.0, size=(num_points, 3)), 0, 255).astype(np.uint8)
+    order = rng.permutation(num_points)  # scanners do not emit points grouped by class
+    return points[order], colors[order], normals[order], labels[order]
+
+
+def iter_scene(num_points: int, seed: int = 0, density: float = 5000.0):
+    """ Yield the scene chunk by chunk, see generate_chunk. """
+    layout = scene_layout(num_points, seed, density)
+    for chunk_index, start in enumerate(range(0, num_points, CHUNK_POINTS)):
+        yield generate_chunk(layout, min(CHUNK_POINTS, num_points - start), chunk_index, seed)
+
+
+def write_pair(pcd_file, asc_file, num_points: int, seed: int = 0, density: float = 5000.0) -> None:
+    """ Write the scene as a binary PCD (x y z normal_x normal_y normal_z rgb) and a matching ASC
+    (x;y;z;r;g;b;label;normal_x;normal_y;normal_z) with the same points in the same order. """
+    record = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("normal_x", "<f4"), ("normal_y", "<f4"),
+                       ("normal_z", "<f4"), ("rgb", "<u4")])
+    header = ("# .PCD v0.7 - Point Cloud Data file format\nVERSION 0.7\n"
+              "FIELDS x y z normal_x normal_y normal_z rgb\nSIZE 4 4 4 4 4 4 4\nTYPE F F F F F F U\n"
+              f"COUNT 1 1 1 1 1 1 1\nWIDTH {num_points}\nHEIGHT 1\nVIEWPOINT 0 0 0 1 0 0 0\n"
+              f"POINTS {num_points}\nDATA binary\n")
+    for path in (pcd_file, asc_file):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{pcd_file}.tmp", "wb") as pcd, open(f"{asc_file}.tmp", "w") as asc:
+        pcd.write(header.encode("ascii"))
+        for points, colors, normals, labels in iter_scene(num_points, seed, density):
+            records = np.empty(len(points), dtype=record)
+            for i, axis in enumerate("xyz"):
+                records[axis] = points[:, i]
+                records[f"normal_{axis}"] = normals[:, i]
+            rgb = colors.astype(np.uint32)
+            records["rgb"] = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+            pcd.write(records.tobytes())
+            np.savetxt(asc, np.column_stack([points, colors, labels, normals]), delimiter=";",
+                       fmt=["%.4f"] * 3 + ["%d"] * 4 + ["%.4f"] * 3)
+    os.replace(f"{pcd_file}.tmp", pcd_file)
+    os.replace(f"{asc_file}.tmp", asc_file)
+
+
+def synthetic_pair_paths(data_dir, num_points: int, seed: int = 0):
+    name = f"synthetic_{num_points}_{seed}"
+    return os.path.join(data_dir, "pcd", f"{name}.pcd"), os.path.join(data_dir, "asc", f"{name}.asc")
+
+
+def ensure_pair(data_dir, num_points: int, seed: int = 0, density: float = 5000.0):
+    """ Paths of the synthetic pair under data_dir/pcd and data_dir/asc, generated if missing. """
+    pcd_file, asc_file = synthetic_pair_paths(data_dir, num_points, seed)
+    if not (os.path.exists(pcd_file) and os.path.exists(asc_file)):
+        write_pair(pcd_file, asc_file, num_points, seed, density)
+    return pcd_file, asc_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic labeled PCD + ASC pairs")
+    parser.add_argument("data_dir", help="pairs go to <data_dir>/pcd and <data_dir>/asc")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=5000.0, help="points per square meter")
+    args = parser.parse_args()
+    for num_points in args.sizes:
+        print(" ".join(ensure_pair(args.data_dir, num_points, args.seed, args.density)))
+
+
+if __name__ == "__main__":
+    main()
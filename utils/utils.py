@@ -3,34 +3,19 @@ import numpy as np
 import open3d as o3d
 import logging
 from typing import Tuple
-from sklearn.metrics import confusion_matrix
 import matplotlib.pyplot as plt
 import os
-import random
-import shutil
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 from config import Config
 from pathlib import Path
+import log_queue
+from log_queue import lazy, worker_init
+from catalog import Catalog, match_pairs
+import splits
+from metrics import ConfusionMatrix
 
 def get_logger(filename: str, name: str = None):
-    log_directory = os.path.dirname(filename)
-    if log_directory and not os.path.exists(log_directory):
-        os.makedirs(log_directory)
-        
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-
-    formatter = logging.Formatter(
-        fmt="%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s",
-        datefmt="%H:%M:%S",
-    )
-
-    file_handler = logging.FileHandler(filename, mode="a")
-    file_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-
-    return logger
+    # queue + listener, see log_queue.py: one file handler per file, workers never write files themselves
+    return log_queue.get_logger(filename, name)
 
 def load_config_file(file_path: str):
     try:
@@ -50,6 +35,7 @@ logger = get_logger('logs/log-utils.txt', __name__)
 config_data = load_config_file("config.yaml")
 if config_data is not None:
     cfg = Config(config_data)
+    log_queue.configure_logging(cfg.log_level, cfg.log_json)
 else:
     logger.error("Error: Configuration not loaded.")
 
@@ -112,11 +98,8 @@ def visualize_point_cloud_with_labels(coordinates, colors, labels, label_colors,
     plt.show()
 
 def calculate_iou(confusion_mtx: np.ndarray) -> Tuple[np.ndarray, float]:
-    intersection = np.diag(confusion_mtx)
-    union = confusion_mtx.sum(axis=0) + confusion_mtx.sum(axis=1) - intersection
-    iou = intersection / union
-    mean_iou = np.mean(iou)
-    return iou, mean_iou
+    metrics = ConfusionMatrix.from_matrix(confusion_mtx).metrics()
+    return metrics['iou'], metrics['mean_iou']
 
 paths = {
     'pcd_files': cfg.pcd_files_path,
@@ -128,82 +111,69 @@ paths = {
 
 # find match based on file names, used for training
 def files_match_making(pcd_files, asc_files):
-    pcd_files = sorted(list(Path(cfg.pcd_files_path).glob('*.pcd')))
-    asc_files = sorted(list(Path(cfg.asc_files_path).glob('*.asc')))
-
-    matched_pairs = []
-    for pcd_file in pcd_files:
-        pcd_file_name = os.path.splitext(os.path.basename(pcd_file))[0]
-        for asc_file in asc_files:
-            asc_file_name = os.path.splitext(os.path.basename(asc_file))[0]
-            if pcd_file_name == asc_file_name:
-                matched_pairs.append((pcd_file, asc_file))
-                break
-        else:
-            print(f"Warning: No corresponding ASC file found for PCD file {pcd_file}.")
+    matched_pairs, unmatched = match_pairs(pcd_files, asc_files)
+    for pcd_file in unmatched:
+        print(f"Warning: No corresponding ASC file found for PCD file {pcd_file}.")
     return matched_pairs
 
 
-def calculate_metrics(all_preds, all_labels):
-    preds = np.concatenate(all_preds)
-    labels = np.concatenate(all_labels)
-
-    accuracy = accuracy_score(labels, preds)
-    precision = precision_score(labels, preds, average='weighted')
-    recall = recall_score(labels, preds, average='weighted')
-    f1 = f1_score(labels, preds, average='weighted')
-    per_class_accuracy = np.diag(confusion_matrix(labels, preds)) / np.bincount(labels)
-    overall_accuracy = np.mean(per_class_accuracy)
-    confusion_mtx = confusion_matrix(labels, preds)
-    iou, mean_iou = calculate_iou(confusion_mtx)
-    
-    return {
-        'accuracy': accuracy,
-        'per_class_accuracy': per_class_accuracy,
-        'overall_accuracy': overall_accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1_score': f1,
-        'iou': iou,
-        'mean_iou': mean_iou
-    }
-
-
-# Split PCD files into training, validation, and test datasets, along with their corresponding ASC files.
-def split_data(paths, ratios, shuffle, random_seed):
-    # Ensure the ratios add up to 1.0
-    assert sum(ratios.values()) == 1.0, "The ratios must add up to 1.0."
-    
-    pcd_files = [f for f in os.listdir(paths['pcd_files']) if f.endswith(".pcd")]
-    
-    if shuffle:
-        random.seed(random_seed)
-        random.shuffle(pcd_files)
-    
-    num_files = len(pcd_files)
-    num_data = {key: int(ratio * num_files) for key, ratio in ratios.items()}
-    num_data['test'] = num_files - num_data['train'] - num_data['val']
-
-    for i, pcd_file in enumerate(pcd_files):
-        src_pcd_path = os.path.join(paths['pcd_files'], pcd_file)
-        base_name = os.path.splitext(pcd_file)[0]
-        src_asc_path = os.path.join(paths['asc_files'], base_name + ".asc")
-        
-        if i < num_data['train']:
-            dst_key = 'train'
-        elif i < num_data['train'] + num_data['val']:
-            dst_key = 'val'
-        else:
-            dst_key = 'test'
-        
-        dst_pcd_path = os.path.join(paths[dst_key], pcd_file)
-        dst_asc_path = os.path.join(paths[dst_key], base_name + ".asc")
-        
-        shutil.copy2(src_pcd_path, dst_pcd_path)
-        shutil.copy2(src_asc_path, dst_asc_path)
-
-        logger.info("Copied %s %s .pcd files to %s", num_data[dst_key], dst_key, dst_pcd_path)
-        logger.info("Copied %s corresponding %s .asc files to %s", num_data[dst_key], dst_key, dst_asc_path)
+def catalog_entries(pcd_dir, asc_dir, workers: int = 1):
+    """ Up to date catalog entries (see catalog.py) of the matched pairs in pcd_dir and asc_dir """
+    with Catalog(cfg.catalog_file) as catalog:
+        entries, changes = catalog.refresh(pcd_dir, asc_dir, workers=workers, with_stats=cfg.catalog_stats,
+                                           asc_cache=cfg.asc_cache, asc_cache_dir=cfg.asc_cache_dir)
+    for pcd_file in changes['unmatched']:
+        logger.warning("No corresponding ASC file found for PCD file %s", pcd_file)
+    for error in changes['errors']:
+        logger.warning("Catalog statistics incomplete: %s", error)
+    logger.info("Catalog %s: %d pairs in %s, %d new or changed, %d removed", cfg.catalog_file, len(entries), pcd_dir,
+                changes['updated'], changes['removed'])
+    return entries
+
+
+# metrics of lists of prediction/label arrays; evaluation streams batches into a metrics.ConfusionMatrix instead
+def calculate_metrics(all_preds, all_labels, num_classes=None):
+    num_classes = num_classes or cfg.num_classes
+    confusion = ConfusionMatrix(num_classes)
+    for preds, labels in zip(all_preds, all_labels):
+        confusion.update(preds, labels)
+    return confusion.metrics()
+
+
+# Split the catalogued scenes into training, validation and test sets, written as a manifest of scene names
+# (see splits.py). Nothing is copied; with materialize ("symlink" | "hardlink" | "copy") every split directory of
+# paths additionally gets its PCD and ASC files for tools that need one directory per split. Without a manifest
+# file and split_manifest the manifest goes next to the catalog (data/raw/splits.json).
+def split_data(paths, ratios, shuffle, random_seed, manifest_file=None, stratify=None, materialize=None):
+    manifest_file = manifest_file or cfg.split_manifest
+    if manifest_file is None:
+        manifest_file = os.path.join(os.path.dirname(cfg.catalog_file), "splits.json")
+        logger.warning("split_manifest is not set, writing the manifest to %s; preprocessing and PointCloudDataset "
+                       "only use it once split_manifest points to it", manifest_file)
+    stratify = cfg.split_stratify if stratify is None else stratify
+    materialize = cfg.split_materialize if materialize is None else materialize
+
+    entries = catalog_entries(paths['pcd_files'], paths['asc_files'])
+    names = [entry['name'] for entry in entries]
+    histograms = [entry['label_histogram'] for entry in entries]
+    if stratify and any(histogram is None for histogram in histograms):
+        logger.warning("Some scenes have no label histogram (catalog_stats off?), they are not stratified")
+    # a random seed is drawn and recorded so that the manifest can be reproduced
+    seed = random_seed if random_seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+    assignment = splits.assign_splits(names, ratios, seed=seed, shuffle=shuffle, histograms=histograms if stratify else None)
+    presence = splits.class_presence(assignment, dict(zip(names, histograms)))
+    splits.write_manifest(manifest_file, assignment, seed=seed, ratios=ratios, shuffle=shuffle, stratified=bool(stratify),
+                          class_presence=presence)
+    for split, split_names in assignment.items():
+        logger.info("%s: %d scenes, %d classes present", split, len(split_names), len(presence[split]))
+    logger.info("Wrote split manifest %s", manifest_file)
+
+    if materialize:
+        files_by_name = {entry['name']: (entry['pcd_file'], entry['asc_file']) for entry in entries}
+        for split, split_names in assignment.items():
+            splits.materialize([f for name in split_names for f in files_by_name[name]], paths[split], materialize)
+            logger.info("Linked %d %s scenes into %s (%s)", len(split_names), split, paths[split], materialize)
+    return assignment
 
 
 # minkowski compatible array:
@@ -237,7 +207,7 @@ def main_preprocessing():
 
    matched_file_pairs = files_match_making(pcd_files, asc_files)
 
-   with ProcessPoolExecutor(max_workers=cfg.num_workers) as executor:
+   with ProcessPoolExecutor(max_workers=cfg.num_workers, initializer=worker_init()) as executor:
        print(f"matched file pairs: {matched_file_pairs}")
        futures = [executor.submit(process_pcd, matched_file_pair, cfg.voxel_size) for matched_file_pair in matched_file_pairs]
        for future in tqdm(as_completed(futures), total=len(futures)):